@@ -0,0 +1,72 @@
+"""
+Compara o tempo de carga do artefato compacto (JSON) com o do joblib.
+
+Mede a carga "a frio", em um interpretador novo (importações incluídas,
+como na subida da API ou do dashboard), e a carga "a quente", com os
+módulos já importados.
+
+Uso (a partir da raiz do projeto):
+    python benchmarks/benchmark_artefato.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+
+import joblib
+import numpy as np
+
+sys.path.append('src')
+from preditor import carregar_compacto, compilar_preditor, salvar_compacto
+
+CAMINHO_JOBLIB = 'outputs/modelo_final.joblib'
+
+# Código executado em cada interpretador novo; imprime o tempo de carga em segundos
+CARGA_JOBLIB = """
+import time; inicio = time.perf_counter()
+import joblib
+modelo = joblib.load({caminho!r})
+print(time.perf_counter() - inicio)
+"""
+CARGA_COMPACTA = """
+import time; inicio = time.perf_counter()
+import sys; sys.path.append('src')
+from preditor import carregar_compacto
+modelo = carregar_compacto({caminho!r})
+print(time.perf_counter() - inicio, 'sklearn' in sys.modules)
+"""
+
+def medir_a_frio(codigo, repeticoes=5):
+    """Menor tempo de carga (ms) entre `repeticoes` interpretadores novos."""
+    tempos = []
+    for _ in range(repeticoes):
+        saida = subprocess.run(
+            [sys.executable, '-c', codigo], capture_output=True, text=True, check=True
+        ).stdout.split()
+        tempos.append(float(saida[0]) * 1000)
+    return min(tempos), saida[1:]
+
+if __name__ == "__main__":
+    modelo = joblib.load(CAMINHO_JOBLIB)
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho_compacto = salvar_compacto(modelo, os.path.join(pasta, 'modelo.json'))
+
+        # Conferir que os dois formatos preveem o mesmo
+        lote = np.random.default_rng(42).uniform(20, 37, size=1000)
+        assert np.allclose(
+            carregar_compacto(caminho_compacto).prever(lote), compilar_preditor(modelo).prever(lote)
+        )
+
+        print(f"Tamanho: joblib {os.path.getsize(CAMINHO_JOBLIB)} bytes, "
+              f"compacto {os.path.getsize(caminho_compacto)} bytes")
+
+        frio_joblib, _ = medir_a_frio(CARGA_JOBLIB.format(caminho=CAMINHO_JOBLIB))
+        frio_compacto, extra = medir_a_frio(CARGA_COMPACTA.format(caminho=caminho_compacto))
+        quente_joblib = min(timeit.repeat(lambda: joblib.load(CAMINHO_JOBLIB), repeat=5, number=50)) / 50 * 1000
+        quente_compacto = min(timeit.repeat(lambda: carregar_compacto(caminho_compacto), repeat=5, number=50)) / 50 * 1000
+
+    print(f"{'Carga':<12}{'joblib (ms)':>14}{'compacto (ms)':>16}{'ganho':>8}")
+    print(f"{'a frio':<12}{frio_joblib:>14.2f}{frio_compacto:>16.2f}{frio_joblib / frio_compacto:>7.1f}x")
+    print(f"{'a quente':<12}{quente_joblib:>14.3f}{quente_compacto:>16.3f}{quente_joblib / quente_compacto:>7.1f}x")
+    print(f"sklearn importado na carga compacta: {extra[0] == 'True'}")
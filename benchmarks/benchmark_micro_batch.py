@@ -0,0 +1,93 @@
+"""
+Teste de carga local de POST /prever/ com e sem micro-batching.
+
+Sobe a API em um subprocesso para cada configuração, dispara requisições
+concorrentes e mede vazão e latências (p50/p99).
+
+Uso (a partir da raiz do projeto):
+    python benchmarks/benchmark_micro_batch.py [--clientes 64] [--requisicoes 5000] [--sklearn]
+
+Com --sklearn o preditor compilado é desativado e cada lote passa pelo
+predict do sklearn, o que mostra o ganho quando a previsão é mais cara.
+"""
+import argparse
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+PORTA = 8799
+URL = f"http://127.0.0.1:{PORTA}/prever/"
+
+CODIGO_SERVIDOR = """
+import sys
+from dataclasses import replace
+sys.path.insert(0, 'src')
+import uvicorn
+import api
+from preditor import PreditorSklearn
+api.MICRO_BATCH_ATIVO = {ativo}
+if {sklearn}:
+    ativo = api.registro.ativo
+    api.registro.ativo = replace(ativo, preditor=PreditorSklearn(ativo.modelo))
+uvicorn.run(api.app, host='127.0.0.1', port={porta}, log_level='warning')
+"""
+
+def subir_servidor(ativo, sklearn):
+    codigo = CODIGO_SERVIDOR.format(ativo=ativo, sklearn=sklearn, porta=PORTA)
+    processo = subprocess.Popen([sys.executable, '-W', 'ignore', '-c', codigo])
+    for _ in range(100):
+        try:
+            requests.get(f"http://127.0.0.1:{PORTA}/", timeout=0.5)
+            return processo
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    processo.kill()
+    raise RuntimeError("Servidor não subiu a tempo.")
+
+def disparar(n_clientes, n_requisicoes):
+    """Dispara as requisições com n_clientes simultâneos e retorna as latências."""
+    local = threading.local()
+    rng = np.random.default_rng(42)
+    temperaturas = rng.uniform(20, 37, size=n_requisicoes)
+
+    def chamar(temperatura):
+        if not hasattr(local, 'sessao'):
+            local.sessao = requests.Session()
+        inicio = time.perf_counter()
+        resposta = local.sessao.post(URL, json={"temperatura": float(temperatura)})
+        resposta.raise_for_status()
+        return time.perf_counter() - inicio
+
+    with ThreadPoolExecutor(max_workers=n_clientes) as executor:
+        # Aquecimento
+        list(executor.map(chamar, temperaturas[:n_clientes * 2]))
+        inicio = time.perf_counter()
+        latencias = list(executor.map(chamar, temperaturas))
+        duracao = time.perf_counter() - inicio
+
+    return np.array(latencias), duracao
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clientes', type=int, default=64)
+    parser.add_argument('--requisicoes', type=int, default=5000)
+    parser.add_argument('--sklearn', action='store_true')
+    args = parser.parse_args()
+
+    print(f"{args.clientes} clientes, {args.requisicoes} requisições, "
+          f"preditor {'sklearn' if args.sklearn else 'compilado'}")
+    print(f"{'Modo':<20}{'req/s':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    for nome, ativo in [("sem micro-batching", False), ("com micro-batching", True)]:
+        processo = subir_servidor(ativo, args.sklearn)
+        try:
+            latencias, duracao = disparar(args.clientes, args.requisicoes)
+        finally:
+            processo.terminate()
+            processo.wait()
+        p50, p99 = np.percentile(latencias, [50, 99]) * 1000
+        print(f"{nome:<20}{args.requisicoes / duracao:>10.0f}{p50:>10.2f}{p99:>10.2f}")
@@ -0,0 +1,42 @@
+"""
+Compara a latência por chamada do preditor compilado com o predict do sklearn.
+
+Uso (a partir da raiz do projeto):
+    python benchmarks/benchmark_preditor.py
+"""
+import sys
+import timeit
+
+import joblib
+import numpy as np
+
+sys.path.append('src')
+from preditor import compilar_preditor
+
+def medir(funcao, repeticoes=5, numero=2000):
+    """Retorna a menor latência média por chamada, em microssegundos."""
+    tempos = timeit.repeat(funcao, repeat=repeticoes, number=numero)
+    return min(tempos) / numero * 1e6
+
+if __name__ == "__main__":
+    modelo = joblib.load('outputs/modelo_final.joblib')
+    preditor = compilar_preditor(modelo)
+    print(f"Preditor: {type(preditor).__name__}")
+
+    # Conferir que os resultados são equivalentes
+    lote = np.random.default_rng(42).uniform(20, 37, size=10000)
+    assert np.allclose(preditor.prever(lote), modelo.predict(lote.reshape(-1, 1)))
+
+    casos = [
+        ("escalar", lambda: modelo.predict([[30.0]]), lambda: preditor.prever(30.0)),
+        ("lote de 100", lambda: modelo.predict(lote[:100].reshape(-1, 1)),
+         lambda: preditor.prever(lote[:100])),
+        ("lote de 10.000", lambda: modelo.predict(lote.reshape(-1, 1)),
+         lambda: preditor.prever(lote)),
+    ]
+
+    print(f"{'Caso':<16}{'sklearn (µs)':>14}{'compilado (µs)':>16}{'ganho':>8}")
+    for nome, sklearn_fn, compilado_fn in casos:
+        t_sklearn = medir(sklearn_fn)
+        t_compilado = medir(compilado_fn)
+        print(f"{nome:<16}{t_sklearn:>14.2f}{t_compilado:>16.2f}{t_sklearn / t_compilado:>7.1f}x")
@@ -16,6 +16,8 @@
 
 # Adicionar diretório src ao path para importar nossos módulos
 sys.path.append('../')
+# Os módulos de src importam uns aos outros pelo nome (ex.: `from estatisticas import ...`)
+sys.path.append('../src')
 from src.pre_processamento import carregar_dados, explorar_dados, preparar_dados
 from src.modelo import ModeloVendasSorvete
 
@@ -125,7 +127,7 @@
 
 # %%
 # Registrar modelo no MLflow
-run_id = modelo.registrar_modelo_mlflow(X_train, y_train, X_test, y_test, run_name="Notebook_Run")
+run_id = modelo.registrar_modelo_mlflow(X_train, y_train, X_test, y_test, run_name="Notebook_Run").result()
 print(f"Modelo registrado no MLflow com run_id: {run_id}")
 
 # %% [markdown]
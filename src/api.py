@@ -1,38 +1,514 @@
-import joblib
+import csv
+import io
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
 import uvicorn
-from fastapi import FastAPI
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from coeficientes_lojas import NOME_TABELA, TabelaLojasAtiva
+from metricas_api import MetricasAPI, MiddlewareMetricas
+from micro_batch import MicroBatcher
+from registro_modelos import CacheModelosLojas, RegistroModelos
+
+# Tamanho máximo de um lote aceito por /prever/lote/
+# (ex.: 500 lojas x 30 dias = 15.000 previsões em uma única chamada)
+MAX_TAMANHO_LOTE = 20000
+
+# Tamanho máximo do corpo de /prever/lote/, conferido pelo Content-Length antes
+# de ler o corpo (um item com loja e data ocupa menos de 100 bytes em JSON)
+MAX_BYTES_LOTE = MAX_TAMANHO_LOTE * 256
+
+# Número de linhas processadas por bloco em /prever/arquivo/
+TAMANHO_BLOCO_STREAM = 50000
+
+# Tamanho máximo de uma linha em /prever/arquivo/ (linhas maiores são descartadas)
+MAX_TAMANHO_LINHA = 64 * 1024
+
+# Micro-batching de /prever/: requisições concorrentes que chegam dentro da
+# janela (em segundos) são previstas juntas, em lotes de até MICRO_BATCH_MAX_LOTE
+MICRO_BATCH_ATIVO = True
+MICRO_BATCH_JANELA = 0.001
+MICRO_BATCH_MAX_LOTE = 512
+
+# Caminhos dos artefatos (relativos à raiz do projeto, não ao diretório atual)
+RAIZ_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRETORIO_MODELOS = os.path.join(RAIZ_PROJETO, 'outputs', 'modelos')
+# O artefato compacto (modelo_final.json), se existir, é preferido: carrega sem sklearn
+CAMINHO_MODELO_PADRAO = os.path.join(RAIZ_PROJETO, 'outputs', 'modelo_final.json')
+if not os.path.exists(CAMINHO_MODELO_PADRAO):
+    CAMINHO_MODELO_PADRAO = os.path.join(RAIZ_PROJETO, 'outputs', 'modelo_final.joblib')
+
+# Intervalo (s) entre verificações de novas versões do modelo
+INTERVALO_RECARGA = 5.0
+
+# Modelos por loja: outputs/lojas/<loja>/modelo_<versao>.joblib, carregados sob
+# demanda em um cache LRU limitado por quantidade e por tamanho dos artefatos.
+# As lojas listadas em lojas_quentes.txt (uma por linha) são carregadas na subida.
+DIRETORIO_LOJAS = os.path.join(RAIZ_PROJETO, 'outputs', 'lojas')
+ARQUIVO_LOJAS_QUENTES = os.path.join(DIRETORIO_LOJAS, 'lojas_quentes.txt')
+CACHE_LOJAS_MAX_MODELOS = 5000
+CACHE_LOJAS_MAX_BYTES = 256 * 1024 ** 2
+INTERVALO_RECARGA_LOJAS = 60.0
+
+# Tabela com os coeficientes de todas as lojas (gerada por coeficientes_lojas.py).
+# Lojas presentes na tabela são previstas direto por ela, sem carregar artefatos.
+CAMINHO_TABELA_LOJAS = os.path.join(DIRETORIO_LOJAS, NOME_TABELA)
+
+# Carregar modelo (versão mais recente em outputs/modelos/ ou o artefato padrão)
+registro = RegistroModelos(
+    DIRETORIO_MODELOS,
+    caminho_padrao=CAMINHO_MODELO_PADRAO,
+    intervalo=INTERVALO_RECARGA
+)
+registro.carregar_inicial()
+
+lojas = CacheModelosLojas(
+    DIRETORIO_LOJAS,
+    max_modelos=CACHE_LOJAS_MAX_MODELOS,
+    max_bytes=CACHE_LOJAS_MAX_BYTES,
+    intervalo=INTERVALO_RECARGA_LOJAS
+)
+
+tabela_lojas = TabelaLojasAtiva(CAMINHO_TABELA_LOJAS, intervalo=INTERVALO_RECARGA_LOJAS)
+
+# Métricas operacionais expostas em /metrics
+metricas = MetricasAPI()
+
+# Agrupador das previsões individuais (usa sempre o modelo ativo no despacho)
+micro_batcher = MicroBatcher(
+    lambda temperaturas: metricas.medir_predicao(
+        'micro_batch', registro.ativo.preditor.prever, temperaturas, len(temperaturas)
+    ),
+    janela=MICRO_BATCH_JANELA,
+    max_lote=MICRO_BATCH_MAX_LOTE
+)
+
+def ler_lojas_quentes(caminho):
+    """Lê a lista de lojas a pré-carregar (uma por linha), se o arquivo existir."""
+    if not os.path.exists(caminho):
+        return []
+    with open(caminho, encoding='utf-8') as arquivo:
+        return [linha.strip() for linha in arquivo if linha.strip()]
+
+def modelo_da_loja(loja):
+    """Modelo da loja, ou o modelo padrão se a loja não tiver modelo próprio."""
+    if loja is None:
+        return registro.ativo
+    try:
+        ativo = lojas.obter(loja)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return ativo if ativo is not None else registro.ativo
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    # Pré-carregar as lojas mais acessadas antes de atender requisições
+    await run_in_threadpool(tabela_lojas.verificar_atualizacao)
+    await run_in_threadpool(lojas.precarregar, ler_lojas_quentes(ARQUIVO_LOJAS_QUENTES))
+    # Observar novas versões (e a tabela de coeficientes) em segundo plano enquanto a API estiver no ar
+    registro.iniciar()
+    tabela_lojas.iniciar()
+    yield
+    tabela_lojas.parar()
+    registro.parar()
 
 # Criar app
-app = FastAPI(title="API de Previsão de Vendas de Sorvete")
+app = FastAPI(title="API de Previsão de Vendas de Sorvete", lifespan=ciclo_de_vida)
+
+class MiddlewareLimiteCorpo:
+    """
+    Middleware ASGI que rejeita com 413, pelo Content-Length, corpos grandes demais.
 
-# Carregar modelo
-modelo = joblib.load('outputs/modelo_final.joblib')
+    A checagem acontece antes de o corpo ser lido e validado, então um lote
+    gigante não custa o parse do JSON. Corpos sem Content-Length (chunked)
+    seguem adiante e são limitados pelo esquema (LoteInput).
+    """
+
+    def __init__(self, app, limites):
+        self.app = app
+        self.limites = limites
+
+    async def __call__(self, scope, receive, send):
+        limite = self.limites.get(scope.get('path')) if scope['type'] == 'http' else None
+        if limite is not None:
+            tamanho = dict(scope['headers']).get(b'content-length')
+            if tamanho is not None and tamanho.isdigit() and int(tamanho) > limite:
+                resposta = JSONResponse(
+                    status_code=413,
+                    content={"detail": f"Corpo com {int(tamanho)} bytes excede o máximo de {limite}."}
+                )
+                await resposta(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+app.add_middleware(MiddlewareLimiteCorpo, limites={"/prever/lote/": MAX_BYTES_LOTE})
+app.add_middleware(
+    MiddlewareMetricas,
+    metricas=metricas,
+    caminhos_conhecidos=lambda: {rota.path for rota in app.routes}
+)
 
 # Classe para dados de entrada
 class TemperaturaInput(BaseModel):
     temperatura: float
+    loja: Optional[str] = None
+
+# Item de um lote de previsões (sem loja, usa o modelo padrão; a data é apenas devolvida)
+class ItemLoteInput(BaseModel):
+    temperatura: float
+    loja: Optional[str] = None
+    data: Optional[str] = None
+
+# Lote de previsões
+class LoteInput(BaseModel):
+    itens: List[ItemLoteInput] = Field(..., max_length=MAX_TAMANHO_LOTE)
+
+@app.exception_handler(RequestValidationError)
+async def tratar_erro_validacao(request: Request, exc: RequestValidationError):
+    # Lote com itens demais é 413 (como o limite de bytes), e não um 422 genérico
+    if any(erro['type'] == 'too_long' and tuple(erro['loc']) == ('body', 'itens') for erro in exc.errors()):
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Lote excede o máximo de {MAX_TAMANHO_LOTE} itens."}
+        )
+    return await request_validation_exception_handler(request, exc)
 
 # Endpoint para previsão
 @app.post("/prever/")
-def prever_vendas(dados: TemperaturaInput):
-    # Formatar entrada para o modelo
-    temperatura = [[dados.temperatura]]
-    
-    # Fazer previsão
-    previsao = int(modelo.predict(temperatura)[0])
+async def prever_vendas(dados: TemperaturaInput):
+    # Fazer previsão (agrupada com outras requisições concorrentes)
+    tabela = tabela_lojas.obter() if dados.loja is not None else None
+    preditor_tabela = tabela.preditor(dados.loja) if tabela is not None else None
+    if preditor_tabela is not None:
+        previsao = int(metricas.medir_predicao('tabela', preditor_tabela.prever, dados.temperatura, 1))
+    elif dados.loja is not None:
+        ativo = lojas.obter_em_cache(dados.loja)
+        if ativo is None and lojas.sem_modelo(dados.loja):
+            # Loja já conferida sem artefato: modelo padrão, sem ir ao disco
+            ativo = registro.ativo
+        elif ativo is None:
+            ativo = await run_in_threadpool(modelo_da_loja, dados.loja)
+        previsao = int(metricas.medir_predicao('loja', ativo.preditor.prever, dados.temperatura, 1))
+    elif MICRO_BATCH_ATIVO:
+        previsao = int(await micro_batcher.submeter(dados.temperatura))
+    else:
+        previsao = int(await run_in_threadpool(
+            metricas.medir_predicao, 'unitaria', registro.ativo.preditor.prever, dados.temperatura, 1
+        ))
     
     # Retornar resultado
     return {
         "temperatura": dados.temperatura, 
+        "loja": dados.loja,
         "previsao_vendas": previsao,
         "mensagem": f"Para uma temperatura de {dados.temperatura}°C, espera-se vender {previsao} sorvetes."
     }
 
+# Endpoint para previsão em lote
+@app.post("/prever/lote/")
+def prever_vendas_lote(dados: LoteInput):
+    """
+    Faz previsões para um lote de temperaturas com uma chamada vetorizada por loja.
+
+    Itens de lojas presentes na tabela de coeficientes são previstos todos
+    juntos, com uma única operação vetorizada. Os demais são agrupados por
+    loja; itens sem loja (ou de lojas sem modelo próprio) usam o modelo padrão. Os
+    resultados são retornados na mesma ordem dos itens recebidos. Lotes com
+    mais de MAX_TAMANHO_LOTE itens (ou corpos acima de MAX_BYTES_LOTE) são
+    rejeitados com status 413 antes de chegar aqui.
+    """
+    n_itens = len(dados.itens)
+    if n_itens == 0:
+        return {"quantidade": 0, "previsoes": []}
+
+    temperaturas = np.fromiter(
+        (item.temperatura for item in dados.itens), dtype=float, count=n_itens
+    )
+
+    previsoes = np.empty(n_itens, dtype=int)
+    versoes = np.empty(n_itens, dtype=object)
+    resolvidos = np.zeros(n_itens, dtype=bool)
+
+    # Lojas da tabela de coeficientes: todas de uma vez
+    tabela = tabela_lojas.obter()
+    if tabela is not None:
+        lojas_itens = np.array([item.loja for item in dados.itens], dtype=object)
+        previsoes_tabela = metricas.medir_predicao(
+            'tabela', lambda t: tabela.prever(lojas_itens, t), temperaturas, n_itens
+        )
+        resolvidos = ~np.isnan(previsoes_tabela)
+        previsoes[resolvidos] = previsoes_tabela[resolvidos].astype(int)
+        versoes[resolvidos] = tabela.versao
+
+    # Agrupar os demais itens por loja: uma previsão vetorizada por modelo
+    grupos = {}
+    for indice, item in enumerate(dados.itens):
+        if not resolvidos[indice]:
+            grupos.setdefault(item.loja, []).append(indice)
+
+    for loja, indices in grupos.items():
+        ativo = modelo_da_loja(loja)
+        indices = np.asarray(indices)
+        previsoes[indices] = metricas.medir_predicao(
+            'lote', ativo.preditor.prever, temperaturas[indices], len(indices)
+        ).astype(int)
+        versoes[indices] = ativo.versao
+
+    return {
+        "quantidade": n_itens,
+        "previsoes": [
+            {
+                "temperatura": item.temperatura,
+                "loja": item.loja,
+                "data": item.data,
+                "previsao_vendas": int(previsao),
+                "versao_modelo": versao
+            }
+            for item, previsao, versao in zip(dados.itens, previsoes, versoes)
+        ]
+    }
+
+class StreamingResponseDuplex(StreamingResponse):
+    """
+    Resposta em streaming que continua lendo o corpo da requisição.
+
+    A StreamingResponse padrão pode consumir as mensagens do cliente para
+    detectar desconexão, o que roubaria os blocos do upload; aqui a própria
+    leitura do corpo detecta a desconexão.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+async def ler_linhas_em_blocos(fluxo, tamanho_bloco, inicio=b'', max_linha=MAX_TAMANHO_LINHA):
+    """
+    Agrupa o corpo recebido em blocos de até tamanho_bloco linhas completas.
+
+    Uma linha com mais de max_linha bytes é descartada sem ser acumulada (um
+    corpo sem quebras de linha não cresce a memória) e aparece no bloco como
+    None, para que a resposta mantenha uma linha de saída por linha de entrada.
+    """
+    resto = b''
+    descartando = False
+    linhas = []
+
+    def processar(pedaco):
+        nonlocal resto, descartando
+        if descartando:
+            fim = pedaco.find(b'\n')
+            if fim < 0:
+                return
+            pedaco, descartando = pedaco[fim + 1:], False
+        partes = (resto + pedaco).split(b'\n')
+        resto = partes.pop()
+        for linha in partes:
+            if len(linha) > max_linha:
+                linhas.append(None)
+            elif linha.strip():
+                linhas.append(linha)
+        if len(resto) > max_linha:
+            linhas.append(None)
+            resto, descartando = b'', True
+
+    processar(inicio)
+    async for pedaco in fluxo:
+        processar(pedaco)
+        while len(linhas) >= tamanho_bloco:
+            yield linhas[:tamanho_bloco]
+            linhas = linhas[tamanho_bloco:]
+    if resto.strip():
+        linhas.append(resto)
+    if linhas:
+        yield linhas
+
+def prever_coluna(preditor, valores):
+    """Previsões inteiras para uma coluna; valores inválidos ou não finitos ficam vazios."""
+    temperaturas = pd.to_numeric(valores, errors='coerce').to_numpy(dtype=float, copy=True)
+    # "inf" e 1e400 passam pelo to_numeric; sem a máscara, o cast para Int64 falharia
+    temperaturas[~np.isfinite(temperaturas)] = np.nan
+    previsoes = np.array(
+        metricas.medir_predicao('arquivo', preditor.prever, temperaturas, len(temperaturas)), dtype=float
+    )
+    # Previsões não finitas ou fora do intervalo do Int64 (ex.: temperatura 1e300) também
+    previsoes[~(np.abs(previsoes) < 2.0 ** 63)] = np.nan
+    previsoes = pd.Series(np.trunc(previsoes), index=valores.index)
+    return previsoes.astype('Int64')
+
+def ler_campos_csv(linha, n_campos=None):
+    """
+    Campos de uma linha CSV, ou None se a linha for inválida.
+
+    Cada linha é lida sozinha, então uma aspa sem par não invade as linhas
+    seguintes; linhas descartadas por tamanho, com bytes fora do UTF-8 ou com
+    número de campos diferente do cabeçalho também são inválidas.
+    """
+    if linha is None:
+        return None
+    try:
+        campos = next(csv.reader([linha.decode('utf-8')], strict=True), [])
+    except (UnicodeDecodeError, csv.Error):
+        return None
+    return campos if n_campos is None or len(campos) == n_campos else None
+
+def linha_csv_simples(linha, n_virgulas):
+    """True se a linha é ASCII, sem aspas nem \\r no meio e com o número certo de vírgulas."""
+    return (
+        linha is not None and linha.isascii() and b'"' not in linha
+        and linha.find(b'\r') in (-1, len(linha) - 1) and linha.count(b',') == n_virgulas
+    )
+
+def pontuar_bloco_csv(preditor, colunas, coluna, linhas):
+    """
+    Pontua um bloco de linhas CSV e devolve as linhas com a coluna previsao_vendas.
+
+    As linhas simples (ver linha_csv_simples) são lidas juntas pelo pandas; as
+    demais, uma a uma por ler_campos_csv. Linhas inválidas não interrompem a
+    resposta nem deslocam colunas: saem com os campos e a previsao_vendas
+    vazios, na mesma posição.
+    """
+    n_campos = len(colunas)
+    campos = np.full((len(linhas), n_campos), '', dtype=object)
+    simples = np.fromiter(
+        (linha_csv_simples(linha, n_campos - 1) for linha in linhas), dtype=bool, count=len(linhas)
+    )
+    if simples.any():
+        lidos = pd.read_csv(
+            io.BytesIO(b'\n'.join(linha for linha, e_simples in zip(linhas, simples) if e_simples)),
+            header=None, names=range(n_campos), dtype=str, na_filter=False,
+            quoting=csv.QUOTE_NONE, skip_blank_lines=False
+        ).to_numpy()
+        if len(lidos) == simples.sum():
+            campos[simples] = lidos
+        else:
+            simples[:] = False
+    for i in np.flatnonzero(~simples):
+        lidos = ler_campos_csv(linhas[i], n_campos)
+        if lidos is not None:
+            campos[i] = lidos
+    bloco = pd.DataFrame(campos)
+    bloco[n_campos] = prever_coluna(preditor, bloco[colunas.index(coluna)])
+    return bloco.to_csv(index=False, header=False)
+
+def ler_registro_ndjson(linha):
+    """Objeto de uma linha NDJSON, ou {'erro': ...} se a linha não for um objeto JSON válido."""
+    if linha is None:
+        return {'erro': f"Linha com mais de {MAX_TAMANHO_LINHA} bytes."}
+    try:
+        registro = json.loads(linha)
+    except ValueError:
+        return {'erro': "Linha não é um JSON válido."}
+    if not isinstance(registro, dict):
+        return {'erro': "Cada linha precisa ser um objeto JSON com a chave temperatura."}
+    return registro
+
+def pontuar_bloco_ndjson(preditor, linhas):
+    """
+    Pontua um bloco de linhas NDJSON e devolve os objetos com previsao_vendas.
+
+    Linhas inválidas não interrompem a resposta (que já começou a ser
+    enviada): saem como {"erro": ..., "previsao_vendas": null}, na mesma posição.
+    """
+    registros = [ler_registro_ndjson(linha) for linha in linhas]
+    temperaturas = pd.Series([
+        r.get('temperatura') if isinstance(r.get('temperatura'), (int, float, str))
+        and not isinstance(r.get('temperatura'), bool) else None
+        for r in registros
+    ], dtype=object)
+    for registro_linha, previsao in zip(registros, prever_coluna(preditor, temperaturas)):
+        registro_linha['previsao_vendas'] = None if pd.isna(previsao) else int(previsao)
+    return ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in registros)
+
+# Endpoint para previsão de arquivos grandes (CSV ou NDJSON) em streaming
+@app.post("/prever/arquivo/")
+async def prever_vendas_arquivo(request: Request):
+    """
+    Recebe um CSV (text/csv) ou NDJSON (application/x-ndjson) em streaming e
+    devolve as mesmas linhas acrescidas de previsao_vendas, bloco a bloco.
+
+    O corpo é lido e pontuado em blocos de TAMANHO_BLOCO_STREAM linhas, então a
+    memória usada não depende do tamanho do arquivo. O CSV precisa de uma linha
+    de cabeçalho com a coluna temperatura; no NDJSON cada linha é um objeto com
+    a chave temperatura. Linhas inválidas ou com mais de MAX_TAMANHO_LINHA
+    bytes saem sem previsão (no NDJSON, com a chave erro).
+    """
+    ativo = registro.ativo
+    tipo = request.headers.get('content-type', '')
+    ndjson = 'ndjson' in tipo or 'jsonl' in tipo
+    fluxo = request.stream()
+
+    if ndjson:
+        inicio = b''
+        cabecalho = coluna = None
+        media_type = 'application/x-ndjson'
+    else:
+        # Ler o cabeçalho antes de responder, para rejeitar arquivos inválidos
+        inicio = b''
+        async for pedaco in fluxo:
+            inicio += pedaco
+            if b'\n' in inicio or len(inicio) > MAX_TAMANHO_LINHA:
+                break
+        cabecalho, _, inicio = inicio.partition(b'\n')
+        if len(cabecalho) > MAX_TAMANHO_LINHA:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Cabeçalho do CSV com mais de {MAX_TAMANHO_LINHA} bytes."
+            )
+        cabecalho = cabecalho.strip()
+        colunas = ler_campos_csv(cabecalho) or []
+        coluna = next((c for c in colunas if c.strip().lower() == 'temperatura'), None)
+        if coluna is None:
+            raise HTTPException(
+                status_code=422,
+                detail="O CSV precisa de um cabeçalho com a coluna 'temperatura'."
+            )
+        media_type = 'text/csv'
+
+    async def gerar_resultados():
+        if not ndjson:
+            yield (cabecalho + b',previsao_vendas\n').decode('utf-8')
+        async for linhas in ler_linhas_em_blocos(fluxo, TAMANHO_BLOCO_STREAM, inicio):
+            if ndjson:
+                yield await run_in_threadpool(pontuar_bloco_ndjson, ativo.preditor, linhas)
+            else:
+                yield await run_in_threadpool(
+                    pontuar_bloco_csv, ativo.preditor, colunas, coluna, linhas
+                )
+
+    return StreamingResponseDuplex(
+        gerar_resultados(),
+        media_type=media_type,
+        headers={"X-Versao-Modelo": ativo.versao}
+    )
+
+# Endpoint de métricas (formato de exposição do Prometheus)
+@app.get("/metrics", response_class=PlainTextResponse)
+def exportar_metricas():
+    return PlainTextResponse(
+        metricas.renderizar(registro.ativo, lojas),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 # Endpoint de status
 @app.get("/")
 def status():
-    return {"status": "online", "modelo": "vendas_sorvete_v1"}
+    ativo = registro.ativo
+    return {
+        "status": "online",
+        "modelo": ativo.versao,
+        "carregado_em": ativo.carregado_em.isoformat(timespec='seconds'),
+        "lojas_em_cache": len(lojas),
+        "lojas_na_tabela": len(tabela_lojas.tabela) if tabela_lojas.tabela is not None else 0
+    }
 
 if __name__ == "__main__":
     uvicorn.run("api:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,190 @@
+import os
+import json
+import hashlib
+import logging
+from concurrent.futures import Future
+
+import joblib
+
+from escrita_atomica import gravacao_atomica, gravar_json_atomico
+
+logger = logging.getLogger(__name__)
+
+class ResultadoEtapa:
+    """Resultado de uma etapa: a chave (hash) e o valor, lido do disco só se for usado."""
+
+    def __init__(self, nome, chave, caminho, valor=None, em_cache=False):
+        self.nome = nome
+        self.chave = chave
+        self.caminho = caminho
+        self.em_cache = em_cache
+        self._valor = valor
+        self._carregado = not em_cache
+
+    @property
+    def valor(self):
+        if not self._carregado:
+            self._valor = joblib.load(self.caminho)
+            self._carregado = True
+        return self._valor
+
+def assinatura_arquivo(caminho):
+    """Tamanho e mtime de um arquivo de saída (None se ele não existir)."""
+    try:
+        estado = os.stat(caminho)
+    except OSError:
+        return None
+    return [estado.st_size, estado.st_mtime_ns]
+
+def hash_modulos(*modulos):
+    """Hash do código-fonte dos módulos usados por uma etapa (mudou o código, refaz a etapa)."""
+    digest = hashlib.sha256()
+    for modulo in modulos:
+        with open(modulo.__file__, 'rb') as arquivo:
+            digest.update(arquivo.read())
+    return digest.hexdigest()
+
+def _tem_futuro(valor):
+    """Se o valor é um Future ou uma tupla com algum Future."""
+    if isinstance(valor, tuple):
+        return any(isinstance(item, Future) for item in valor)
+    return isinstance(valor, Future)
+
+def _resolver(valor):
+    """Troca os Futures do valor (ou da tupla) pelos seus resultados."""
+    if isinstance(valor, tuple):
+        return tuple(item.result() if isinstance(item, Future) else item for item in valor)
+    return valor.result()
+
+def calcular_chave(nome, entradas, dependencias=None):
+    """Hash SHA-256 do nome da etapa e de suas entradas (valores ou chaves de outras etapas)."""
+    normalizadas = {
+        nome_entrada: valor.chave if isinstance(valor, ResultadoEtapa) else valor
+        for nome_entrada, valor in entradas.items()
+    }
+    conteudo = json.dumps(
+        {'etapa': nome, 'entradas': normalizadas, 'dependencias': dependencias or {}},
+        sort_keys=True, default=repr
+    )
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+class CacheEtapas:
+    """
+    Executa etapas do pipeline só quando suas entradas mudam.
+
+    Cada etapa declara suas entradas (parâmetros, hashes de arquivos ou
+    resultados de outras etapas) e os arquivos que produz. A chave da etapa é
+    o hash dessas entradas; se já existe um manifesto com a mesma chave e os
+    arquivos de saída continuam como foram gravados, a etapa é pulada e seu
+    resultado vem do disco (e só é lido se uma etapa seguinte precisar dele).
+    Como a chave de uma etapa inclui as chaves das anteriores, mudar um
+    parâmetro refaz apenas as etapas que dependem dele.
+
+    Uma etapa pode retornar um Future (ex.: gráficos gerados em segundo
+    plano) ou uma tupla com Futures (ex.: o run_id do MLflow, criado em
+    segundo plano); nesse caso o cache só é gravado em finalizar(), depois
+    que os Futures terminarem com sucesso e os arquivos de saída existirem.
+    """
+
+    def __init__(self, diretorio='outputs/.cache_etapas', ativo=True):
+        self.diretorio = diretorio
+        self.ativo = ativo
+        self._pendentes = []
+
+    def hash_arquivo(self, caminho):
+        """
+        SHA-256 de um arquivo de entrada, relido só quando o arquivo muda.
+
+        O hash fica em um índice no diretório do cache junto com o tamanho e o
+        mtime do arquivo; enquanto os dois não mudarem, o hash guardado é
+        usado e uma execução sem alterações não lê os dados.
+        """
+        caminho_indice = os.path.join(self.diretorio, 'hashes_arquivos.json')
+        chave = os.path.abspath(caminho)
+        assinatura = assinatura_arquivo(caminho)
+        indice = {}
+        if self.ativo:
+            try:
+                with open(caminho_indice, encoding='utf-8') as arquivo:
+                    indice = json.load(arquivo)
+            except (OSError, ValueError):
+                pass
+            registro = indice.get(chave)
+            if registro is not None and registro['assinatura'] == assinatura:
+                return registro['sha256']
+
+        digest = hashlib.sha256()
+        with open(caminho, 'rb') as arquivo:
+            for bloco in iter(lambda: arquivo.read(1 << 20), b''):
+                digest.update(bloco)
+        sha256 = digest.hexdigest()
+        if self.ativo:
+            indice[chave] = {'assinatura': assinatura, 'sha256': sha256}
+            gravar_json_atomico(indice, caminho_indice, indent=2)
+        return sha256
+
+    def _caminhos(self, nome, chave):
+        base = os.path.join(self.diretorio, f'{nome}-{chave[:16]}')
+        return base + '.json', base + '.joblib'
+
+    def _valido(self, caminho_manifesto, chave):
+        try:
+            with open(caminho_manifesto, encoding='utf-8') as arquivo:
+                manifesto = json.load(arquivo)
+        except (OSError, ValueError):
+            return False
+        if manifesto.get('chave') != chave:
+            return False
+        return all(
+            assinatura_arquivo(caminho) == assinatura
+            for caminho, assinatura in manifesto.get('saidas', {}).items()
+        )
+
+    def executar(self, nome, funcao, entradas, saidas=(), dependencias=None):
+        """
+        Executa `funcao(**argumentos)` ou reaproveita o resultado em cache.
+
+        `entradas` são os argumentos da função; resultados de outras etapas
+        (ResultadoEtapa) são passados à função já com seu valor. `dependencias`
+        entram só na chave (ex.: hash do arquivo de dados ou do código). `saidas`
+        são os arquivos gravados pela etapa, conferidos antes de reaproveitar o cache.
+        """
+        chave = calcular_chave(nome, entradas, dependencias)
+        caminho_manifesto, caminho_valor = self._caminhos(nome, chave)
+        if self.ativo and self._valido(caminho_manifesto, chave) and os.path.exists(caminho_valor):
+            logger.info(f"Etapa '{nome}' sem alterações ({chave[:12]}); usando o cache.")
+            return ResultadoEtapa(nome, chave, caminho_valor, em_cache=True)
+
+        argumentos = {
+            nome_entrada: valor.valor if isinstance(valor, ResultadoEtapa) else valor
+            for nome_entrada, valor in entradas.items()
+        }
+        valor = funcao(**argumentos)
+        if _tem_futuro(valor):
+            self._pendentes.append((valor, nome, chave, saidas))
+            return ResultadoEtapa(nome, chave, caminho_valor, valor=valor)
+        self._gravar(nome, chave, valor, saidas)
+        return ResultadoEtapa(nome, chave, caminho_valor, valor=valor)
+
+    def finalizar(self):
+        """Espera as etapas em segundo plano e grava o cache das que terminaram bem."""
+        pendentes, self._pendentes = self._pendentes, []
+        for pendente, nome, chave, saidas in pendentes:
+            try:
+                valor = _resolver(pendente)
+            except Exception as e:
+                logger.error(f"Etapa '{nome}' falhou em segundo plano; não será guardada em cache: {e}")
+                continue
+            self._gravar(nome, chave, valor, saidas)
+
+    def _gravar(self, nome, chave, valor, saidas):
+        caminho_manifesto, caminho_valor = self._caminhos(nome, chave)
+        if self.ativo:
+            with gravacao_atomica(caminho_valor) as temporario:
+                joblib.dump(valor, temporario)
+            manifesto = {
+                'etapa': nome,
+                'chave': chave,
+                'saidas': {caminho: assinatura_arquivo(caminho) for caminho in saidas}
+            }
+            gravar_json_atomico(manifesto, caminho_manifesto, indent=2)
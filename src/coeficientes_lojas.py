@@ -0,0 +1,200 @@
+import argparse
+import logging
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from escrita_atomica import gravacao_atomica
+from estatisticas import EstatisticasSuficientes, combinar_por_grupo, estatisticas_por_grupo
+from preditor import PreditorLinear
+
+logger = logging.getLogger(__name__)
+
+# Tabela de coeficientes publicada para a API (ao lado das pastas de loja)
+NOME_TABELA = 'coeficientes_lojas.parquet'
+
+class TabelaCoeficientes:
+    """
+    Regressões de todas as lojas em uma única tabela (uma linha por loja).
+
+    Guarda, por loja, as estatísticas suficientes e a inclinação/intercepto
+    derivados delas. O ajuste de milhares de lojas é um único group-by
+    vetorizado, a tabela ocupa alguns bytes por loja em vez de um pickle por
+    loja, e novas linhas podem ser incorporadas sem reprocessar o histórico.
+    Lojas com menos de duas temperaturas distintas ficam sem coeficientes (NaN).
+    """
+
+    def __init__(self, estatisticas, versao=None):
+        self.estatisticas = estatisticas
+        self.estatisticas.index.name = 'loja'
+        self.versao = versao or datetime.now().strftime('v%Y%m%d_%H%M%S_%f')
+        m2_x = estatisticas['m2_x'].to_numpy()
+        valida = (estatisticas['n'].to_numpy() >= 2) & (m2_x > 0)
+        self.inclinacao = np.divide(
+            estatisticas['c_xy'].to_numpy(), m2_x, out=np.full(len(m2_x), np.nan), where=valida
+        )
+        self.intercepto = estatisticas['media_y'].to_numpy() - self.inclinacao * estatisticas['media_x'].to_numpy()
+        self._indice = estatisticas.index
+
+    def __len__(self):
+        return len(self._indice)
+
+    def __contains__(self, loja):
+        return loja in self._indice
+
+    @classmethod
+    def ajustar(cls, dados, coluna_loja='Loja', coluna_x='Temperatura', coluna_y='Vendas'):
+        """Ajusta a regressão de todas as lojas de um DataFrame em formato longo."""
+        dados = dados.dropna(subset=[coluna_loja, coluna_x, coluna_y])
+        return cls(estatisticas_por_grupo(dados[coluna_loja], dados[coluna_x], dados[coluna_y]))
+
+    @classmethod
+    def ajustar_em_blocos(cls, blocos, coluna_loja='Loja', coluna_x='Temperatura', coluna_y='Vendas'):
+        """Ajusta as lojas consumindo um iterador de DataFrames (ex.: ler_em_blocos)."""
+        tabela = cls(estatisticas_por_grupo([], [], []))
+        for bloco in blocos:
+            tabela = tabela.atualizar(bloco, coluna_loja, coluna_x, coluna_y)
+        return tabela
+
+    def atualizar(self, dados, coluna_loja='Loja', coluna_x='Temperatura', coluna_y='Vendas'):
+        """Retorna uma nova tabela com as linhas novas incorporadas (lojas novas incluídas)."""
+        novas = TabelaCoeficientes.ajustar(dados, coluna_loja, coluna_x, coluna_y)
+        return TabelaCoeficientes(combinar_por_grupo(self.estatisticas, novas.estatisticas))
+
+    def coeficientes(self):
+        """DataFrame com n, inclinação e intercepto de cada loja."""
+        return pd.DataFrame({
+            'n': self.estatisticas['n'].to_numpy(),
+            'inclinacao': self.inclinacao,
+            'intercepto': self.intercepto
+        }, index=self._indice)
+
+    def estatisticas_da_loja(self, loja):
+        """EstatisticasSuficientes de uma loja (por exemplo, para treinar_incremental)."""
+        return EstatisticasSuficientes.de_dict(self.estatisticas.loc[loja])
+
+    def preditor(self, loja):
+        """PreditorLinear da loja, ou None se ela não estiver na tabela ou não tiver coeficientes."""
+        posicao = self._indice.get_indexer([loja])[0]
+        if posicao < 0 or np.isnan(self.inclinacao[posicao]):
+            return None
+        return PreditorLinear(self.inclinacao[posicao], self.intercepto[posicao])
+
+    def prever(self, lojas, temperaturas):
+        """
+        Previsões em lote para pares (loja, temperatura), em uma única operação.
+
+        Cada loja é localizada por uma busca no índice da tabela; lojas
+        ausentes ou sem coeficientes resultam em NaN.
+        """
+        posicoes = self._indice.get_indexer(np.asarray(lojas))
+        temperaturas = np.asarray(temperaturas, dtype=np.float64).reshape(-1)
+        encontradas = posicoes >= 0
+        previsoes = np.full(len(temperaturas), np.nan)
+        indices = posicoes[encontradas]
+        previsoes[encontradas] = temperaturas[encontradas] * self.inclinacao[indices] + self.intercepto[indices]
+        return previsoes
+
+    def salvar(self, caminho):
+        """Grava a tabela em Parquet (escrita atômica, com a versão nos metadados)."""
+        tabela = pa.Table.from_pandas(
+            self.estatisticas.assign(inclinacao=self.inclinacao, intercepto=self.intercepto)
+        )
+        tabela = tabela.replace_schema_metadata({
+            **(tabela.schema.metadata or {}), b'versao': self.versao.encode('utf-8')
+        })
+        with gravacao_atomica(caminho) as temporario:
+            pq.write_table(tabela, temporario)
+        print(f"Coeficientes de {len(self)} lojas salvos em: {caminho}")
+        return caminho
+
+    @classmethod
+    def carregar(cls, caminho):
+        """Carrega uma tabela salva com salvar()."""
+        tabela = pq.read_table(caminho)
+        versao = (tabela.schema.metadata or {}).get(b'versao', b'').decode('utf-8') or None
+        estatisticas = tabela.to_pandas()[list(EstatisticasSuficientes.CAMPOS)]
+        return cls(estatisticas, versao=versao)
+
+class TabelaLojasAtiva:
+    """
+    Tabela de coeficientes usada pela API, recarregada quando o arquivo muda.
+
+    Como no RegistroModelos, uma thread em segundo plano confere o arquivo
+    (os.stat) a cada `intervalo` segundos e carrega a nova tabela fora do
+    caminho das requisições; a troca é uma única atribuição. obter() só lê
+    a referência atual, sem acesso a disco nem lock.
+    """
+
+    def __init__(self, caminho, intervalo=60.0):
+        self.caminho = caminho
+        self.intervalo = intervalo
+        self.tabela = None
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def obter(self):
+        """Retorna a tabela atual (ou None se não houver tabela publicada)."""
+        return self.tabela
+
+    def verificar_atualizacao(self):
+        """Carrega a tabela se o arquivo mudou desde a última carga. Retorna True se trocou."""
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(self.caminho)
+            except OSError:
+                return False
+            if mtime == self._mtime:
+                return False
+            self._mtime = mtime
+            try:
+                tabela = TabelaCoeficientes.carregar(self.caminho)
+            except Exception as e:
+                logger.error(f"Tabela de coeficientes rejeitada {self.caminho}: {e}")
+                return False
+            self.tabela = tabela
+            logger.info(f"Tabela de coeficientes carregada: {len(tabela)} lojas ({tabela.versao})")
+            return True
+
+    def _observar(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.verificar_atualizacao()
+            except Exception as e:
+                logger.error(f"Erro ao verificar a tabela de coeficientes: {e}")
+
+    def iniciar(self):
+        """Inicia a thread que observa o arquivo da tabela."""
+        if self._thread is None or not self._thread.is_alive():
+            self._parar.clear()
+            self._thread = threading.Thread(
+                target=self._observar, name='tabela-lojas', daemon=True
+            )
+            self._thread.start()
+
+    def parar(self):
+        """Interrompe a thread de observação."""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.intervalo)
+            self._thread = None
+
+if __name__ == "__main__":
+    from pre_processamento import ler_em_blocos
+
+    parser = argparse.ArgumentParser(description="Ajusta a regressão de todas as lojas de uma vez.")
+    parser.add_argument('--dados', default='inputs/lojas')
+    parser.add_argument('--saida', default=os.path.join('outputs', 'lojas', NOME_TABELA))
+    parser.add_argument('--bloco', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    colunas = ['Loja', 'Temperatura', 'Vendas']
+    tabela = TabelaCoeficientes.ajustar_em_blocos(ler_em_blocos(args.dados, args.bloco, colunas))
+    tabela.salvar(args.saida)
@@ -2,11 +2,14 @@
 import joblib
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import os
 import sys
+import hashlib
 import datetime
 
+from graficos import grafico_curva_previsao, marcar_ponto
+from preditor import carregar_compacto, compilar_preditor
+
 # Configurações da página com tema aprimorado
 st.set_page_config(
     page_title="🍦 Gelato Mágico Gilson Silva- Previsão de Vendas",
@@ -81,6 +84,8 @@
 
 # Definir caminho absoluto para o modelo
 MODELO_PATH = r"C:\MLVendasLab\outputs\modelo_final.joblib"
+# Artefato compacto ao lado do joblib: preferido quando existe (carrega sem sklearn)
+MODELO_COMPACTO_PATH = os.path.splitext(MODELO_PATH)[0] + '.json'
 
 # Função para criar um termômetro visual
 def criar_termometro(temperatura, min_temp=20, max_temp=37):
@@ -105,33 +110,78 @@ def criar_termometro(temperatura, min_temp=20, max_temp=37):
     """
     return st.markdown(html, unsafe_allow_html=True)
 
-# Função para converter DataFrame para CSV (para download)
-@st.cache_data
-def convert_df(df):
-    return df.to_csv(index=False).encode('utf-8')
+# Faixa do gráfico (mesmo passo do slider, para a previsão sair da curva pronta)
+TEMPERATURAS_CURVA = np.arange(20, 38, 0.5)
+TEMPERATURAS_REFERENCIA = list(range(20, 38, 2))
+
+def caminho_artefato():
+    """Artefato do modelo a usar: o compacto se existir, senão o joblib (None se nenhum)."""
+    for caminho in (MODELO_COMPACTO_PATH, MODELO_PATH):
+        if os.path.exists(caminho):
+            return caminho
+    return None
 
-# Carregar o modelo
-@st.cache_resource
-def carregar_modelo():
+# Hash do artefato, recalculado só quando o arquivo muda (mtime/tamanho)
+@st.cache_data(max_entries=4)
+def hash_artefato(caminho, mtime_ns, tamanho):
+    with open(caminho, 'rb') as arquivo:
+        return hashlib.sha256(arquivo.read()).hexdigest()
+
+# Carregar o modelo (já compilado para o preditor rápido), uma vez por versão do artefato
+@st.cache_resource(max_entries=2)
+def carregar_modelo(caminho, versao):
     try:
-        if os.path.exists(MODELO_PATH):
-            modelo = joblib.load(MODELO_PATH)
-            return modelo
-        else:
-            st.error(f"Arquivo não encontrado: {MODELO_PATH}")
-            return None
+        if caminho.endswith('.json'):
+            return carregar_compacto(caminho)
+        return compilar_preditor(joblib.load(caminho))
     except Exception as e:
         st.error(f"Erro ao carregar o modelo: {e}")
         return None
 
+# Curva, tabela de referência e gráfico base: calculados uma vez por versão do modelo.
+# Interações no slider só consultam a curva e desenham o ponto atual sobre a imagem.
+@st.cache_data(max_entries=2)
+def precomputar_visualizacoes(caminho, versao):
+    modelo = carregar_modelo(caminho, versao)
+    previsoes = np.asarray(modelo.prever(TEMPERATURAS_CURVA.reshape(-1, 1)), dtype=float)
+    curva = dict(zip(TEMPERATURAS_CURVA.tolist(), previsoes.tolist()))
+
+    df_ref = pd.DataFrame({
+        "Temperatura (°C)": TEMPERATURAS_REFERENCIA,
+        "Previsão de Vendas": [int(curva[float(t)]) for t in TEMPERATURAS_REFERENCIA]
+    })
+    grafico, escala = grafico_curva_previsao(TEMPERATURAS_CURVA, previsoes)
+    return {
+        'curva': curva,
+        'tabela': df_ref,
+        'csv': df_ref.to_csv(index=False).encode('utf-8'),
+        'grafico': grafico,
+        'escala': escala,
+    }
+
 # Tentar carregar o modelo
+modelo, visualizacoes, versao_modelo = None, None, None
+caminho_modelo = caminho_artefato()
 try:
-    modelo = carregar_modelo()
+    if caminho_modelo is None:
+        st.error(f"Arquivo não encontrado: {MODELO_PATH}")
+    else:
+        info = os.stat(caminho_modelo)
+        versao_modelo = hash_artefato(caminho_modelo, info.st_mtime_ns, info.st_size)
+        modelo = carregar_modelo(caminho_modelo, versao_modelo)
+        if modelo is not None:
+            visualizacoes = precomputar_visualizacoes(caminho_modelo, versao_modelo)
     modelo_carregado = modelo is not None
 except Exception as e:
     st.error(f"Falha ao carregar o modelo: {e}")
     modelo_carregado = False
 
+def prever_temperatura(temperatura):
+    """Previsão para o slider: consulta a curva pré-calculada; fora dela, usa o modelo."""
+    if visualizacoes is not None and temperatura in visualizacoes['curva']:
+        return visualizacoes['curva'][temperatura]
+    return modelo.prever(temperatura)
+
 # Título e descrição
 st.title('🍦 Previsão de Vendas - Gelato Mágico')
 st.markdown("### Sistema de previsão baseado em temperatura")
@@ -185,7 +235,7 @@ def carregar_modelo():
         # Processar a previsão quando o botão for clicado
         if prever_clicked and modelo_carregado:
             try:
-                previsao = int(modelo.predict([[temperatura]])[0])
+                previsao = int(prever_temperatura(temperatura))
                 
                 # Adicionar ao histórico
                 st.session_state.historico.append({
@@ -223,42 +273,11 @@ def carregar_modelo():
     
     if modelo_carregado:
         try:
-            # Gerar dados para o gráfico
-            temperaturas = np.arange(20, 38, 0.5).reshape(-1, 1)
-            previsoes = modelo.predict(temperaturas)
-            
-            # Criar figura
-            fig, ax = plt.subplots(figsize=(10, 6))
-            
-            # Sombreamento para faixas de temperatura
-            ax.axvspan(20, 25, alpha=0.1, color='blue', label='Frio')
-            ax.axvspan(25, 32, alpha=0.1, color='orange', label='Moderado')
-            ax.axvspan(32, 38, alpha=0.1, color='red', label='Quente')
-            
-            # Linha de previsão
-            ax.plot(temperaturas, previsoes, 'r-', linewidth=2.5, label='Modelo de previsão')
-            
-            # Marcar previsão atual
+            # Gráfico base em cache; só o ponto da previsão atual é desenhado por interação
+            grafico = visualizacoes['grafico']
             if prever_clicked and 'previsao' in locals():
-                ax.scatter([temperatura], [previsao], color='blue', s=120, zorder=5, label='Previsão atual')
-                
-            # Estilizar o gráfico
-            ax.set_title('Relação entre Temperatura e Vendas Previstas', fontsize=14)
-            ax.set_xlabel('Temperatura (°C)', fontsize=12)
-            ax.set_ylabel('Vendas Previstas (unidades)', fontsize=12)
-            ax.grid(True, alpha=0.3, linestyle='--')
-            ax.legend()
-            
-            # Adicionar anotações para faixas
-            ax.text(22.5, np.max(previsoes)*0.9, "Frio", fontsize=9, 
-                   ha='center', va='center', alpha=0.7, color='blue')
-            ax.text(28.5, np.max(previsoes)*0.9, "Moderado", fontsize=9,
-                   ha='center', va='center', alpha=0.7, color='darkorange')
-            ax.text(35, np.max(previsoes)*0.9, "Quente", fontsize=9, 
-                   ha='center', va='center', alpha=0.7, color='red')
-            
-            # Exibir o gráfico no Streamlit
-            st.pyplot(fig)
+                grafico = marcar_ponto(grafico, visualizacoes['escala'], temperatura, previsao)
+            st.image(grafico, use_column_width=True)
             
         except Exception as e:
             st.error(f"Erro ao gerar gráfico: {e}")
@@ -274,22 +293,14 @@ def carregar_modelo():
     if modelo_carregado:
         try:
             st.markdown("### Tabela de Referência")
-            temperaturas_ref = list(range(20, 38, 2))
-            previsoes_ref = [int(modelo.predict([[t]])[0]) for t in temperaturas_ref]
-
-            df_ref = pd.DataFrame({
-                "Temperatura (°C)": temperaturas_ref,
-                "Previsão de Vendas": previsoes_ref
-            })
 
             # Tabela interativa
-            st.dataframe(df_ref, use_container_width=True)
+            st.dataframe(visualizacoes['tabela'], use_container_width=True)
             
             # Botão para download
-            csv = convert_df(df_ref)
             st.download_button(
                 "📥 Baixar Tabela CSV",
-                csv,
+                visualizacoes['csv'],
                 "previsao_vendas_sorvete.csv",
                 "text/csv",
                 key='download-csv'
@@ -332,6 +343,8 @@ def carregar_modelo():
     st.subheader("Informações de Debug")
     st.write(f"Caminho do modelo: {MODELO_PATH}")
     st.write(f"Arquivo existe? {'Sim' if os.path.exists(MODELO_PATH) else 'Não'}")
+    st.write(f"Artefato em uso: {caminho_modelo or '-'}")
+    st.write(f"Versão do modelo (sha256): {versao_modelo or '-'}")
     st.write(f"Diretório atual: {os.getcwd()}")
     
     if st.checkbox("Mostrar informações do sistema"):
@@ -0,0 +1,46 @@
+import os
+import json
+import tempfile
+from contextlib import contextmanager
+
+def _ler_umask():
+    # os.umask só lê trocando o valor; feito uma vez, na importação
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+# Permissões de um arquivo novo criado com open(): 0o666 menos a umask do processo
+MODO_ARQUIVO = 0o666 & ~_ler_umask()
+
+@contextmanager
+def gravacao_atomica(caminho):
+    """
+    Fornece um caminho temporário ao lado de `caminho` e o publica no lugar dele.
+
+    O bloco grava o conteúdo no temporário; ao sair sem erro, o arquivo vai
+    para o disco (fsync), recebe as permissões de um arquivo criado
+    normalmente (a umask, e não o 0600 do mkstemp) e é renomeado com
+    os.replace. Quem lê `caminho` vê o arquivo antigo ou o novo, nunca um
+    pela metade. Em caso de erro, o temporário é removido.
+    """
+    pasta = os.path.dirname(caminho) or '.'
+    os.makedirs(pasta, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+    os.close(descritor)
+    try:
+        yield temporario
+        with open(temporario, 'rb+') as arquivo:
+            os.fsync(arquivo.fileno())
+        os.chmod(temporario, MODO_ARQUIVO)
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+def gravar_json_atomico(conteudo, caminho, **opcoes):
+    """Grava `conteudo` em JSON com gravacao_atomica (opções repassadas ao json.dump)."""
+    with gravacao_atomica(caminho) as temporario:
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(conteudo, arquivo, **opcoes)
+    return caminho
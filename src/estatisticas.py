@@ -0,0 +1,524 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+def combinar_momentos(n_a, media_a, m2_a, n_b, media_b, m2_b):
+    """Combina contagem, média e soma de quadrados dos desvios de dois grupos (Chan/Welford)."""
+    n = n_a + n_b
+    if n == 0:
+        return 0, 0.0, 0.0
+    delta = media_b - media_a
+    media = media_a + delta * n_b / n
+    m2 = m2_a + m2_b + delta * delta * n_a * n_b / n
+    return n, media, m2
+
+class EstatisticasSuficientes:
+    """
+    Estatísticas suficientes da regressão linear simples y = a*x + b.
+
+    Guarda n, as médias de x e y, M2 de x e de y e o co-momento de x e y (a
+    forma centrada de n, Σx, Σy, Σx², Σy² e Σxy, que não sofre cancelamento
+    numérico em séries longas). Atualizar com novas linhas custa O(linhas
+    novas), e estatísticas de partições ou processos diferentes podem ser
+    combinadas; os coeficientes resultantes são os mesmos de um ajuste completo.
+    """
+
+    CAMPOS = ('n', 'media_x', 'media_y', 'm2_x', 'm2_y', 'c_xy')
+
+    def __init__(self, n=0, media_x=0.0, media_y=0.0, m2_x=0.0, m2_y=0.0, c_xy=0.0):
+        self.n = int(n)
+        self.media_x = float(media_x)
+        self.media_y = float(media_y)
+        self.m2_x = float(m2_x)
+        self.m2_y = float(m2_y)
+        self.c_xy = float(c_xy)
+
+    def atualizar(self, x, y):
+        """Incorpora novas observações (x pode ter formato (n,) ou (n, 1))."""
+        x = np.asarray(x, dtype=np.float64).reshape(-1)
+        y = np.asarray(y, dtype=np.float64).reshape(-1)
+        if len(x) != len(y):
+            raise ValueError(f"x e y com tamanhos diferentes: {len(x)} e {len(y)}")
+        if len(x) == 0:
+            return self
+        media_x, media_y = x.mean(), y.mean()
+        dx, dy = x - media_x, y - media_y
+        return self.combinar(EstatisticasSuficientes(
+            len(x), media_x, media_y, np.dot(dx, dx), np.dot(dy, dy), np.dot(dx, dy)
+        ))
+
+    def combinar(self, outra):
+        """Combina com estatísticas calculadas em outra partição (fórmulas de Chan)."""
+        n = self.n + outra.n
+        if outra.n == 0:
+            return self
+        dx = outra.media_x - self.media_x
+        dy = outra.media_y - self.media_y
+        peso = self.n * outra.n / n
+        self.media_x += dx * outra.n / n
+        self.media_y += dy * outra.n / n
+        self.m2_x += outra.m2_x + dx * dx * peso
+        self.m2_y += outra.m2_y + dy * dy * peso
+        self.c_xy += outra.c_xy + dx * dy * peso
+        self.n = n
+        return self
+
+    def coeficientes(self):
+        """Retorna (inclinação, intercepto) de mínimos quadrados."""
+        if self.n < 2 or self.m2_x == 0:
+            raise ValueError("São necessárias ao menos duas temperaturas distintas para ajustar o modelo.")
+        inclinacao = self.c_xy / self.m2_x
+        return inclinacao, self.media_y - inclinacao * self.media_x
+
+    @property
+    def soma_x(self):
+        return self.n * self.media_x
+
+    @property
+    def soma_y(self):
+        return self.n * self.media_y
+
+    @property
+    def soma_xx(self):
+        return self.m2_x + self.n * self.media_x ** 2
+
+    @property
+    def soma_xy(self):
+        return self.c_xy + self.n * self.media_x * self.media_y
+
+    def para_dict(self):
+        return {campo: getattr(self, campo) for campo in self.CAMPOS}
+
+    @classmethod
+    def de_dict(cls, valores):
+        return cls(**{campo: valores[campo] for campo in cls.CAMPOS})
+
+    def __repr__(self):
+        campos = ', '.join(f'{campo}={getattr(self, campo)!r}' for campo in self.CAMPOS)
+        return f'EstatisticasSuficientes({campos})'
+
+def coeficientes_bootstrap(x, y, n_reamostras=1000, seed=42, tamanho_reamostra=5000,
+                           max_elementos=10_000_000):
+    """
+    Ajusta a regressão y = a*x + b em `n_reamostras` reamostragens bootstrap de uma vez.
+
+    Retorna uma matriz (n_reamostras, 3) com inclinação, intercepto e um
+    resíduo sorteado do ajuste completo para cada reamostragem; o resíduo
+    permite gerar intervalos de predição (e não só de confiança). Os mínimos
+    quadrados saem em forma fechada das somas de cada reamostragem, calculadas
+    para blocos de reamostragens com até `max_elementos` índices por vez.
+
+    Com mais de `tamanho_reamostra` linhas, cada reamostragem sorteia só
+    `tamanho_reamostra` linhas (bootstrap m-de-n) e os desvios em relação ao
+    ajuste completo são reduzidos por sqrt(m/n). O custo fica fixo em
+    O(n_reamostras * tamanho_reamostra), qualquer que seja o tamanho do treino.
+    """
+    x = np.asarray(x, dtype=np.float64).reshape(-1)
+    y = np.asarray(y, dtype=np.float64).reshape(-1)
+    n = len(x)
+    m = min(n, tamanho_reamostra)
+    inclinacao, intercepto = EstatisticasSuficientes().atualizar(x, y).coeficientes()
+    residuos = y - (inclinacao * x + intercepto)
+
+    # Centrar evita cancelamento numérico nas somas de quadrados
+    media_x, media_y = x.mean(), y.mean()
+    xc, yc = x - media_x, y - media_y
+    rng = np.random.default_rng(seed)
+    escala = np.sqrt(m / n)
+    resultado = np.empty((n_reamostras, 3))
+    passo = max(1, max_elementos // max(m, 1))
+    for inicio in range(0, n_reamostras, passo):
+        fim = min(inicio + passo, n_reamostras)
+        indices = rng.integers(0, n, size=(fim - inicio, m), dtype=np.int32 if n < 2**31 else np.int64)
+        bx, by = xc[indices], yc[indices]
+        mx, my = bx.mean(axis=1), by.mean(axis=1)
+        var_x = np.einsum('ij,ij->i', bx, bx) / m - mx * mx
+        cov_xy = np.einsum('ij,ij->i', bx, by) / m - mx * my
+        a = np.divide(cov_xy, var_x, out=np.full(len(mx), np.nan), where=var_x > 0)
+        # Inclinação e nível da reta na média de x (desvios quase independentes)
+        inclinacoes = inclinacao + (a - inclinacao) * escala
+        niveis = media_y + (my - a * mx) * escala
+        resultado[inicio:fim, 0] = inclinacoes
+        resultado[inicio:fim, 1] = niveis - inclinacoes * media_x
+    resultado[:, 2] = rng.choice(residuos, size=n_reamostras)
+    # Reamostragens degeneradas (uma única temperatura) são descartadas
+    return resultado[~np.isnan(resultado[:, 0])]
+
+def atualizar_bootstrap(coeficientes, anteriores, atuais, residuos_novos=None, seed=42):
+    """
+    Leva a matriz bootstrap de um ajuste para o ajuste atualizado de forma incremental.
+
+    `anteriores` e `atuais` são as EstatisticasSuficientes antes e depois da
+    atualização. Os desvios de cada reamostragem passam a ser em torno dos
+    novos coeficientes: o da inclinação é reduzido por sqrt(M2x antigo / M2x
+    novo) e o do nível da reta (na média de x) por sqrt(n antigo / n novo),
+    como os erros-padrão de mínimos quadrados. Uma fração n_novos/n das
+    colunas de resíduo é sorteada dos `residuos_novos`, para acompanhar
+    mudanças no ruído. É uma aproximação (supõe o mesmo ruído nas linhas
+    antigas e novas) que custa O(reamostragens + linhas novas).
+    """
+    inclinacao_0, intercepto_0 = anteriores.coeficientes()
+    inclinacao_1, intercepto_1 = atuais.coeficientes()
+    nivel_0 = intercepto_0 + inclinacao_0 * anteriores.media_x
+    nivel_1 = intercepto_1 + inclinacao_1 * atuais.media_x
+
+    resultado = np.array(coeficientes, dtype=np.float64)
+    niveis = resultado[:, 1] + resultado[:, 0] * anteriores.media_x
+    resultado[:, 0] = inclinacao_1 + (resultado[:, 0] - inclinacao_0) * np.sqrt(anteriores.m2_x / atuais.m2_x)
+    niveis = nivel_1 + (niveis - nivel_0) * np.sqrt(anteriores.n / atuais.n)
+    resultado[:, 1] = niveis - resultado[:, 0] * atuais.media_x
+
+    if residuos_novos is not None and len(residuos_novos):
+        rng = np.random.default_rng(seed)
+        trocas = rng.binomial(len(resultado), min(1.0, len(residuos_novos) / atuais.n))
+        posicoes = rng.choice(len(resultado), size=trocas, replace=False)
+        resultado[posicoes, 2] = rng.choice(np.asarray(residuos_novos, dtype=np.float64), size=trocas)
+    return resultado
+
+def estatisticas_por_grupo(chaves, x, y):
+    """
+    Estatísticas suficientes de cada grupo em uma única passada vetorizada.
+
+    Retorna um DataFrame indexado pela chave do grupo, com uma coluna para
+    cada campo de EstatisticasSuficientes. As somas por grupo são feitas com
+    np.bincount sobre os códigos das chaves, na forma centrada (desvios em
+    relação à média de cada grupo), sem nenhum laço em Python por grupo.
+    """
+    codigos, grupos = pd.factorize(np.asarray(chaves), sort=True)
+    x = np.asarray(x, dtype=np.float64).reshape(-1)
+    y = np.asarray(y, dtype=np.float64).reshape(-1)
+    n_grupos = len(grupos)
+
+    n = np.bincount(codigos, minlength=n_grupos)
+    media_x = np.bincount(codigos, weights=x, minlength=n_grupos) / n
+    media_y = np.bincount(codigos, weights=y, minlength=n_grupos) / n
+    dx = x - media_x[codigos]
+    dy = y - media_y[codigos]
+    return pd.DataFrame({
+        'n': n,
+        'media_x': media_x,
+        'media_y': media_y,
+        'm2_x': np.bincount(codigos, weights=dx * dx, minlength=n_grupos),
+        'm2_y': np.bincount(codigos, weights=dy * dy, minlength=n_grupos),
+        'c_xy': np.bincount(codigos, weights=dx * dy, minlength=n_grupos),
+    }, index=pd.Index(grupos, name='grupo'))
+
+def combinar_por_grupo(a, b):
+    """
+    Combina duas tabelas de estatisticas_por_grupo (fórmulas de Chan, vetorizadas).
+
+    Grupos presentes em apenas uma das tabelas são mantidos como estão.
+    """
+    grupos = a.index.union(b.index)
+    a = a.reindex(grupos, fill_value=0)
+    b = b.reindex(grupos, fill_value=0)
+    n = a['n'].to_numpy() + b['n'].to_numpy()
+    peso_b = np.divide(b['n'].to_numpy(), n, out=np.zeros(len(n)), where=n > 0)
+    peso = a['n'].to_numpy() * peso_b
+    dx = b['media_x'].to_numpy() - a['media_x'].to_numpy()
+    dy = b['media_y'].to_numpy() - a['media_y'].to_numpy()
+    return pd.DataFrame({
+        'n': n,
+        'media_x': a['media_x'].to_numpy() + dx * peso_b,
+        'media_y': a['media_y'].to_numpy() + dy * peso_b,
+        'm2_x': a['m2_x'].to_numpy() + b['m2_x'].to_numpy() + dx * dx * peso,
+        'm2_y': a['m2_y'].to_numpy() + b['m2_y'].to_numpy() + dy * dy * peso,
+        'c_xy': a['c_xy'].to_numpy() + b['c_xy'].to_numpy() + dx * dy * peso,
+    }, index=grupos)
+
+class AcumuladorMetricas:
+    """
+    Calcula MAE, MSE, RMSE e R² juntos, bloco a bloco.
+
+    Cada atualização resume os erros do bloco (Σ|e|, Σe²) e a média/M2 dos
+    valores reais em uma passada vetorizada; acumuladores de blocos, processos
+    ou períodos diferentes podem ser combinados. Serve tanto para avaliar um
+    conjunto de teste quanto para acompanhar as vendas reais em produção.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.soma_abs = 0.0
+        self.soma_quad = 0.0
+        self.media_y = 0.0
+        self.m2_y = 0.0
+
+    def atualizar(self, y_real, y_previsto):
+        """Incorpora um bloco de valores reais e previstos."""
+        y_real = np.asarray(y_real, dtype=np.float64).reshape(-1)
+        y_previsto = np.asarray(y_previsto, dtype=np.float64).reshape(-1)
+        if len(y_real) != len(y_previsto):
+            raise ValueError(f"y_real e y_previsto com tamanhos diferentes: {len(y_real)} e {len(y_previsto)}")
+        if len(y_real) == 0:
+            return self
+        erros = y_real - y_previsto
+        media_b = y_real.mean()
+        desvios = y_real - media_b
+        self.soma_abs += np.abs(erros).sum()
+        self.soma_quad += np.dot(erros, erros)
+        self.n, self.media_y, self.m2_y = combinar_momentos(
+            self.n, self.media_y, self.m2_y, len(y_real), media_b, np.dot(desvios, desvios)
+        )
+        return self
+
+    def combinar(self, outro):
+        """Combina com um acumulador de outro bloco, processo ou período."""
+        self.soma_abs += outro.soma_abs
+        self.soma_quad += outro.soma_quad
+        self.n, self.media_y, self.m2_y = combinar_momentos(
+            self.n, self.media_y, self.m2_y, outro.n, outro.media_y, outro.m2_y
+        )
+        return self
+
+    def resultado(self):
+        """Retorna o dicionário de métricas no mesmo formato de ModeloVendasSorvete.avaliar."""
+        if self.n == 0:
+            return {'MAE': float('nan'), 'MSE': float('nan'), 'RMSE': float('nan'), 'R2': float('nan')}
+        mse = self.soma_quad / self.n
+        r2 = 1 - self.soma_quad / self.m2_y if self.m2_y > 0 else float('nan')
+        return {'MAE': float(self.soma_abs / self.n), 'MSE': float(mse),
+                'RMSE': float(np.sqrt(mse)), 'R2': float(r2)}
+
+@dataclass
+class EstatisticasColuna:
+    """Estatísticas de uma coluna calculadas em uma única passada."""
+    contagem: int = 0
+    nulos: int = 0
+    media: float = float('nan')
+    variancia: float = float('nan')
+    desvio_padrao: float = float('nan')
+    minimo: object = None
+    maximo: object = None
+    quantis: dict = field(default_factory=dict)
+
+@dataclass
+class PerfilDados:
+    """Resultado do perfil dos dados (equivalente a describe, isnull e corr)."""
+    n_registros: int
+    colunas: dict
+    covariancia: float = float('nan')
+    correlacao: float = float('nan')
+
+    def descrever(self):
+        """Tabela no formato de DataFrame.describe(), com nulos."""
+        linhas = {}
+        for nome, estat in self.colunas.items():
+            linha = {
+                'count': estat.contagem, 'nulos': estat.nulos, 'mean': estat.media,
+                'std': estat.desvio_padrao, 'min': estat.minimo
+            }
+            linha.update({f'{q:.0%}': valor for q, valor in estat.quantis.items()})
+            linha['max'] = estat.maximo
+            linhas[nome] = linha
+        return pd.DataFrame(linhas)
+
+class PerfilStreaming:
+    """
+    Acumula o perfil de um conjunto de dados bloco a bloco.
+
+    Cada bloco é resumido de forma vetorizada (contagem, média, M2, mínimo,
+    máximo, nulos) e combinado ao acumulado pelas fórmulas de Chan, então a
+    memória não depende do número de linhas. Os quantis são aproximados a
+    partir de uma amostra uniforme de tamanho fixo (as `tamanho_amostra`
+    linhas com as menores chaves aleatórias), que também pode ser combinada
+    entre perfis calculados em separado.
+    """
+
+    def __init__(self, coluna_x='Temperatura', coluna_y='Vendas',
+                 tamanho_amostra=100_000, quantis=(0.25, 0.5, 0.75), seed=42):
+        self.coluna_x = coluna_x
+        self.coluna_y = coluna_y
+        self.tamanho_amostra = tamanho_amostra
+        self.quantis = tuple(quantis)
+        self.rng = np.random.default_rng(seed)
+        self.n_registros = 0
+        self.colunas = {}
+        # Momentos de x e y nas linhas em que ambos estão preenchidos
+        self.par = EstatisticasSuficientes()
+
+    def _estado(self, nome):
+        if nome not in self.colunas:
+            self.colunas[nome] = {
+                'n': 0, 'media': 0.0, 'm2': 0.0, 'nulos': 0, 'min': None, 'max': None,
+                'chaves': np.empty(0), 'amostra': np.empty(0), 'numerica': True
+            }
+        return self.colunas[nome]
+
+    def atualizar(self, bloco):
+        """Incorpora um DataFrame ao perfil."""
+        self.n_registros += len(bloco)
+        for nome in bloco.columns:
+            serie = bloco[nome]
+            estado = self._estado(nome)
+            nulos = serie.isnull().to_numpy()
+            estado['nulos'] += int(nulos.sum())
+            validos = serie[~nulos]
+            if len(validos) == 0:
+                continue
+
+            minimo, maximo = validos.min(), validos.max()
+            estado['min'] = minimo if estado['min'] is None else min(estado['min'], minimo)
+            estado['max'] = maximo if estado['max'] is None else max(estado['max'], maximo)
+
+            if not pd.api.types.is_numeric_dtype(serie):
+                estado['numerica'] = False
+                estado['n'] += len(validos)
+                continue
+
+            valores = validos.to_numpy(dtype=np.float64)
+            media_b = valores.mean()
+            m2_b = np.square(valores - media_b).sum()
+            estado['n'], estado['media'], estado['m2'] = combinar_momentos(
+                estado['n'], estado['media'], estado['m2'], len(valores), media_b, m2_b
+            )
+            self._amostrar(estado, valores, self.rng.random(len(valores)))
+
+        if self.coluna_x in bloco and self.coluna_y in bloco:
+            pares = bloco[[self.coluna_x, self.coluna_y]].dropna().to_numpy(dtype=np.float64)
+            self.par.atualizar(pares[:, 0], pares[:, 1])
+        return self
+
+    def _amostrar(self, estado, valores, chaves):
+        chaves = np.concatenate([estado['chaves'], chaves])
+        valores = np.concatenate([estado['amostra'], valores])
+        if len(chaves) > self.tamanho_amostra:
+            manter = np.argpartition(chaves, self.tamanho_amostra)[:self.tamanho_amostra]
+            chaves, valores = chaves[manter], valores[manter]
+        estado['chaves'], estado['amostra'] = chaves, valores
+
+    def combinar(self, outro):
+        """Combina com um perfil calculado em outro processo ou partição."""
+        self.n_registros += outro.n_registros
+        for nome, estado_b in outro.colunas.items():
+            estado = self._estado(nome)
+            estado['nulos'] += estado_b['nulos']
+            estado['numerica'] = estado['numerica'] and estado_b['numerica']
+            for chave, funcao in (('min', min), ('max', max)):
+                if estado_b[chave] is not None:
+                    estado[chave] = estado_b[chave] if estado[chave] is None else funcao(estado[chave], estado_b[chave])
+            if estado_b['numerica']:
+                estado['n'], estado['media'], estado['m2'] = combinar_momentos(
+                    estado['n'], estado['media'], estado['m2'],
+                    estado_b['n'], estado_b['media'], estado_b['m2']
+                )
+                self._amostrar(estado, estado_b['amostra'], estado_b['chaves'])
+            else:
+                estado['n'] += estado_b['n']
+        self.par.combinar(outro.par)
+        return self
+
+    def resultado(self):
+        """Gera o PerfilDados com as estatísticas acumuladas."""
+        colunas = {}
+        for nome, estado in self.colunas.items():
+            estat = EstatisticasColuna(
+                contagem=estado['n'], nulos=estado['nulos'],
+                minimo=estado['min'], maximo=estado['max']
+            )
+            if estado['numerica'] and estado['n'] > 0:
+                estat.media = estado['media']
+                estat.variancia = estado['m2'] / (estado['n'] - 1) if estado['n'] > 1 else float('nan')
+                estat.desvio_padrao = float(np.sqrt(estat.variancia))
+                estat.quantis = dict(zip(self.quantis, np.quantile(estado['amostra'], self.quantis)))
+            colunas[nome] = estat
+
+        perfil = PerfilDados(n_registros=self.n_registros, colunas=colunas)
+        if self.par.n > 1:
+            perfil.covariancia = self.par.c_xy / (self.par.n - 1)
+            perfil.correlacao = self.par.c_xy / np.sqrt(self.par.m2_x * self.par.m2_y)
+        return perfil
+
+def _indices_bins(valores, inicio, fim, n_bins):
+    """Bin de cada valor em n_bins faixas iguais de [inicio, fim]; valores fora vão para as pontas."""
+    largura = (fim - inicio) / n_bins if fim > inicio else 1.0
+    indices = np.floor((valores - inicio) / largura).astype(np.int64)
+    return np.clip(indices, 0, n_bins - 1)
+
+def quantis_de_histograma(contagens, bordas, quantis):
+    """Quantis aproximados a partir das contagens (interpolação linear dentro do bin)."""
+    acumulado = np.concatenate([[0], np.cumsum(contagens)])
+    return np.interp(np.asarray(quantis) * acumulado[-1], acumulado, bordas)
+
+class AgregadosDistribuicao:
+    """
+    Contagens para gráficos de distribuição e dispersão de um par (x, y).
+
+    Guarda o histograma de x, o de y e a contagem 2-D (x, y) em bins de
+    largura fixa, além de mínimo e máximo. Cada atualização é um np.bincount
+    vetorizado; agregados de blocos ou processos diferentes com os mesmos
+    limites podem ser combinados. O tamanho do gráfico depende só do número
+    de bins, não do número de linhas. Os quartis do boxplot saem das
+    contagens, com erro de no máximo um bin.
+    """
+
+    def __init__(self, limites_x, limites_y, n_bins=100, n_bins_2d=60):
+        self.bordas_x = np.linspace(*limites_x, n_bins + 1)
+        self.bordas_y = np.linspace(*limites_y, n_bins + 1)
+        self.bordas_2d_x = np.linspace(*limites_x, n_bins_2d + 1)
+        self.bordas_2d_y = np.linspace(*limites_y, n_bins_2d + 1)
+        self.hist_x = np.zeros(n_bins, dtype=np.int64)
+        self.hist_y = np.zeros(n_bins, dtype=np.int64)
+        self.hist_2d = np.zeros((n_bins_2d, n_bins_2d), dtype=np.int64)
+        self.n = 0
+        self.minimo = np.array([np.inf, np.inf])
+        self.maximo = np.array([-np.inf, -np.inf])
+
+    @classmethod
+    def de_valores(cls, x, y, n_bins=100, n_bins_2d=60):
+        """Agrega arrays já em memória (limites = mínimo e máximo dos dados)."""
+        x = np.asarray(x, dtype=np.float64).reshape(-1)
+        y = np.asarray(y, dtype=np.float64).reshape(-1)
+        return cls((x.min(), x.max()), (y.min(), y.max()), n_bins, n_bins_2d).atualizar(x, y)
+
+    @classmethod
+    def de_perfil(cls, perfil, coluna_x='Temperatura', coluna_y='Vendas', n_bins=100, n_bins_2d=60):
+        """Agregados vazios com os limites de um PerfilDados (para preencher lendo em blocos)."""
+        x, y = perfil.colunas[coluna_x], perfil.colunas[coluna_y]
+        return cls((float(x.minimo), float(x.maximo)), (float(y.minimo), float(y.maximo)), n_bins, n_bins_2d)
+
+    def atualizar(self, x, y):
+        """Incorpora um bloco de pares (x, y); linhas com NaN são ignoradas."""
+        x = np.asarray(x, dtype=np.float64).reshape(-1)
+        y = np.asarray(y, dtype=np.float64).reshape(-1)
+        validos = ~(np.isnan(x) | np.isnan(y))
+        x, y = x[validos], y[validos]
+        if len(x) == 0:
+            return self
+
+        n_bins, n_bins_2d = len(self.hist_x), len(self.hist_2d)
+        self.hist_x += np.bincount(_indices_bins(x, self.bordas_x[0], self.bordas_x[-1], n_bins), minlength=n_bins)
+        self.hist_y += np.bincount(_indices_bins(y, self.bordas_y[0], self.bordas_y[-1], n_bins), minlength=n_bins)
+        celulas = (_indices_bins(x, self.bordas_2d_x[0], self.bordas_2d_x[-1], n_bins_2d) * n_bins_2d
+                   + _indices_bins(y, self.bordas_2d_y[0], self.bordas_2d_y[-1], n_bins_2d))
+        self.hist_2d += np.bincount(celulas, minlength=n_bins_2d * n_bins_2d).reshape(n_bins_2d, n_bins_2d)
+        self.n += len(x)
+        self.minimo = np.minimum(self.minimo, [x.min(), y.min()])
+        self.maximo = np.maximum(self.maximo, [x.max(), y.max()])
+        return self
+
+    def combinar(self, outro):
+        """Soma agregados com os mesmos limites e bins."""
+        if not (np.array_equal(self.bordas_x, outro.bordas_x) and np.array_equal(self.bordas_y, outro.bordas_y)
+                and np.array_equal(self.bordas_2d_x, outro.bordas_2d_x)
+                and np.array_equal(self.bordas_2d_y, outro.bordas_2d_y)):
+            raise ValueError("Só é possível combinar agregados com os mesmos limites e bins.")
+        self.hist_x += outro.hist_x
+        self.hist_y += outro.hist_y
+        self.hist_2d += outro.hist_2d
+        self.n += outro.n
+        self.minimo = np.minimum(self.minimo, outro.minimo)
+        self.maximo = np.maximum(self.maximo, outro.maximo)
+        return self
+
+    def resumo_boxplot(self, eixo='x'):
+        """Estatísticas do boxplot (formato de Axes.bxp): quartis e bigodes de Tukey."""
+        contagens, bordas, i = (self.hist_x, self.bordas_x, 0) if eixo == 'x' else (self.hist_y, self.bordas_y, 1)
+        q1, mediana, q3 = quantis_de_histograma(contagens, bordas, [0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        return {
+            'q1': q1, 'med': mediana, 'q3': q3,
+            'whislo': max(self.minimo[i], q1 - 1.5 * iqr),
+            'whishi': min(self.maximo[i], q3 + 1.5 * iqr),
+            'fliers': np.empty(0)
+        }
@@ -1,61 +1,196 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+
+# Dados iniciais da imagem
+DADOS_INICIAIS = {
+    'Data': ['01/01/2025', '02/01/2025', '03/01/2025', '04/01/2025', '05/01/2025',
+            '06/01/2025', '07/01/2025', '08/01/2025', '09/01/2025'],
+    'Vendas': [120, 150, 100, 180, 130, 170, 140, 160, 110],
+    'Temperatura': [30, 32, 28, 33, 29, 31, 30, 32, 27]
+}
+
+# Variação de temperatura de 20 a 37 graus
+TEMPERATURA_MIN = 20
+TEMPERATURA_MAX = 37
+
+FORMATO_DATA = '%d/%m/%Y'
+
+# Datas sequenciais a partir do dia seguinte aos dados iniciais. O pandas só
+# representa datas até 2262, então séries maiores recomeçam a contagem de dias.
+PRIMEIRA_DATA = np.datetime64('2025-01-10', 'D')
+MAX_DIAS = int((np.datetime64(pd.Timestamp.max.date(), 'D') - PRIMEIRA_DATA).astype(int))
+
+# Posições dos caracteres de AAAA-MM-DD para montar DD/MM/AAAA
+ORDEM_DATA_BR = [8, 9, 4, 5, 6, 7, 0, 1, 2, 3]
+
+def _dados_iniciais(formatar_datas):
+    df_inicial = pd.DataFrame(DADOS_INICIAIS)
+    if not formatar_datas:
+        df_inicial['Data'] = pd.to_datetime(df_inicial['Data'], format=FORMATO_DATA)
+    return df_inicial
+
+def _formatar_datas(datas):
+    """Formata datas datetime64[D] como dd/mm/aaaa sem strftime linha a linha."""
+    iso = np.datetime_as_string(datas, unit='D').astype('<U10')
+    caracteres = iso.view(np.uint32).reshape(-1, 10)[:, ORDEM_DATA_BR]
+    caracteres[:, [2, 5]] = ord('/')
+    return np.ascontiguousarray(caracteres).view('<U10').ravel()
+
+def gerar_dados_em_blocos(n_samples, tamanho_bloco=1_000_000, seed=42, formatar_datas=True):
+    """
+    Gera os dados sintéticos em DataFrames de até `tamanho_bloco` linhas.
+
+    Todo o cálculo é vetorizado (temperaturas sorteadas por índice, vendas por
+    consulta em array, datas por aritmética de datetime64) e a memória usada depende só do
+    tamanho do bloco. Temperaturas e ruído vêm de geradores independentes
+    derivados de `seed`, então o resultado é o mesmo para qualquer tamanho de
+    bloco. Com formatar_datas=False, a coluna Data fica como datetime64 em vez
+    de texto dd/mm/aaaa, o que é bem mais rápido para volumes grandes.
+    """
+    df_inicial = _dados_iniciais(formatar_datas)
+    n_iniciais = len(df_inicial)
+
+    # Relação observada nos dados da imagem: Vendas ≈ 10*Temperatura - 180 + ruído
+    rng_base, rng_temperatura, rng_ruido = [
+        np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(3)
+    ]
+    temperaturas = np.arange(TEMPERATURA_MIN, TEMPERATURA_MAX + 1)
+    vendas_base = np.maximum(
+        10 * temperaturas - 180 + rng_base.normal(0, 15, size=temperaturas.size), 50
+    ).round().astype(np.int64)
+
+    for inicio in range(0, n_samples, tamanho_bloco):
+        fim = min(inicio + tamanho_bloco, n_samples)
+        partes = []
+
+        # Linhas dos dados iniciais que caem neste bloco
+        if inicio < n_iniciais:
+            partes.append(df_inicial.iloc[inicio:min(fim, n_iniciais)])
+
+        # Linhas geradas: índices [j0, j1) da parte sintética
+        j0 = max(inicio, n_iniciais) - n_iniciais
+        j1 = fim - n_iniciais
+        if j1 > j0:
+            n = j1 - j0
+            indices_temp = rng_temperatura.integers(0, temperaturas.size, size=n)
+            vendas = vendas_base[indices_temp] + rng_ruido.integers(-10, 11, size=n)
+
+            datas = PRIMEIRA_DATA + np.arange(j0, j1) % MAX_DIAS
+            partes.append(pd.DataFrame({
+                'Data': _formatar_datas(datas) if formatar_datas else datas.astype('datetime64[ns]'),
+                'Vendas': vendas,
+                'Temperatura': temperaturas[indices_temp]
+            }))
+
+        yield pd.concat(partes, ignore_index=True) if len(partes) > 1 else partes[0].reset_index(drop=True)
 
 # Função para gerar dados sintéticos
-def gerar_dados_sinteticos(n_samples=100):
-    # Dados iniciais da imagem
-    dados_iniciais = {
-        'Data': ['01/01/2025', '02/01/2025', '03/01/2025', '04/01/2025', '05/01/2025', 
-                '06/01/2025', '07/01/2025', '08/01/2025', '09/01/2025'],
-        'Vendas': [120, 150, 100, 180, 130, 170, 140, 160, 110],
-        'Temperatura': [30, 32, 28, 33, 29, 31, 30, 32, 27]
-    }
-    
-    df_inicial = pd.DataFrame(dados_iniciais)
-    
-    # Se já temos 100 amostras, retornamos
-    if len(df_inicial) >= n_samples:
-        return df_inicial.iloc[:n_samples]
-    
-    # Caso contrário, geramos mais dados
-    # Primeiro, vamos extrair a relação entre temperatura e vendas
-    # para manter a correlação observada nos dados originais
-    temperaturas = np.arange(20, 38)  # Variação de temperatura de 20 a 37 graus
-    
-    # Adicionar uma variação aleatória baseada na relação observada:
-    # Da imagem observamos aproximadamente: Vendas ≈ 10*Temperatura - 180 + ruído
-    vendas = [max(10 * temp - 180 + np.random.normal(0, 15), 50) for temp in temperaturas]
-    vendas = [int(round(v)) for v in vendas]  # Arredondamos para números inteiros
-    
-    # Gerar datas sequenciais a partir da última data
-    ultima_data = datetime.strptime(df_inicial['Data'].iloc[-1], '%d/%m/%Y')
-    datas = [(ultima_data + timedelta(days=i+1)).strftime('%d/%m/%Y') 
-             for i in range(n_samples - len(df_inicial))]
-    
-    # Gerar temperaturas e vendas correspondentes
-    np.random.seed(42)  # Para reprodutibilidade
-    temps_adicionais = np.random.choice(temperaturas, size=n_samples - len(df_inicial))
-    vendas_adicionais = [vendas[np.where(temperaturas == t)[0][0]] + np.random.randint(-10, 11) 
-                         for t in temps_adicionais]
-    
-    # Criar DataFrame adicional
-    df_adicional = pd.DataFrame({
+def gerar_dados_sinteticos(n_samples=100, seed=42, formatar_datas=True):
+    """Gera n_samples linhas de dados sintéticos em um único DataFrame."""
+    blocos = gerar_dados_em_blocos(
+        n_samples, tamanho_bloco=max(n_samples, 1), seed=seed, formatar_datas=formatar_datas
+    )
+    return next(blocos, _dados_iniciais(formatar_datas).iloc[:0])
+
+def salvar_csv_em_blocos(caminho, n_samples, tamanho_bloco=1_000_000, seed=42):
+    """Gera e grava o CSV bloco a bloco, sem manter todo o dataset em memória."""
+    for i, bloco in enumerate(gerar_dados_em_blocos(n_samples, tamanho_bloco, seed)):
+        bloco.to_csv(caminho, index=False, mode='w' if i == 0 else 'a', header=(i == 0))
+
+def _gerar_loja(tarefa):
+    """Gera e grava todos os anos de uma loja (executado em um processo do pool)."""
+    diretorio, loja, semente, data_inicio, data_fim = tarefa
+    rng = np.random.default_rng(semente)
+
+    # Parâmetros próprios da loja: clima, sensibilidade à temperatura e ruído
+    temperatura_media = rng.normal(27, 2.5)
+    amplitude = rng.uniform(3, 7)
+    inclinacao = rng.uniform(6, 14)
+    base = rng.uniform(10, 60)
+    desvio_ruido = rng.uniform(5, 20)
+
+    datas = pd.date_range(data_inicio, data_fim, freq='D')
+    n = len(datas)
+
+    # Sazonalidade do hemisfério sul: pico de calor no início de janeiro
+    sazonal = amplitude * np.cos(2 * np.pi * (datas.dayofyear.to_numpy() - 15) / 365.25)
+    temperaturas = np.clip(
+        temperatura_media + sazonal + rng.normal(0, 1.5, size=n), TEMPERATURA_MIN - 8, TEMPERATURA_MAX + 5
+    ).round(1)
+    vendas = np.maximum(
+        inclinacao * (temperaturas - TEMPERATURA_MIN) + base + rng.normal(0, desvio_ruido, size=n), 0
+    ).round()
+
+    dados = pd.DataFrame({
         'Data': datas,
-        'Temperatura': temps_adicionais,
-        'Vendas': vendas_adicionais
+        'Loja': loja,
+        'Temperatura': temperaturas.astype(np.float32),
+        'Vendas': vendas.astype(np.int32)
     })
-    
-    # Concatenar com os dados originais
-    df_completo = pd.concat([df_inicial, df_adicional], ignore_index=True)
-    
-    # Garantir que temos exatamente n_samples
-    return df_completo.iloc[:n_samples]
+
+    arquivos = []
+    for ano, dados_ano in dados.groupby(datas.year, sort=True):
+        pasta = os.path.join(diretorio, f'loja={loja}', f'ano={ano}')
+        os.makedirs(pasta, exist_ok=True)
+        caminho = os.path.join(pasta, 'dados.parquet')
+        dados_ano.reset_index(drop=True).to_parquet(caminho, index=False)
+        arquivos.append(caminho)
+    return loja, n, arquivos
+
+def gerar_dados_lojas(diretorio, n_lojas, data_inicio='2020-01-01', data_fim='2024-12-31',
+                      seed=42, n_processos=None):
+    """
+    Gera dados diários de várias lojas em paralelo, particionados por loja e ano.
+
+    Cada loja recebe sua própria semente derivada de SeedSequence(seed).spawn,
+    e todo o sorteio de uma loja acontece em um único processo, na mesma ordem.
+    Assim, uma mesma seed gera arquivos idênticos byte a byte para qualquer
+    número de processos. A saída fica em
+    <diretorio>/loja=<id>/ano=<aaaa>/dados.parquet (particionamento estilo Hive).
+    """
+    sementes = np.random.SeedSequence(seed).spawn(n_lojas)
+    tarefas = [
+        (diretorio, f'L{i:04d}', semente, data_inicio, data_fim)
+        for i, semente in enumerate(sementes)
+    ]
+
+    n_processos = n_processos or os.cpu_count() or 1
+    if n_processos == 1:
+        resultados = list(map(_gerar_loja, tarefas))
+    else:
+        with ProcessPoolExecutor(max_workers=n_processos) as executor:
+            resultados = list(executor.map(
+                _gerar_loja, tarefas, chunksize=max(1, n_lojas // (n_processos * 4))
+            ))
+
+    total_linhas = sum(n for _, n, _ in resultados)
+    total_arquivos = sum(len(arquivos) for _, _, arquivos in resultados)
+    print(f"{n_lojas} lojas geradas: {total_linhas} registros em {total_arquivos} arquivos em '{diretorio}'")
+    return resultados
 
 if __name__ == "__main__":
-    # Gerar 100 amostras
-    df_completo = gerar_dados_sinteticos(100)
-    
-    # Salvar no arquivo CSV
-    df_completo.to_csv('inputs/base_vendas_sorvete.csv', index=False)
-    print(f"Dataset gerado com {len(df_completo)} amostras e salvo em 'inputs/base_vendas_sorvete.csv'")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos de vendas de sorvete.")
+    parser.add_argument('--amostras', type=int, default=100)
+    parser.add_argument('--bloco', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--saida', default='inputs/base_vendas_sorvete.csv')
+    parser.add_argument('--lojas', type=int, default=0,
+                        help="Gera dados de N lojas em Parquet particionado (em vez do CSV único)")
+    parser.add_argument('--inicio', default='2020-01-01')
+    parser.add_argument('--fim', default='2024-12-31')
+    parser.add_argument('--processos', type=int, default=None)
+    parser.add_argument('--diretorio', default='inputs/lojas')
+    args = parser.parse_args()
+
+    if args.lojas:
+        gerar_dados_lojas(
+            args.diretorio, args.lojas, args.inicio, args.fim, args.seed, args.processos
+        )
+    else:
+        # Gerar as amostras e salvar no arquivo CSV
+        salvar_csv_em_blocos(args.saida, args.amostras, args.bloco, args.seed)
+        print(f"Dataset gerado com {args.amostras} amostras e salvo em '{args.saida}'")
@@ -0,0 +1,368 @@
+import io
+import os
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import matplotlib
+import matplotlib.pyplot as plt
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
+import numpy as np
+import seaborn as sns
+
+from estatisticas import AgregadosDistribuicao
+
+logger = logging.getLogger(__name__)
+
+# Acima deste número de linhas, os gráficos são feitos a partir de contagens
+# (histogramas e mapas de calor) em vez de um ponto por linha
+LIMITE_PONTOS = 50_000
+
+def _salvar(fig, caminho):
+    """Salva a figura e a fecha sempre, mesmo se a gravação falhar."""
+    try:
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        fig.tight_layout()
+        fig.savefig(caminho)
+    finally:
+        plt.close(fig)
+    return caminho
+
+def _usar_agregados(n_linhas, agregar):
+    return n_linhas > LIMITE_PONTOS if agregar is None else agregar
+
+def _histograma_agregado(eixo, contagens, bordas):
+    """Histograma a partir das contagens, com uma densidade suavizada no lugar do KDE."""
+    eixo.stairs(contagens, bordas, fill=True, alpha=0.5)
+    nucleo = np.exp(-0.5 * (np.arange(-6, 7) / 2.0) ** 2)
+    # Dividir pela massa do núcleo dentro do intervalo evita a queda nas bordas
+    suavizada = (np.convolve(contagens, nucleo, mode='same')
+                 / np.convolve(np.ones(len(contagens)), nucleo, mode='same'))
+    eixo.plot((bordas[:-1] + bordas[1:]) / 2, suavizada, linewidth=1.5)
+    eixo.set_ylabel('Count')
+
+def _mapa_calor(eixo, agregados):
+    """Contagens 2-D (x, y) em escala logarítmica; bins vazios ficam em branco."""
+    contagens = np.ma.masked_equal(agregados.hist_2d.T, 0)
+    malha = eixo.pcolormesh(agregados.bordas_2d_x, agregados.bordas_2d_y, contagens,
+                            norm=LogNorm(), cmap='Blues')
+    eixo.figure.colorbar(malha, ax=eixo, label='Registros')
+
+def graficos_dados(temperatura, vendas, diretorio='outputs', agregar=None):
+    """
+    Distribuição (histogramas e boxplots) e correlação entre temperatura e vendas.
+
+    Com mais de LIMITE_PONTOS linhas (ou agregar=True), os dados são
+    resumidos em contagens antes de chegar ao matplotlib (graficos_agregados).
+    """
+    if _usar_agregados(len(temperatura), agregar):
+        return graficos_agregados(AgregadosDistribuicao.de_valores(temperatura, vendas), diretorio)
+
+    fig, eixos = plt.subplots(2, 2, figsize=(16, 10))
+    try:
+        # Histograma da temperatura
+        sns.histplot(temperatura, kde=True, ax=eixos[0, 0])
+        eixos[0, 0].set_title('Distribuição da Temperatura')
+        eixos[0, 0].set_xlabel('Temperatura (°C)')
+
+        # Histograma das vendas
+        sns.histplot(vendas, kde=True, ax=eixos[0, 1])
+        eixos[0, 1].set_title('Distribuição das Vendas')
+        eixos[0, 1].set_xlabel('Vendas de Sorvete')
+
+        # Boxplot da temperatura
+        sns.boxplot(x=temperatura, ax=eixos[1, 0])
+        eixos[1, 0].set_title('Boxplot da Temperatura')
+        eixos[1, 0].set_xlabel('Temperatura (°C)')
+
+        # Boxplot das vendas
+        sns.boxplot(x=vendas, ax=eixos[1, 1])
+        eixos[1, 1].set_title('Boxplot das Vendas')
+        eixos[1, 1].set_xlabel('Vendas de Sorvete')
+    except Exception:
+        plt.close(fig)
+        raise
+    caminhos = [_salvar(fig, os.path.join(diretorio, 'distribuicao_dados.png'))]
+
+    # Visualizar correlação
+    fig, eixo = plt.subplots(figsize=(10, 6))
+    try:
+        sns.scatterplot(x=temperatura, y=vendas, ax=eixo)
+        eixo.set_title('Correlação entre Temperatura e Vendas')
+        eixo.set_xlabel('Temperatura (°C)')
+        eixo.set_ylabel('Vendas de Sorvete')
+        eixo.grid(True, alpha=0.3)
+    except Exception:
+        plt.close(fig)
+        raise
+    caminhos.append(_salvar(fig, os.path.join(diretorio, 'correlacao.png')))
+    return caminhos
+
+def graficos_agregados(agregados, diretorio='outputs'):
+    """
+    Os mesmos gráficos de graficos_dados a partir de um AgregadosDistribuicao.
+
+    Só as contagens chegam ao matplotlib: o tempo de renderização e o tamanho
+    dos PNGs não dependem do número de linhas. Os boxplots não mostram os
+    pontos extremos individualmente.
+    """
+    fig, eixos = plt.subplots(2, 2, figsize=(16, 10))
+    try:
+        _histograma_agregado(eixos[0, 0], agregados.hist_x, agregados.bordas_x)
+        eixos[0, 0].set_title('Distribuição da Temperatura')
+        eixos[0, 0].set_xlabel('Temperatura (°C)')
+
+        _histograma_agregado(eixos[0, 1], agregados.hist_y, agregados.bordas_y)
+        eixos[0, 1].set_title('Distribuição das Vendas')
+        eixos[0, 1].set_xlabel('Vendas de Sorvete')
+
+        eixos[1, 0].bxp([agregados.resumo_boxplot('x')], vert=False, showfliers=False)
+        eixos[1, 0].set_yticks([])
+        eixos[1, 0].set_title('Boxplot da Temperatura')
+        eixos[1, 0].set_xlabel('Temperatura (°C)')
+
+        eixos[1, 1].bxp([agregados.resumo_boxplot('y')], vert=False, showfliers=False)
+        eixos[1, 1].set_yticks([])
+        eixos[1, 1].set_title('Boxplot das Vendas')
+        eixos[1, 1].set_xlabel('Vendas de Sorvete')
+    except Exception:
+        plt.close(fig)
+        raise
+    caminhos = [_salvar(fig, os.path.join(diretorio, 'distribuicao_dados.png'))]
+
+    fig, eixo = plt.subplots(figsize=(10, 6))
+    try:
+        _mapa_calor(eixo, agregados)
+        eixo.set_title(f'Correlação entre Temperatura e Vendas ({agregados.n:,} registros)')
+        eixo.set_xlabel('Temperatura (°C)')
+        eixo.set_ylabel('Vendas de Sorvete')
+        eixo.grid(True, alpha=0.3)
+    except Exception:
+        plt.close(fig)
+        raise
+    caminhos.append(_salvar(fig, os.path.join(diretorio, 'correlacao.png')))
+    return caminhos
+
+def grafico_resultados(X, y, x_linha, y_linha, y_test=None, y_pred=None,
+                       caminho='outputs/resultados_modelo.png', agregar=None):
+    """
+    Dados com a linha de regressão e, se houver, valores reais vs. previstos.
+
+    Com mais de LIMITE_PONTOS linhas (ou agregar=True), usa mapas de calor
+    das contagens (grafico_resultados_agregado) em vez de um ponto por linha.
+    """
+    if _usar_agregados(len(y), agregar):
+        previsoes = (AgregadosDistribuicao.de_valores(y_test, y_pred)
+                     if y_test is not None and y_pred is not None else None)
+        return grafico_resultados_agregado(
+            AgregadosDistribuicao.de_valores(X, y), x_linha, y_linha, previsoes, caminho
+        )
+
+    fig, eixos = plt.subplots(1, 2, figsize=(12, 6))
+    try:
+        # Plot 1: Dados e linha de regressão
+        sns.scatterplot(x=np.ravel(X), y=y, color='blue', alpha=0.6, ax=eixos[0])
+        eixos[0].plot(x_linha, y_linha, color='red', linewidth=2)
+        eixos[0].set_title('Vendas x Temperatura')
+        eixos[0].set_xlabel('Temperatura (°C)')
+        eixos[0].set_ylabel('Vendas de Sorvete')
+        eixos[0].grid(True, alpha=0.3)
+
+        # Plot 2: Previsão vs Real (se disponível)
+        if y_test is not None and y_pred is not None:
+            eixos[1].scatter(y_test, y_pred, color='green', alpha=0.6)
+
+            # Linha identidade (y=x)
+            min_val = min(np.min(y_test), np.min(y_pred))
+            max_val = max(np.max(y_test), np.max(y_pred))
+            eixos[1].plot([min_val, max_val], [min_val, max_val], 'r--')
+
+            eixos[1].set_title('Valores Reais vs. Previstos')
+            eixos[1].set_xlabel('Vendas Reais')
+            eixos[1].set_ylabel('Vendas Previstas')
+            eixos[1].grid(True, alpha=0.3)
+        else:
+            eixos[1].set_visible(False)
+    except Exception:
+        plt.close(fig)
+        raise
+    return _salvar(fig, caminho)
+
+def grafico_resultados_agregado(agregados, x_linha, y_linha, agregados_previsao=None,
+                                caminho='outputs/resultados_modelo.png'):
+    """grafico_resultados a partir de contagens: (X, y) e, se houver, (real, previsto)."""
+    fig, eixos = plt.subplots(1, 2, figsize=(12, 6))
+    try:
+        _mapa_calor(eixos[0], agregados)
+        eixos[0].plot(x_linha, y_linha, color='red', linewidth=2)
+        eixos[0].set_title('Vendas x Temperatura')
+        eixos[0].set_xlabel('Temperatura (°C)')
+        eixos[0].set_ylabel('Vendas de Sorvete')
+        eixos[0].grid(True, alpha=0.3)
+
+        if agregados_previsao is not None:
+            _mapa_calor(eixos[1], agregados_previsao)
+            min_val = agregados_previsao.minimo.min()
+            max_val = agregados_previsao.maximo.max()
+            eixos[1].plot([min_val, max_val], [min_val, max_val], 'r--')
+            eixos[1].set_title('Valores Reais vs. Previstos')
+            eixos[1].set_xlabel('Vendas Reais')
+            eixos[1].set_ylabel('Vendas Previstas')
+            eixos[1].grid(True, alpha=0.3)
+        else:
+            eixos[1].set_visible(False)
+    except Exception:
+        plt.close(fig)
+        raise
+    return _salvar(fig, caminho)
+
+def grafico_curva_previsao(temperaturas, previsoes, dpi=100):
+    """
+    Gráfico da curva de previsão do dashboard, renderizado uma vez em PNG.
+
+    Retorna (png, escala): `escala` guarda a posição dos eixos em pixels e os
+    limites dos dados, para que marcar_ponto desenhe a previsão atual sobre a
+    imagem sem refazer o gráfico. Usa Figure diretamente (sem pyplot), que é
+    seguro nas threads do Streamlit.
+    """
+    fig = Figure(figsize=(10, 6), dpi=dpi)
+    ax = fig.subplots()
+
+    # Sombreamento para faixas de temperatura
+    ax.axvspan(20, 25, alpha=0.1, color='blue', label='Frio')
+    ax.axvspan(25, 32, alpha=0.1, color='orange', label='Moderado')
+    ax.axvspan(32, 38, alpha=0.1, color='red', label='Quente')
+
+    # Linha de previsão
+    ax.plot(temperaturas, previsoes, 'r-', linewidth=2.5, label='Modelo de previsão')
+
+    # Estilizar o gráfico
+    ax.set_title('Relação entre Temperatura e Vendas Previstas', fontsize=14)
+    ax.set_xlabel('Temperatura (°C)', fontsize=12)
+    ax.set_ylabel('Vendas Previstas (unidades)', fontsize=12)
+    ax.grid(True, alpha=0.3, linestyle='--')
+    ax.legend()
+
+    # Anotações das faixas
+    topo = np.max(previsoes) * 0.9
+    ax.text(22.5, topo, "Frio", fontsize=9, ha='center', va='center', alpha=0.7, color='blue')
+    ax.text(28.5, topo, "Moderado", fontsize=9, ha='center', va='center', alpha=0.7, color='darkorange')
+    ax.text(35, topo, "Quente", fontsize=9, ha='center', va='center', alpha=0.7, color='red')
+
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi)
+    escala = {
+        'altura': fig.bbox.height,
+        'eixos': tuple(ax.bbox.bounds),
+        'xlim': ax.get_xlim(),
+        'ylim': ax.get_ylim(),
+    }
+    return buffer.getvalue(), escala
+
+def marcar_ponto(png, escala, x, y, raio=8, cor=(0, 0, 255)):
+    """Desenha um ponto (coordenadas dos dados) sobre o PNG de grafico_curva_previsao."""
+    from PIL import Image, ImageDraw
+
+    esquerda, base, largura, altura = escala['eixos']
+    (x0, x1), (y0, y1) = escala['xlim'], escala['ylim']
+    px = esquerda + (x - x0) / (x1 - x0) * largura
+    # Pixels da imagem crescem para baixo; os do matplotlib, para cima
+    py = escala['altura'] - (base + (y - y0) / (y1 - y0) * altura)
+
+    imagem = Image.open(io.BytesIO(png)).convert('RGB')
+    ImageDraw.Draw(imagem).ellipse((px - raio, py - raio, px + raio, py + raio), fill=cor, outline='white')
+    return imagem
+
+def usar_backend_sem_janela():
+    """
+    Troca o matplotlib para o backend Agg: os gráficos são apenas salvos em arquivo.
+
+    Chamado pelos pontos de entrada (CLI do pipeline) e pelos processos de
+    renderização, nunca na importação, para não mudar o backend de quem só
+    importa o módulo (ex.: um notebook com plt.show()).
+    """
+    matplotlib.use('Agg')
+
+class RenderizadorGraficos:
+    """
+    Renderiza gráficos em um pool de processos, fora do caminho do treino.
+
+    enviar() agenda a função de gráfico e retorna um Future imediatamente;
+    aguardar() espera os gráficos pendentes e executa os callbacks ao_concluir
+    (ex.: registrar a imagem no MLflow) no processo principal. Os processos
+    usam o método 'spawn' (seguro com as threads do MLflow) e o backend Agg.
+    Com ativo=False nada é renderizado (retreinos agendados em produção); com
+    n_processos=0 os gráficos são gerados no próprio processo, que é o padrão
+    em máquinas de um só núcleo, onde um processo extra só adicionaria custo.
+    """
+
+    def __init__(self, ativo=True, n_processos=None):
+        self.ativo = ativo
+        if n_processos is None:
+            n_processos = 1 if (os.cpu_count() or 1) > 1 else 0
+        self.n_processos = n_processos
+        self._executor = None
+        self._pendentes = []
+
+    def iniciar(self):
+        """
+        Sobe o pool de processos antecipadamente.
+
+        Processos 'spawn' precisam importar matplotlib/seaborn (e o módulo
+        principal) antes do primeiro gráfico; iniciando cedo, isso acontece
+        enquanto o pipeline carrega os dados e treina.
+        """
+        if self.ativo and self.n_processos > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.n_processos, mp_context=multiprocessing.get_context('spawn'),
+                initializer=usar_backend_sem_janela
+            )
+            for _ in range(self.n_processos):
+                self._executor.submit(os.getpid)
+        return self
+
+    def enviar(self, funcao, *args, ao_concluir=None, **kwargs):
+        """Agenda um gráfico. Retorna o Future (ou None se os gráficos estiverem desativados)."""
+        if not self.ativo:
+            return None
+        if self.n_processos == 0:
+            futuro = Future()
+            try:
+                futuro.set_result(funcao(*args, **kwargs))
+            except Exception as e:
+                futuro.set_exception(e)
+        else:
+            self.iniciar()
+            futuro = self._executor.submit(funcao, *args, **kwargs)
+        self._pendentes.append((futuro, ao_concluir))
+        return futuro
+
+    def aguardar(self):
+        """Espera os gráficos pendentes; falhas são registradas no log sem interromper o pipeline."""
+        caminhos = []
+        pendentes, self._pendentes = self._pendentes, []
+        for futuro, ao_concluir in pendentes:
+            try:
+                resultado = futuro.result()
+                if ao_concluir is not None:
+                    ao_concluir(resultado)
+                caminhos.append(resultado)
+            except Exception as e:
+                logger.error(f"Falha ao gerar gráfico: {e}")
+        return caminhos
+
+    def encerrar(self):
+        """Espera os gráficos pendentes e encerra o pool de processos."""
+        caminhos = self.aguardar()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        return caminhos
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.encerrar()
@@ -0,0 +1,187 @@
+import threading
+import time
+from bisect import bisect_left
+
+# Limites dos buckets (segundos) para latências de requisição e de previsão
+BUCKETS_LATENCIA = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# Limites dos buckets para tamanhos de lote
+BUCKETS_LOTE = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536)
+
+def formatar_rotulos(nomes, valores, extra=''):
+    pares = [f'{nome}="{valor}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+class Contador:
+    """Contador monotônico com rótulos, no formato do Prometheus."""
+
+    def __init__(self, nome, descricao, rotulos=()):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = rotulos
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, *valores_rotulos, valor=1):
+        with self._lock:
+            self._valores[valores_rotulos] = self._valores.get(valores_rotulos, 0) + valor
+
+    def renderizar(self):
+        linhas = [f'# HELP {self.nome} {self.descricao}', f'# TYPE {self.nome} counter']
+        for valores_rotulos, valor in sorted(self._valores.items()):
+            linhas.append(f'{self.nome}{formatar_rotulos(self.rotulos, valores_rotulos)} {valor}')
+        return linhas
+
+class Histograma:
+    """
+    Histograma com buckets fixos, no formato do Prometheus.
+
+    Cada observação custa uma busca binária e dois incrementos; os valores
+    acumulados de cada bucket só são calculados ao renderizar /metrics.
+    """
+
+    def __init__(self, nome, descricao, buckets, rotulos=()):
+        self.nome = nome
+        self.descricao = descricao
+        self.buckets = tuple(buckets)
+        self.rotulos = rotulos
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *valores_rotulos):
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(valores_rotulos)
+            if serie is None:
+                serie = self._series[valores_rotulos] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def renderizar(self):
+        linhas = [f'# HELP {self.nome} {self.descricao}', f'# TYPE {self.nome} histogram']
+        for valores_rotulos, (contagens, soma) in sorted(self._series.items()):
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + ('+Inf',), contagens):
+                acumulado += contagem
+                rotulos = formatar_rotulos(self.rotulos, valores_rotulos, f'le="{limite}"')
+                linhas.append(f'{self.nome}_bucket{rotulos} {acumulado}')
+            rotulos = formatar_rotulos(self.rotulos, valores_rotulos)
+            linhas.append(f'{self.nome}_sum{rotulos} {soma}')
+            linhas.append(f'{self.nome}_count{rotulos} {acumulado}')
+        return linhas
+
+class MetricasAPI:
+    """Métricas operacionais da API de previsão."""
+
+    def __init__(self):
+        self.requisicoes = Contador(
+            'api_requisicoes_total', 'Requisições atendidas por endpoint, método e status.',
+            rotulos=('endpoint', 'metodo', 'status')
+        )
+        self.excecoes = Contador(
+            'api_excecoes_total', 'Exceções não tratadas por endpoint.', rotulos=('endpoint',)
+        )
+        self.duracao_requisicao = Histograma(
+            'api_requisicao_duracao_segundos', 'Latência total da requisição (inclui serialização).',
+            BUCKETS_LATENCIA, rotulos=('endpoint',)
+        )
+        self.duracao_predicao = Histograma(
+            'api_predicao_duracao_segundos', 'Duração apenas da chamada de previsão do modelo.',
+            BUCKETS_LATENCIA, rotulos=('origem',)
+        )
+        self.tamanho_lote = Histograma(
+            'api_tamanho_lote', 'Quantidade de temperaturas por chamada de previsão.',
+            BUCKETS_LOTE, rotulos=('origem',)
+        )
+
+    def medir_predicao(self, origem, funcao, temperaturas, tamanho):
+        """Executa uma previsão registrando sua duração e o tamanho do lote."""
+        inicio = time.perf_counter()
+        previsoes = funcao(temperaturas)
+        self.duracao_predicao.observar(time.perf_counter() - inicio, origem)
+        self.tamanho_lote.observar(tamanho, origem)
+        return previsoes
+
+    def renderizar(self, modelo_ativo=None, cache_lojas=None):
+        """Gera o texto de /metrics no formato de exposição do Prometheus."""
+        linhas = []
+        for metrica in (self.requisicoes, self.excecoes, self.duracao_requisicao,
+                        self.duracao_predicao, self.tamanho_lote):
+            linhas.extend(metrica.renderizar())
+
+        if modelo_ativo is not None:
+            linhas += [
+                '# HELP api_modelo_info Versão do modelo ativo.',
+                '# TYPE api_modelo_info gauge',
+                f'api_modelo_info{{versao="{modelo_ativo.versao}"}} 1',
+                '# HELP api_modelo_carga_segundos Tempo de carga e validação do modelo ativo.',
+                '# TYPE api_modelo_carga_segundos gauge',
+                f'api_modelo_carga_segundos {modelo_ativo.duracao_carga}',
+                '# HELP api_modelo_carregado_timestamp_segundos Momento em que o modelo ativo foi carregado.',
+                '# TYPE api_modelo_carregado_timestamp_segundos gauge',
+                f'api_modelo_carregado_timestamp_segundos {modelo_ativo.carregado_em.timestamp()}',
+            ]
+
+        if cache_lojas is not None:
+            linhas += [
+                '# HELP api_cache_lojas_modelos Modelos de loja carregados no cache.',
+                '# TYPE api_cache_lojas_modelos gauge',
+                f'api_cache_lojas_modelos {len(cache_lojas)}',
+                '# HELP api_cache_lojas_bytes Tamanho estimado dos modelos de loja em cache.',
+                '# TYPE api_cache_lojas_bytes gauge',
+                f'api_cache_lojas_bytes {cache_lojas.bytes_em_cache}',
+                '# HELP api_cache_lojas_eventos_total Acertos, faltas e despejos do cache de lojas.',
+                '# TYPE api_cache_lojas_eventos_total counter',
+            ]
+            for evento, valor in sorted(cache_lojas.estatisticas.items()):
+                linhas.append(f'api_cache_lojas_eventos_total{{evento="{evento}"}} {valor}')
+        return '\n'.join(linhas) + '\n'
+
+class MiddlewareMetricas:
+    """
+    Middleware ASGI que mede latência e status de cada requisição HTTP.
+
+    É um middleware ASGI puro (e não um BaseHTTPMiddleware) para não
+    interferir nas respostas em streaming e manter o custo mínimo.
+    """
+
+    def __init__(self, app, metricas, caminhos_conhecidos=None):
+        self.app = app
+        self.metricas = metricas
+        self.caminhos_conhecidos = caminhos_conhecidos
+
+    def _endpoint(self, scope):
+        rota = scope.get('route')
+        if rota is not None and hasattr(rota, 'path'):
+            return rota.path
+        caminho = scope.get('path', '')
+        conhecidos = self.caminhos_conhecidos() if self.caminhos_conhecidos else ()
+        return caminho if caminho in conhecidos else 'outro'
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        status = [500]
+
+        async def enviar(mensagem):
+            if mensagem['type'] == 'http.response.start':
+                status[0] = mensagem['status']
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        except Exception:
+            self.metricas.excecoes.incrementar(self._endpoint(scope))
+            raise
+        finally:
+            endpoint = self._endpoint(scope)
+            self.metricas.duracao_requisicao.observar(time.perf_counter() - inicio, endpoint)
+            self.metricas.requisicoes.incrementar(endpoint, scope.get('method', ''), str(status[0]))
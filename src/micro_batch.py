@@ -0,0 +1,56 @@
+import asyncio
+
+import numpy as np
+
+class MicroBatcher:
+    """
+    Agrupa previsões individuais concorrentes em uma única chamada vetorizada.
+
+    A primeira requisição de um lote abre uma janela de `janela` segundos; as
+    que chegam nesse intervalo entram no mesmo lote, que é despachado ao fim da
+    janela ou assim que atingir `max_lote` itens. Cada chamador aguarda o seu
+    próprio future, resolvido com o valor correspondente do lote.
+    """
+
+    def __init__(self, funcao_lote, janela=0.001, max_lote=512):
+        self.funcao_lote = funcao_lote
+        self.janela = janela
+        self.max_lote = max_lote
+        self._pendentes = []
+        self._agendamento = None
+
+    async def submeter(self, valor):
+        """Adiciona um valor ao próximo lote e aguarda o resultado dele."""
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self._pendentes.append((valor, futuro))
+
+        if len(self._pendentes) >= self.max_lote:
+            self._despachar()
+        elif self._agendamento is None:
+            self._agendamento = loop.call_later(self.janela, self._despachar)
+
+        return await futuro
+
+    def _despachar(self):
+        if self._agendamento is not None:
+            self._agendamento.cancel()
+            self._agendamento = None
+
+        pendentes, self._pendentes = self._pendentes, []
+        if not pendentes:
+            return
+
+        valores = np.fromiter((valor for valor, _ in pendentes), dtype=float, count=len(pendentes))
+        try:
+            resultados = self.funcao_lote(valores)
+        except Exception as e:
+            for _, futuro in pendentes:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+
+        # Futures cancelados (cliente desconectou) são simplesmente ignorados
+        for (_, futuro), resultado in zip(pendentes, resultados):
+            if not futuro.done():
+                futuro.set_result(resultado)
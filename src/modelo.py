@@ -1,41 +1,173 @@
 from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import mlflow
 import joblib
 import os
+import pandas as pd
+from datetime import datetime
+
+from estatisticas import (AcumuladorMetricas, AgregadosDistribuicao, EstatisticasSuficientes,
+                         atualizar_bootstrap, coeficientes_bootstrap)
+from graficos import LIMITE_PONTOS, grafico_resultados, grafico_resultados_agregado
+from perfilamento import medir
+from pre_processamento import separar_por_hash
+from preditor import EXTENSAO_COMPACTA, carregar_compacto, intervalo_bootstrap, salvar_compacto
+from rastreamento import RastreadorMLflow
+from selecao_modelos import melhor_estimador, validacao_cruzada
 
 class ModeloVendasSorvete:
-    def __init__(self):
-        self.modelo = LinearRegression()
+    def __init__(self, modelo=None):
+        self.modelo = modelo if modelo is not None else LinearRegression()
         self.metricas = {}
+        self.ranking = None
+        self.estatisticas = None
+        self.bootstrap = None
+        self.metricas_producao = AcumuladorMetricas()
     
+    @medir
     def treinar(self, X_train, y_train):
         """Treina o modelo com os dados fornecidos."""
         self.modelo.fit(X_train, y_train)
         print("Modelo treinado com sucesso!")
-        print(f"Coeficientes: {self.modelo.coef_}")
-        print(f"Intercepto: {self.modelo.intercept_}")
+        if isinstance(self.modelo, LinearRegression):
+            # Guardar as estatísticas suficientes para permitir atualizações incrementais
+            self.estatisticas = EstatisticasSuficientes().atualizar(X_train, y_train)
+            self.modelo.estatisticas_suficientes_ = self.estatisticas.para_dict()
+            self.calcular_bootstrap(X_train, y_train)
+        if hasattr(self.modelo, 'coef_'):
+            print(f"Coeficientes: {self.modelo.coef_}")
+            print(f"Intercepto: {self.modelo.intercept_}")
+        return self.modelo
+    
+    @medir
+    def calcular_bootstrap(self, X_train, y_train, n_reamostras=1000, seed=42, tamanho_reamostra=5000):
+        """
+        Calcula os coeficientes de `n_reamostras` reajustes bootstrap do treino.
+
+        A matriz fica em self.bootstrap e no próprio modelo
+        (bootstrap_coeficientes_), então é salva junto com o artefato e o
+        intervalo de um lote de temperaturas custa um produto de matrizes.
+        Cada reamostragem usa no máximo `tamanho_reamostra` linhas, então o
+        custo não cresce com o tamanho do treino.
+        """
+        self.bootstrap = coeficientes_bootstrap(X_train, y_train, n_reamostras, seed, tamanho_reamostra)
+        self.modelo.bootstrap_coeficientes_ = self.bootstrap
+        return self.bootstrap
+    
+    def prever_intervalo(self, temperatura, nivel=0.9, predicao=True):
+        """
+        Previsão pontual com os cenários pessimista e otimista (intervalo bootstrap).
+
+        Com nivel=0.9, as colunas Inferior e Superior são os percentis 5 e 95
+        das vendas previstas. Com predicao=False, o intervalo considera apenas a
+        incerteza da reta (vendas médias), sem a variação de um dia para outro.
+        """
+        if self.bootstrap is None:
+            raise ValueError("Não há coeficientes bootstrap (modelo não linear, treinado em streaming "
+                             "ou sem eles no artefato); treine o modelo com treinar().")
+        temperaturas = np.asarray(temperatura, dtype=float).reshape(-1)
+        inferior, superior = intervalo_bootstrap(self.bootstrap, temperaturas, nivel, predicao)
+        return pd.DataFrame({
+            'Temperatura': temperaturas,
+            'Previsao': self.prever(temperaturas.reshape(-1, 1)),
+            'Inferior': inferior,
+            'Superior': superior
+        })
+    
+    @medir
+    def selecionar_modelo(self, X, y, candidatos=None, n_dobras=5, estrategia='kfold',
+                          metrica='RMSE', n_jobs=None):
+        """
+        Escolhe o melhor regressor por validação cruzada paralela.
+
+        Avalia os candidatos (por padrão, selecao_modelos.CANDIDATOS_PADRAO) com
+        k-fold ou validação temporal, guarda o ranking em self.ranking e passa a
+        usar o primeiro colocado (ainda não treinado) como self.modelo.
+        """
+        self.ranking = validacao_cruzada(
+            X, y, candidatos, n_dobras=n_dobras, estrategia=estrategia,
+            metrica=metrica, n_jobs=n_jobs
+        )
+        self.modelo = melhor_estimador(self.ranking, candidatos)
+        self.estatisticas = None
+        print("Ranking da validação cruzada:")
+        print(self.ranking[['posicao', 'modelo', 'parametros', 'RMSE_media', 'MAE_media', 'R2_media']]
+              .to_string(index=False))
+        print(f"Modelo selecionado: {type(self.modelo).__name__}")
+        return self.ranking
+    
+    def _aplicar_estatisticas(self, anteriores=None, residuos_novos=None):
+        """
+        Atualiza coef_ e intercept_ do LinearRegression a partir das estatísticas.
+
+        Com as estatísticas `anteriores` (de antes da atualização), o bootstrap
+        existente é levado para os novos coeficientes (atualizar_bootstrap);
+        sem elas, ele é descartado, pois depende das linhas de treino.
+        """
+        inclinacao, intercepto = self.estatisticas.coeficientes()
+        if not isinstance(self.modelo, LinearRegression):
+            self.modelo = LinearRegression()
+        self.modelo.coef_ = np.array([inclinacao])
+        self.modelo.intercept_ = float(intercepto)
+        self.modelo.n_features_in_ = 1
+        self.modelo.estatisticas_suficientes_ = self.estatisticas.para_dict()
+        if self.bootstrap is not None and anteriores is not None and anteriores.n >= 2 and anteriores.m2_x > 0:
+            self.bootstrap = atualizar_bootstrap(self.bootstrap, anteriores, self.estatisticas, residuos_novos)
+        else:
+            self.bootstrap = None
+        self.modelo.bootstrap_coeficientes_ = self.bootstrap
         return self.modelo
     
+    @medir
+    def treinar_incremental(self, X_novo, y_novo):
+        """
+        Atualiza o modelo apenas com as linhas novas, em O(linhas novas).
+
+        Usa as estatísticas suficientes acumuladas (salvas junto com o modelo);
+        os coeficientes são os mesmos de um ajuste completo sobre todo o histórico.
+        O bootstrap é atualizado junto (atualizar_bootstrap); sem estatísticas
+        anteriores, ele é calculado só com os novos registros.
+        """
+        if self.estatisticas is None:
+            if hasattr(self.modelo, 'coef_'):
+                print("Aviso: o modelo atual não tem estatísticas suficientes salvas; "
+                      "o ajuste incremental considera apenas os novos registros.")
+            self.estatisticas = EstatisticasSuficientes().atualizar(X_novo, y_novo)
+            self._aplicar_estatisticas()
+            if self.estatisticas.n >= 2 and self.estatisticas.m2_x > 0:
+                self.calcular_bootstrap(X_novo, y_novo)
+        else:
+            anteriores = EstatisticasSuficientes.de_dict(self.estatisticas.para_dict())
+            self.estatisticas.atualizar(X_novo, y_novo)
+            inclinacao, intercepto = self.estatisticas.coeficientes()
+            residuos = np.asarray(y_novo, dtype=float).reshape(-1) - (
+                inclinacao * np.asarray(X_novo, dtype=float).reshape(-1) + intercepto)
+            self._aplicar_estatisticas(anteriores, residuos)
+        print(f"Modelo atualizado com {len(y_novo)} novos registros ({self.estatisticas.n} no total).")
+        return self.modelo
+    
+    def combinar_estatisticas(self, *outras):
+        """
+        Combina estatísticas calculadas em outras partições ou processos.
+
+        Aceita objetos EstatisticasSuficientes ou outros ModeloVendasSorvete.
+        """
+        if self.estatisticas is None:
+            self.estatisticas = EstatisticasSuficientes()
+        anteriores = EstatisticasSuficientes.de_dict(self.estatisticas.para_dict())
+        for outra in outras:
+            if isinstance(outra, ModeloVendasSorvete):
+                outra = outra.estatisticas
+            if outra is not None:
+                self.estatisticas.combinar(outra)
+        return self._aplicar_estatisticas(anteriores)
+    
+    @medir
     def avaliar(self, X_test, y_test):
         """Avalia o modelo com métricas de regressão."""
         y_pred = self.modelo.predict(X_test)
         
-        # Calcular métricas
-        mae = mean_absolute_error(y_test, y_pred)
-        mse = mean_squared_error(y_test, y_pred)
-        rmse = np.sqrt(mse)
-        r2 = r2_score(y_test, y_pred)
-        
-        self.metricas = {
-            'MAE': mae,
-            'MSE': mse,
-            'RMSE': rmse,
-            'R2': r2
-        }
+        # Calcular todas as métricas em uma única passada
+        self.metricas = AcumuladorMetricas().atualizar(y_test, y_pred).resultado()
         
         print("Métricas de avaliação:")
         for metric_name, metric_value in self.metricas.items():
@@ -43,48 +175,126 @@ def avaliar(self, X_test, y_test):
         
         return self.metricas
     
-    def visualizar_resultados(self, X, y, X_test=None, y_test=None, y_pred=None):
-        """Cria visualizações para entender os resultados do modelo."""
-        plt.figure(figsize=(12, 6))
-        
-        # Plot 1: Dados e linha de regressão
-        plt.subplot(1, 2, 1)
-        sns.scatterplot(x=X.flatten(), y=y, color='blue', alpha=0.6)
-        
-        # Criar linha de tendência
+    def registrar_vendas_reais(self, temperaturas, vendas_reais):
+        """
+        Acompanha o desempenho em produção comparando as vendas reais com as previstas.
+
+        Pode ser chamado a cada novo lote de vendas; retorna as métricas
+        acumuladas desde o início (ou desde o último reinício de metricas_producao).
+        """
+        previsoes = self.prever(np.asarray(temperaturas, dtype=float).reshape(-1, 1))
+        self.metricas_producao.atualizar(vendas_reais, previsoes)
+        return self.metricas_producao.resultado()
+    
+    def metricas_de_estatisticas(self, estatisticas_teste):
+        """
+        MSE, RMSE e R² exatos do modelo linear sobre um conjunto resumido por suas
+        estatísticas suficientes (sem precisar das linhas).
+        """
+        e = estatisticas_teste
+        if e.n == 0:
+            return {'MSE': float('nan'), 'RMSE': float('nan'), 'R2': float('nan')}
+        a = float(np.ravel(self.modelo.coef_)[0])
+        b = float(self.modelo.intercept_)
+        # Σ(y - a·x - b)² expandido em torno das médias
+        sse = (e.m2_y - 2 * a * e.c_xy + a * a * e.m2_x
+               + e.n * (e.media_y - a * e.media_x - b) ** 2)
+        mse = float(sse / e.n)
+        # Vendas constantes no teste (ou uma única linha): R² indefinido, como em AcumuladorMetricas
+        r2 = 1 - sse / e.m2_y if e.m2_y > 0 else float('nan')
+        return {'MSE': mse, 'RMSE': float(np.sqrt(mse)), 'R2': float(r2)}
+    
+    @medir
+    def treinar_streaming(self, blocos, test_size=0.2, seed=42, colunas_chave=None,
+                          coluna_x='Temperatura', coluna_y='Vendas', tamanho_amostra_mae=100_000):
+        """
+        Treina e avalia o modelo consumindo um iterador de DataFrames (fora da memória).
+
+        Cada linha vai para treino ou teste pelo hash de `colunas_chave` (ou da
+        posição global da linha, se não informadas), então a divisão é
+        determinística e não exige embaralhar os dados. O ajuste acumula as
+        estatísticas suficientes do treino; MSE, RMSE e R² do teste saem exatos
+        das estatísticas do teste, e o MAE é estimado sobre uma amostra uniforme
+        de até `tamanho_amostra_mae` linhas de teste.
+        """
+        treino = EstatisticasSuficientes()
+        teste = EstatisticasSuficientes()
+        rng = np.random.default_rng(seed)
+        amostra_x, amostra_y, chaves_amostra = np.empty(0), np.empty(0), np.empty(0)
+        posicao = 0
+
+        for bloco in blocos:
+            bloco = bloco.dropna(subset=[coluna_x, coluna_y])
+            if colunas_chave:
+                chaves = bloco[list(colunas_chave)]
+            else:
+                chaves = pd.Series(np.arange(posicao, posicao + len(bloco)))
+            posicao += len(bloco)
+            eh_teste = separar_por_hash(chaves, test_size, seed)
+
+            x = bloco[coluna_x].to_numpy(dtype=np.float64)
+            y = bloco[coluna_y].to_numpy(dtype=np.float64)
+            treino.atualizar(x[~eh_teste], y[~eh_teste])
+            teste.atualizar(x[eh_teste], y[eh_teste])
+
+            # Amostra uniforme (menores chaves aleatórias) das linhas de teste para o MAE
+            chaves_amostra = np.concatenate([chaves_amostra, rng.random(int(eh_teste.sum()))])
+            amostra_x = np.concatenate([amostra_x, x[eh_teste]])
+            amostra_y = np.concatenate([amostra_y, y[eh_teste]])
+            if len(chaves_amostra) > tamanho_amostra_mae:
+                manter = np.argpartition(chaves_amostra, tamanho_amostra_mae)[:tamanho_amostra_mae]
+                chaves_amostra, amostra_x, amostra_y = chaves_amostra[manter], amostra_x[manter], amostra_y[manter]
+
+        print(f"Dados processados em streaming: {treino.n} amostras de treino e {teste.n} amostras de teste.")
+        self.estatisticas = treino
+        self._aplicar_estatisticas()
+        print("Modelo treinado com sucesso!")
+        print(f"Coeficientes: {self.modelo.coef_}")
+        print(f"Intercepto: {self.modelo.intercept_}")
+
+        if teste.n > 0:
+            residuos = amostra_y - self.modelo.predict(amostra_x.reshape(-1, 1))
+            self.metricas = {'MAE': float(np.abs(residuos).mean()), **self.metricas_de_estatisticas(teste)}
+            print("Métricas de avaliação:")
+            for metric_name, metric_value in self.metricas.items():
+                print(f"{metric_name}: {metric_value:.2f}")
+
+        return self.metricas
+    
+    @medir
+    def visualizar_resultados(self, X, y, X_test=None, y_test=None, y_pred=None,
+                              caminho='outputs/resultados_modelo.png', renderizador=None,
+                              ao_concluir=None):
+        """
+        Gera o gráfico dos resultados do modelo (sem janela, sempre fechando a figura).
+
+        Com um RenderizadorGraficos, o gráfico é feito em segundo plano e o
+        retorno é um Future (None se os gráficos estiverem desativados); sem
+        ele, é gerado na hora e o retorno é o caminho do arquivo. Acima de
+        graficos.LIMITE_PONTOS linhas, os dados são resumidos em contagens
+        aqui mesmo e só elas vão para o gráfico (e para o outro processo).
+        """
+        # Criar linha de tendência (a previsão fica no processo principal)
         x_range = np.linspace(X.min(), X.max(), 100).reshape(-1, 1)
         y_pred_line = self.modelo.predict(x_range)
+        y_test = y_test if X_test is not None else None
+        if len(y) > LIMITE_PONTOS:
+            funcao = grafico_resultados_agregado
+            previsoes = (AgregadosDistribuicao.de_valores(y_test, y_pred)
+                         if y_test is not None and y_pred is not None else None)
+            argumentos = (AgregadosDistribuicao.de_valores(X, y), x_range.ravel(), y_pred_line, previsoes)
+        else:
+            funcao = grafico_resultados
+            argumentos = (np.ravel(X), np.ravel(y), x_range.ravel(), y_pred_line, y_test, y_pred)
         
-        plt.plot(x_range, y_pred_line, color='red', linewidth=2)
-        plt.title('Vendas x Temperatura')
-        plt.xlabel('Temperatura (°C)')
-        plt.ylabel('Vendas de Sorvete')
-        plt.grid(True, alpha=0.3)
-        
-        # Plot 2: Previsão vs Real (se disponível)
-        if X_test is not None and y_test is not None and y_pred is not None:
-            plt.subplot(1, 2, 2)
-            plt.scatter(y_test, y_pred, color='green', alpha=0.6)
-            
-            # Linha identidade (y=x)
-            min_val = min(y_test.min(), y_pred.min())
-            max_val = max(y_test.max(), y_pred.max())
-            plt.plot([min_val, max_val], [min_val, max_val], 'r--')
-            
-            plt.title('Valores Reais vs. Previstos')
-            plt.xlabel('Vendas Reais')
-            plt.ylabel('Vendas Previstas')
-            plt.grid(True, alpha=0.3)
-        
-        plt.tight_layout()
-        
-        # Salvar figura
-        os.makedirs('outputs', exist_ok=True)
-        plt.savefig('outputs/resultados_modelo.png')
-        
-        plt.show()
-        return plt
+        if renderizador is None:
+            caminho = funcao(*argumentos, caminho=caminho)
+            if ao_concluir is not None:
+                ao_concluir(caminho)
+            return caminho
+        return renderizador.enviar(funcao, *argumentos, caminho=caminho, ao_concluir=ao_concluir)
     
+    @medir
     def prever(self, temperatura):
         """Faz previsões para novas temperaturas."""
         if isinstance(temperatura, (int, float)):
@@ -95,56 +305,102 @@ def prever(self, temperatura):
         previsoes = self.modelo.predict(temperatura)
         return previsoes
     
+    def metadados_treino(self):
+        """Metadados gravados junto com o artefato compacto."""
+        metadados = {
+            'treinado_em': datetime.now().isoformat(timespec='seconds'),
+            'metricas': {nome: float(valor) for nome, valor in self.metricas.items()},
+        }
+        if self.estatisticas is not None:
+            metadados['n_amostras'] = self.estatisticas.n
+            metadados['estatisticas_suficientes'] = self.estatisticas.para_dict()
+        return metadados
+    
+    @medir
     def salvar_modelo(self, caminho='outputs/modelo_vendas_sorvete.joblib'):
-        """Salva o modelo treinado."""
+        """
+        Salva o modelo treinado.
+
+        Caminhos terminados em .json usam o artefato compacto (somente modelos
+        lineares), que carrega sem sklearn; os demais usam joblib.
+        """
         os.makedirs(os.path.dirname(caminho), exist_ok=True)
-        joblib.dump(self.modelo, caminho)
+        if caminho.endswith(EXTENSAO_COMPACTA):
+            salvar_compacto(self.modelo, caminho, self.metadados_treino())
+        else:
+            joblib.dump(self.modelo, caminho)
         print(f"Modelo salvo em: {caminho}")
     
+    @medir
     def carregar_modelo(self, caminho='outputs/modelo_vendas_sorvete.joblib'):
-        """Carrega um modelo salvo."""
-        self.modelo = joblib.load(caminho)
+        """Carrega um modelo salvo (e suas estatísticas suficientes, se houver)."""
+        if caminho.endswith(EXTENSAO_COMPACTA):
+            self.modelo = carregar_compacto(caminho)
+            estatisticas = self.modelo.metadados.get('estatisticas_suficientes')
+            self.bootstrap = self.modelo.bootstrap
+        else:
+            self.modelo = joblib.load(caminho)
+            estatisticas = getattr(self.modelo, 'estatisticas_suficientes_', None)
+            self.bootstrap = getattr(self.modelo, 'bootstrap_coeficientes_', None)
+        self.estatisticas = EstatisticasSuficientes.de_dict(estatisticas) if estatisticas else None
         print(f"Modelo carregado de: {caminho}")
         return self.modelo
     
+    @medir
     def registrar_modelo_mlflow(self, X_train, y_train, X_test, y_test, 
-                               run_name="VendasSorvete_Regressao"):
-        """Registra o modelo e métricas usando MLflow."""
-        mlflow.set_experiment("Previsao_Vendas_Sorvete")
+                               run_name="VendasSorvete_Regressao", renderizador=None, rastreador=None):
+        """
+        Registra o modelo e métricas usando MLflow.
+
+        O envio ao MLflow é feito em segundo plano por um RastreadorMLflow
+        (parâmetros e métricas em lote) e o treino nunca espera o servidor:
+        o retorno é um Future com o run_id, resolvido quando o run for criado
+        (use .result() para esperar). Passe um rastreador para escolher o modo (ex.: 'offline') ou esperar
+        os envios com rastreador.aguardar(); sem ele, a fila é esvaziada na
+        saída do processo. Com um RenderizadorGraficos, o gráfico de
+        resultados é gerado em segundo plano e anexado ao run quando o
+        renderizador for aguardado.
+        """
+        rastreador = (rastreador or RastreadorMLflow()).iniciar_run(run_name)
         
-        with mlflow.start_run(run_name=run_name):
+        try:
             # Treinar modelo
             self.treinar(X_train, y_train)
-            
+        
             # Avaliar modelo
             y_pred = self.modelo.predict(X_test)
             metricas = self.avaliar(X_test, y_test)
-            
+        
             # Registrar parâmetros
-            mlflow.log_param("model_type", "LinearRegression")
-            
+            rastreador.log_param("model_type", type(self.modelo).__name__)
+            if self.ranking is not None:
+                rastreador.log_param("hiperparametros", self.ranking.iloc[0]['parametros'])
+                rastreador.log_metric("cv_rmse", self.ranking.iloc[0]['RMSE_media'])
+        
             # Registrar métricas
-            for metric_name, metric_value in metricas.items():
-                mlflow.log_metric(metric_name.lower(), metric_value)
-            
-            # Criar e salvar visualizações
-            fig = self.visualizar_resultados(
+            rastreador.log_metrics({metric_name.lower(): metric_value for metric_name, metric_value in metricas.items()})
+        
+            # Criar visualizações (em segundo plano, se houver renderizador) e
+            # anexá-las ao run quando ficarem prontas
+            self.visualizar_resultados(
                 np.vstack((X_train, X_test)), 
                 np.concatenate((y_train, y_test)),
-                X_test, y_test, y_pred
+                X_test, y_test, y_pred,
+                renderizador=renderizador,
+                ao_concluir=lambda caminho: rastreador.log_artefato(caminho, "plots")
             )
-            
-            # Salvar figura para MLflow
-            fig_path = 'outputs/temp_plot.png'
-            fig.savefig(fig_path)
-            mlflow.log_artifact(fig_path, "plots")
-            
+        
             # Registrar modelo
-            mlflow.sklearn.log_model(self.modelo, "model")
-            
-            print(f"Modelo registrado no MLflow com run_id: {mlflow.active_run().info.run_id}")
-            
-            return mlflow.active_run().info.run_id
+            rastreador.log_modelo(self.modelo, "model")
+        except Exception:
+            rastreador.finalizar('FAILED')
+            raise
+        rastreador.finalizar()
+        
+        run_id = rastreador.run_id_futuro
+        run_id.add_done_callback(lambda futuro: print(f"Modelo registrado no MLflow com run_id: {futuro.result()}"))
+        
+        return run_id
 
 if __name__ == "__main__":
     # Testar a classe
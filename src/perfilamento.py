@@ -0,0 +1,181 @@
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import functools
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows: sem ru_maxrss
+    resource = None
+
+# Perfilador da execução em andamento (usado pelo decorador @medir)
+_perfilador_ativo = None
+
+def pico_rss_mb():
+    """Pico de memória residente do processo até agora, em MB (None se indisponível)."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB; macOS, em bytes
+    return pico / 1024 ** 2 if sys.platform == 'darwin' else pico / 1024
+
+class Perfilador:
+    """
+    Mede cada etapa de uma execução: tempo real, tempo de CPU, memória e linhas.
+
+    etapa() é um gerenciador de contexto; etapas podem ser aninhadas (o nome
+    registrado inclui o caminho, ex.: "treinar/ModeloVendasSorvete.treinar").
+    A memória é medida pelo pico de RSS do processo (e quanto a etapa o
+    elevou). Com rastrear_memoria=True, o tracemalloc mede também o pico de
+    alocações dentro de cada etapa, ao custo de deixar o código Python bem
+    mais lento (o import do MLflow chega a dobrar de duração). Com
+    cprofile=True, cada etapa de primeiro nível roda sob o cProfile e o
+    perfil da mais lenta é salvo em disco.
+    """
+
+    def __init__(self, rastrear_memoria=False, cprofile=False):
+        self.rastrear_memoria = rastrear_memoria
+        self.cprofile = cprofile
+        self.etapas = []
+        self.inicio = datetime.now()
+        self._pilha = []
+        self._perfis = {}
+
+    def iniciar(self):
+        """Ativa o perfilador (decorador @medir e tracemalloc) até encerrar()."""
+        global _perfilador_ativo
+        self._anterior, _perfilador_ativo = _perfilador_ativo, self
+        self._iniciou_tracemalloc = self.rastrear_memoria and not tracemalloc.is_tracing()
+        if self._iniciou_tracemalloc:
+            tracemalloc.start()
+        return self
+
+    def encerrar(self):
+        """Desativa o perfilador; as medições continuam disponíveis."""
+        global _perfilador_ativo
+        if _perfilador_ativo is self:
+            _perfilador_ativo = self._anterior
+            if self._iniciou_tracemalloc:
+                tracemalloc.stop()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *excecao):
+        self.encerrar()
+
+    @contextmanager
+    def etapa(self, nome, linhas=None, **extras):
+        """Mede o bloco; o dicionário retornado aceita 'linhas' e outros campos."""
+        caminho = f"{self._pilha[-1]['etapa']}/{nome}" if self._pilha else nome
+        registro = {'etapa': caminho, 'linhas': linhas, **extras}
+
+        rastreando = self.rastrear_memoria and tracemalloc.is_tracing()
+        if rastreando:
+            # O pico é global: guardar o da etapa externa antes de zerá-lo
+            if self._pilha:
+                self._pilha[-1]['_pico'] = max(self._pilha[-1]['_pico'], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            registro['_base'] = tracemalloc.get_traced_memory()[0]
+        registro['_pico'] = 0
+
+        perfil = cProfile.Profile() if self.cprofile and not self._pilha else None
+        rss_inicial = pico_rss_mb()
+        self._pilha.append(registro)
+        inicio_real, inicio_cpu = time.perf_counter(), time.process_time()
+        if perfil is not None:
+            perfil.enable()
+        try:
+            yield registro
+        finally:
+            if perfil is not None:
+                perfil.disable()
+            registro['tempo_real_s'] = time.perf_counter() - inicio_real
+            registro['tempo_cpu_s'] = time.process_time() - inicio_cpu
+            self._pilha.pop()
+            base, pico = registro.pop('_base', 0), registro.pop('_pico')
+            if rastreando:
+                pico = max(pico, tracemalloc.get_traced_memory()[1])
+                registro['alocacao_pico_mb'] = max(pico - base, 0) / 1024 ** 2
+                if self._pilha:
+                    self._pilha[-1]['_pico'] = max(self._pilha[-1]['_pico'], pico)
+            registro['rss_pico_mb'] = pico_rss_mb()
+            if rss_inicial is not None:
+                registro['rss_aumento_mb'] = registro['rss_pico_mb'] - rss_inicial
+            self.etapas.append(registro)
+            if perfil is not None:
+                self._perfis[caminho] = perfil
+
+    def registrar_linhas(self, linhas):
+        """Informa o número de linhas processadas pela etapa atual."""
+        if self._pilha:
+            self._pilha[-1]['linhas'] = int(linhas)
+
+    def relatorio(self):
+        """Relatório da execução (etapas na ordem em que terminaram)."""
+        principais = [e for e in self.etapas if '/' not in e['etapa']]
+        return {
+            'inicio': self.inicio.isoformat(timespec='seconds'),
+            'tempo_total_s': sum(e['tempo_real_s'] for e in principais),
+            'rss_pico_mb': pico_rss_mb(),
+            'etapas': self.etapas,
+        }
+
+    def salvar_json(self, caminho='outputs/relatorio_execucao.json'):
+        """Grava o relatório em JSON."""
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            json.dump(self.relatorio(), arquivo, ensure_ascii=False, indent=2)
+        return caminho
+
+    def salvar_cprofile(self, diretorio='outputs'):
+        """Salva o cProfile da etapa mais lenta (.prof) e um resumo em texto. Retorna o caminho."""
+        if not self._perfis:
+            return None
+        duracoes = {e['etapa']: e['tempo_real_s'] for e in self.etapas if e['etapa'] in self._perfis}
+        mais_lenta = max(duracoes, key=duracoes.get)
+        caminho = os.path.join(diretorio, f'perfil_{mais_lenta}.prof')
+        self._perfis[mais_lenta].dump_stats(caminho)
+        with open(caminho[:-len('.prof')] + '.txt', 'w', encoding='utf-8') as arquivo:
+            pstats.Stats(caminho, stream=arquivo).sort_stats('cumulative').print_stats(30)
+        return caminho
+
+    def registrar_mlflow(self, rastreador, caminhos_artefatos=()):
+        """Registra as medições (e os arquivos informados) no run de um RastreadorMLflow."""
+        rastreador.log_metrics({
+            f"perfil_{etapa['etapa'].replace('/', '.')}_{campo}": etapa[campo]
+            for etapa in self.etapas
+            for campo in ('tempo_real_s', 'tempo_cpu_s', 'alocacao_pico_mb', 'rss_pico_mb', 'rss_aumento_mb', 'linhas')
+            if etapa.get(campo) is not None
+        })
+        for caminho in caminhos_artefatos:
+            if caminho:
+                rastreador.log_artefato(caminho, 'perfil')
+
+def registrar_linhas(linhas):
+    """Informa as linhas da etapa atual ao perfilador ativo (sem efeito se não houver)."""
+    if _perfilador_ativo is not None:
+        _perfilador_ativo.registrar_linhas(linhas)
+
+def medir(funcao):
+    """
+    Decorador: mede o método como uma etapa do perfilador ativo.
+
+    Sem perfilador ativo, a chamada segue direto, sem custo de medição. O
+    número de linhas é o tamanho do primeiro argumento, quando ele tiver len().
+    """
+    @functools.wraps(funcao)
+    def envoltorio(*args, **kwargs):
+        perfilador = _perfilador_ativo
+        if perfilador is None:
+            return funcao(*args, **kwargs)
+        linhas = next((len(a) for a in args[1:2] if hasattr(a, '__len__')), None)
+        with perfilador.etapa(funcao.__qualname__, linhas=linhas):
+            return funcao(*args, **kwargs)
+    return envoltorio
@@ -1,14 +1,30 @@
 import os
 import sys
+import argparse
 import logging
-import mlflow
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+from functools import partial
+from concurrent.futures import Future
 
+import escrita_atomica
+import estatisticas
+import graficos
+import modelo as modelo_modulo
+import pre_processamento
+import preditor
+import rastreamento
+import registro_modelos
+import selecao_modelos
+from cache_etapas import CacheEtapas, hash_modulos
+from estatisticas import AgregadosDistribuicao
+from graficos import LIMITE_PONTOS, RenderizadorGraficos, graficos_agregados, graficos_dados, usar_backend_sem_janela
 from pre_processamento import carregar_dados, explorar_dados, preparar_dados
 from modelo import ModeloVendasSorvete
+from perfilamento import Perfilador, registrar_linhas
+from rastreamento import RastreadorMLflow
+from registro_modelos import publicar_modelo
+from selecao_modelos import melhor_estimador
 
 # Configurar logging
 logging.basicConfig(
@@ -22,108 +38,247 @@
 
 logger = logging.getLogger(__name__)
 
-def executar_pipeline(caminho_dados, test_size=0.2, random_state=42):
+# Resultados e manifestos das etapas do pipeline
+DIRETORIO_CACHE_ETAPAS = 'outputs/.cache_etapas'
+
+# Arquivos gravados por cada etapa (conferidos antes de reaproveitar o cache)
+SAIDAS_GRAFICOS_DADOS = ['outputs/distribuicao_dados.png', 'outputs/correlacao.png']
+SAIDAS_SELECAO = ['outputs/ranking_modelos.csv']
+SAIDAS_TREINO = ['outputs/modelo_vendas_sorvete.joblib']
+SAIDAS_DEMONSTRACAO = ['outputs/previsoes_demonstracao.csv']
+
+# Relatório de tempo e memória por etapa
+RELATORIO_EXECUCAO = 'outputs/relatorio_execucao.json'
+
+def etapa_carregar(caminho_dados, ordenar_por_data):
+    """Carrega os dados (ordenados por data para a validação temporal)."""
+    dados = carregar_dados(caminho_dados)
+    if dados is None:
+        raise ValueError(f"Falha ao carregar os dados de {caminho_dados}.")
+    if ordenar_por_data and 'Data' in dados:
+        dados = dados.sort_values('Data', kind='stable', ignore_index=True)
+    registrar_linhas(len(dados))
+    return dados
+
+def etapa_explorar(dados):
+    """Estatísticas descritivas dos dados."""
+    explorar_dados(dados)
+
+def etapa_graficos_dados(dados, renderizador):
+    """Agenda os gráficos de distribuição e correlação em segundo plano (retorna o Future)."""
+    temperatura, vendas = dados['Temperatura'].to_numpy(), dados['Vendas'].to_numpy()
+    if len(dados) > LIMITE_PONTOS:
+        # Agregar aqui: só as contagens são enviadas ao processo dos gráficos
+        return renderizador.enviar(graficos_agregados, AgregadosDistribuicao.de_valores(temperatura, vendas), 'outputs')
+    return renderizador.enviar(graficos_dados, temperatura, vendas, 'outputs')
+
+def etapa_dividir(dados, test_size, random_state, embaralhar):
+    """Separa treino e teste: (X_train, X_test, y_train, y_test)."""
+    registrar_linhas(len(dados))
+    return preparar_dados(dados, test_size=test_size, random_state=random_state, embaralhar=embaralhar)
+
+def etapa_selecionar(divisao, candidatos, n_dobras, estrategia_cv):
+    """Validação cruzada no treino; retorna o ranking dos candidatos."""
+    X_train, _, y_train, _ = divisao
+    registrar_linhas(len(X_train))
+    ranking = ModeloVendasSorvete().selecionar_modelo(
+        X_train, y_train, candidatos, n_dobras=n_dobras, estrategia=estrategia_cv
+    )
+    ranking.to_csv('outputs/ranking_modelos.csv', index=False)
+    return ranking
+
+def etapa_treinar(divisao, ranking, candidatos, renderizador=None, rastreador=None):
+    """Treina, registra no MLflow, salva e publica o modelo: (modelo, Future do run_id)."""
+    X_train, X_test, y_train, y_test = divisao
+    registrar_linhas(len(X_train) + len(X_test))
+    modelo = ModeloVendasSorvete(
+        melhor_estimador(ranking, candidatos) if ranking is not None else None
+    )
+    modelo.ranking = ranking
+    
+    logger.info("Registrando modelo no MLflow...")
+    run_id = modelo.registrar_modelo_mlflow(
+        X_train, y_train, X_test, y_test, renderizador=renderizador, rastreador=rastreador
+    )
+    
+    logger.info("Salvando modelo treinado...")
+    modelo.salvar_modelo()
+    
+    # Publicar versão para a API (carregada sem reiniciar o servidor).
+    # Modelos lineares vão no formato compacto, que a API lê sem sklearn.
+    try:
+        caminho_versao = publicar_modelo(
+            modelo.modelo, 'outputs/modelos', formato='compacto', metadados=modelo.metadados_treino()
+        )
+    except ValueError:
+        caminho_versao = publicar_modelo(modelo.modelo, 'outputs/modelos')
+    logger.info(f"Nova versão publicada para a API: {caminho_versao}")
+    return modelo, run_id
+
+def etapa_demonstrar(treino):
+    """Previsões para temperaturas de 20 a 35 graus, salvas em CSV."""
+    modelo, _ = treino
+    temperaturas_demo = np.arange(20, 36, 1).reshape(-1, 1)
+    vendas_previstas = modelo.prever(temperaturas_demo)
+    
+    demo_df = pd.DataFrame({
+        'Temperatura': temperaturas_demo.flatten(),
+        'Vendas_Previstas': vendas_previstas.astype(int)
+    })
+    demo_df.to_csv('outputs/previsoes_demonstracao.csv', index=False)
+    return demo_df
+
+def salvar_relatorio(perfilador, rastreador=None):
+    """Grava o relatório de tempo e memória (e o cProfile, se houver) e o registra no run do MLflow."""
+    caminhos = [perfilador.salvar_json(RELATORIO_EXECUCAO), perfilador.salvar_cprofile('outputs')]
+    etapas = sorted(
+        (e for e in perfilador.etapas if '/' not in e['etapa']),
+        key=lambda e: e['tempo_real_s'], reverse=True
+    )
+    for etapa in etapas:
+        logger.info(
+            f"Etapa {etapa['etapa']}: {etapa['tempo_real_s']:.3f} s "
+            f"(CPU {etapa['tempo_cpu_s']:.3f} s, RSS +{etapa.get('rss_aumento_mb') or 0:.1f} MB)"
+        )
+    logger.info(f"Relatório de execução salvo em {caminhos[0]}")
+    if caminhos[1]:
+        logger.info(f"cProfile da etapa mais lenta salvo em {caminhos[1]}")
+    if rastreador is not None:
+        perfilador.registrar_mlflow(rastreador, caminhos)
+
+def executar_pipeline(caminho_dados, test_size=0.2, random_state=42,
+                      selecao_modelo=False, estrategia_cv='kfold', n_dobras=5, candidatos=None,
+                      usar_cache=True, gerar_graficos=True, perfilar=True, tracemalloc=False,
+                      cprofile=False, modo_mlflow='assincrono'):
     """
     Executa o pipeline completo de treinamento, avaliação e registro do modelo.
     
+    Cada etapa (carregar, explorar, dividir, selecionar, treinar, demonstrar)
+    declara suas entradas e saídas e fica em cache sob o hash delas (conteúdo
+    do CSV, parâmetros, código dos módulos e chaves das etapas anteriores).
+    Uma nova execução sem mudanças pula todas as etapas (o hash do CSV só é
+    recalculado se o tamanho ou o mtime do arquivo mudarem); mudar um
+    parâmetro refaz só as etapas que dependem dele.
+    
+    Os gráficos são gerados sem janela (backend Agg) em um processo à parte,
+    enquanto o treino continua; o pipeline espera por eles só no final.
+    
+    Cada etapa (e os métodos do modelo chamados nela) tem tempo real, tempo
+    de CPU, pico de RSS e número de linhas medidos; o relatório vai para
+    outputs/relatorio_execucao.json e para o run do MLflow.
+    
+    O registro no MLflow é enviado em segundo plano durante as etapas
+    seguintes; o pipeline espera os envios pendentes só ao terminar.
+    
     Args:
         caminho_dados: Caminho para o arquivo CSV de dados
         test_size: Proporção do conjunto de teste
         random_state: Semente aleatória para reprodutibilidade
+        selecao_modelo: Se True, escolhe o regressor por validação cruzada no treino
+            (padrão: False, regressão linear)
+        estrategia_cv: 'kfold' ou 'temporal' (dados ordenados por Data, teste no final)
+        n_dobras: Número de dobras da validação cruzada
+        candidatos: Regressores e grades de hiperparâmetros (padrão: CANDIDATOS_PADRAO)
+        usar_cache: Se False, executa todas as etapas (e não grava o cache)
+        gerar_graficos: Se False, nenhum gráfico é gerado (retreinos agendados)
+        perfilar: Se False, não grava o relatório de execução
+        tracemalloc: Se True, mede o pico de alocações de cada etapa (mais lento)
+        cprofile: Se True, salva o cProfile da etapa mais lenta em outputs/
+        modo_mlflow: 'assincrono' (envio em segundo plano) ou 'offline' (run
+            gravado em outputs/runs_offline, enviado depois por rastreamento.py)
     """
+    # Criar diretório de saída se não existir
+    os.makedirs('outputs', exist_ok=True)
+    cache = CacheEtapas(DIRETORIO_CACHE_ETAPAS, ativo=usar_cache)
+    renderizador = RenderizadorGraficos(ativo=gerar_graficos).iniciar()
+    perfilador = Perfilador(rastrear_memoria=tracemalloc, cprofile=cprofile)
+    if perfilar:
+        perfilador.iniciar()
+    rastreador = RastreadorMLflow(modo=modo_mlflow)
+    rastreador_perfil = None
+    
+    def executar_etapa(nome, *args, **kwargs):
+        """cache.executar medindo a etapa (e indicando se ela veio do cache)."""
+        with perfilador.etapa(nome) as registro:
+            resultado = cache.executar(nome, *args, **kwargs)
+            registro['em_cache'] = resultado.em_cache
+        return resultado
+    
     try:
-        # Criar diretório de saída se não existir
-        os.makedirs('outputs', exist_ok=True)
+        temporal = estrategia_cv == 'temporal'
         
         # 1. Carregar dados
         logger.info("Carregando dados...")
-        dados = carregar_dados(caminho_dados)
-        if dados is None:
-            logger.error("Falha ao carregar os dados. Pipeline encerrado.")
-            return
+        dados = executar_etapa(
+            'carregar', etapa_carregar,
+            {'caminho_dados': caminho_dados, 'ordenar_por_data': temporal},
+            dependencias={'arquivo': cache.hash_arquivo(caminho_dados), 'codigo': hash_modulos(pre_processamento)}
+        )
         
         # 2. Explorar dados
         logger.info("Explorando dados...")
-        explorar_dados(dados)
-        
-        # 2.1 Salvar visualizações dos dados
-        logger.info("Criando visualizações dos dados...")
-        plt.figure(figsize=(16, 10))
-        
-        # Histograma da temperatura
-        plt.subplot(2, 2, 1)
-        sns.histplot(dados['Temperatura'], kde=True)
-        plt.title('Distribuição da Temperatura')
-        plt.xlabel('Temperatura (°C)')
-        
-        # Histograma das vendas
-        plt.subplot(2, 2, 2)
-        sns.histplot(dados['Vendas'], kde=True)
-        plt.title('Distribuição das Vendas')
-        plt.xlabel('Vendas de Sorvete')
-        
-        # Boxplot da temperatura
-        plt.subplot(2, 2, 3)
-        sns.boxplot(x=dados['Temperatura'])
-        plt.title('Boxplot da Temperatura')
-        plt.xlabel('Temperatura (°C)')
-        
-        # Boxplot das vendas
-        plt.subplot(2, 2, 4)
-        sns.boxplot(x=dados['Vendas'])
-        plt.title('Boxplot das Vendas')
-        plt.xlabel('Vendas de Sorvete')
-        
-        plt.tight_layout()
-        plt.savefig('outputs/distribuicao_dados.png')
+        executar_etapa(
+            'explorar', etapa_explorar, {'dados': dados},
+            dependencias={'codigo': hash_modulos(pre_processamento)}
+        )
         
-        # Visualizar correlação
-        plt.figure(figsize=(10, 6))
-        sns.scatterplot(x='Temperatura', y='Vendas', data=dados)
-        plt.title('Correlação entre Temperatura e Vendas')
-        plt.xlabel('Temperatura (°C)')
-        plt.ylabel('Vendas de Sorvete')
-        plt.grid(True, alpha=0.3)
-        plt.savefig('outputs/correlacao.png')
+        # 2.1 Gráficos dos dados (em segundo plano)
+        if gerar_graficos:
+            logger.info("Criando visualizações dos dados...")
+            executar_etapa(
+                'graficos_dados', partial(etapa_graficos_dados, renderizador=renderizador),
+                {'dados': dados}, SAIDAS_GRAFICOS_DADOS,
+                dependencias={'codigo': hash_modulos(graficos, estatisticas)}
+            )
         
         # 3. Preparar dados
         logger.info("Preparando dados para treinamento...")
-        X_train, X_test, y_train, y_test = preparar_dados(
-            dados, test_size=test_size, random_state=random_state
+        divisao = executar_etapa(
+            'dividir', etapa_dividir,
+            {'dados': dados, 'test_size': test_size, 'random_state': random_state, 'embaralhar': not temporal},
+            dependencias={'codigo': hash_modulos(pre_processamento)}
         )
         
-        # 4. Criar e treinar modelo
-        logger.info("Criando e treinando modelo...")
-        modelo = ModeloVendasSorvete()
-        
-        # 5. Registrar modelo no MLflow
-        logger.info("Registrando modelo no MLflow...")
-        run_id = modelo.registrar_modelo_mlflow(X_train, y_train, X_test, y_test)
+        # 4. Seleção de modelo por validação cruzada (somente no conjunto de treino)
+        ranking = None
+        if selecao_modelo:
+            logger.info(f"Selecionando modelo por validação cruzada ({estrategia_cv}, {n_dobras} dobras)...")
+            ranking = executar_etapa(
+                'selecionar', etapa_selecionar,
+                {'divisao': divisao, 'candidatos': candidatos, 'n_dobras': n_dobras, 'estrategia_cv': estrategia_cv},
+                SAIDAS_SELECAO,
+                dependencias={'codigo': hash_modulos(selecao_modelos, modelo_modulo)}
+            )
         
-        # 6. Salvar modelo
-        logger.info("Salvando modelo treinado...")
-        modelo.salvar_modelo()
+        # 5. Treinar, registrar no MLflow, salvar e publicar o modelo
+        logger.info("Criando e treinando modelo...")
+        treino = executar_etapa(
+            'treinar', partial(etapa_treinar, renderizador=renderizador, rastreador=rastreador),
+            {'divisao': divisao, 'ranking': ranking, 'candidatos': candidatos},
+            SAIDAS_TREINO,
+            dependencias={'codigo': hash_modulos(modelo_modulo, estatisticas, preditor, rastreamento, selecao_modelos,
+                                                  registro_modelos, escrita_atomica)}
+        )
         
-        # 7. Demonstração de uso do modelo
+        # 6. Demonstração de uso do modelo
         logger.info("Demonstração de uso do modelo:")
-        
-        # Previsões para temperatura variando de 20 a 35 graus
-        temperaturas_demo = np.arange(20, 36, 1).reshape(-1, 1)
-        vendas_previstas = modelo.prever(temperaturas_demo)
-        
-        # Criar DataFrame com resultados
-        demo_df = pd.DataFrame({
-            'Temperatura': temperaturas_demo.flatten(),
-            'Vendas_Previstas': vendas_previstas.astype(int)
-        })
-        
+        demo = executar_etapa(
+            'demonstrar', etapa_demonstrar, {'treino': treino}, SAIDAS_DEMONSTRACAO,
+            dependencias={'codigo': hash_modulos(modelo_modulo)}
+        )
         logger.info("\nPrevisões de vendas para diferentes temperaturas:")
-        logger.info(demo_df)
+        logger.info(demo.valor)
         
-        # Salvar tabela de demonstração
-        demo_df.to_csv('outputs/previsoes_demonstracao.csv', index=False)
-        
-        # 8. Concluir pipeline
+        # 7. Concluir pipeline (esperando os gráficos em segundo plano)
+        modelo, run_id = treino.valor
+        with perfilador.etapa('aguardar_graficos'):
+            renderizador.encerrar()
+        # Grava o cache das etapas em segundo plano; o do treino espera a criação do run no MLflow
+        cache.finalizar()
+        if isinstance(run_id, Future):
+            run_id = run_id.result()
+        # Um treino vindo do cache pertence a um run anterior: não misturar as medições
+        rastreador_perfil = None if treino.em_cache else rastreador
         logger.info("Pipeline executado com sucesso!")
         logger.info(f"Verifique os resultados na pasta 'outputs' e no MLflow (run_id: {run_id})")
         
@@ -132,7 +287,45 @@ def executar_pipeline(caminho_dados, test_size=0.2, random_state=42):
     except Exception as e:
         logger.error(f"Erro durante a execução do pipeline: {e}")
         return None, None
+    finally:
+        renderizador.encerrar()
+        perfilador.encerrar()
+        if perfilar:
+            # Gravado também quando o pipeline falha, com as etapas que chegaram a rodar
+            salvar_relatorio(perfilador, rastreador_perfil)
+        # Esperar os envios ao MLflow (no modo offline, a gravação local)
+        rastreador.aguardar()
 
 if __name__ == "__main__":
+    usar_backend_sem_janela()
+    parser = argparse.ArgumentParser(description="Treina, avalia e publica o modelo de vendas.")
+    parser.add_argument('--dados', default='inputs/base_vendas_sorvete.csv')
+    parser.add_argument('--sem-graficos', action='store_true',
+                        help="Não gera gráficos (retreinos agendados em produção)")
+    parser.add_argument('--sem-cache', action='store_true',
+                        help="Executa todas as etapas, ignorando o cache")
+    parser.add_argument('--selecao-modelo', action='store_true',
+                        help="Escolhe o regressor por validação cruzada entre os candidatos lineares")
+    parser.add_argument('--estrategia-cv', choices=['kfold', 'temporal'], default='kfold')
+    parser.add_argument('--sem-perfil', action='store_true',
+                        help="Não grava o relatório de execução")
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help="Mede o pico de alocações de cada etapa (bem mais lento)")
+    parser.add_argument('--mlflow-offline', action='store_true',
+                        help="Grava o run do MLflow localmente, para enviar depois com src/rastreamento.py")
+    parser.add_argument('--cprofile', action='store_true',
+                        help="Salva o cProfile da etapa mais lenta em outputs/")
+    args = parser.parse_args()
+
     # Executar pipeline
-    executar_pipeline('inputs/base_vendas_sorvete.csv')
\ No newline at end of file
+    executar_pipeline(
+        args.dados,
+        selecao_modelo=args.selecao_modelo,
+        estrategia_cv=args.estrategia_cv,
+        usar_cache=not args.sem_cache,
+        gerar_graficos=not args.sem_graficos,
+        perfilar=not args.sem_perfil,
+        tracemalloc=args.tracemalloc,
+        cprofile=args.cprofile,
+        modo_mlflow='offline' if args.mlflow_offline else 'assincrono'
+    )
\ No newline at end of file
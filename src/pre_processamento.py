@@ -1,20 +1,211 @@
+import os
+import json
+import hashlib
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 import numpy as np
 
-def carregar_dados(caminho_arquivo):
-    """Carrega os dados do arquivo CSV."""
+# Tipos compactos das colunas conhecidas
+TIPOS_COLUNAS = {'Temperatura': 'float32', 'Vendas': 'int32'}
+FORMATO_DATA = '%d/%m/%Y'
+
+def caminhos_cache(caminho_arquivo):
+    """Caminhos do cache colunar (Parquet) e dos seus metadados, ao lado do CSV."""
+    base = os.path.splitext(caminho_arquivo)[0]
+    return f"{base}.cache.parquet", f"{base}.cache.json"
+
+def hash_arquivo(caminho_arquivo, tamanho_bloco=1 << 20):
+    """SHA-256 do arquivo, lido em blocos."""
+    sha = hashlib.sha256()
+    with open(caminho_arquivo, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+def converter_datas(valores):
+    """
+    Converte textos dd/mm/aaaa em datetime64 de forma vetorizada.
+
+    Os dígitos são lidos direto do array de caracteres, sem parsing linha a
+    linha; qualquer valor fora do formato cai no pd.to_datetime.
+    """
+    texto = np.asarray(valores, dtype=object)
     try:
-        dados = pd.read_csv(caminho_arquivo)
+        caracteres = texto.astype('<U11').view(np.uint32).reshape(-1, 11)
+    except (TypeError, ValueError):
+        caracteres = None
+    if caracteres is not None and len(texto) and np.all(caracteres[:, 10] == 0) \
+            and np.all(caracteres[:, [2, 5]] == ord('/')):
+        digitos = caracteres[:, [0, 1, 3, 4, 6, 7, 8, 9]].astype(np.int64) - ord('0')
+        if np.all((digitos >= 0) & (digitos <= 9)):
+            dia = digitos[:, 0] * 10 + digitos[:, 1]
+            mes = digitos[:, 2] * 10 + digitos[:, 3]
+            ano = digitos[:, 4] * 1000 + digitos[:, 5] * 100 + digitos[:, 6] * 10 + digitos[:, 7]
+            meses = (ano - 1970) * 12 + (mes - 1)
+            datas = meses.astype('datetime64[M]').astype('datetime64[D]') + (dia - 1)
+            # Datas impossíveis (ex.: 31/02) mudariam de mês: deixar para o pandas acusar
+            if np.all((mes >= 1) & (mes <= 12) & (dia >= 1)) and \
+                    np.array_equal(datas.astype('datetime64[M]').astype(np.int64), meses):
+                return pd.Series(datas.astype('datetime64[ns]'), index=getattr(valores, 'index', None))
+    return pd.to_datetime(valores, format=FORMATO_DATA)
+
+def ajustar_tipos(dados):
+    """Converte Data para datetime64 e as colunas numéricas para tipos compactos."""
+    if 'Data' in dados and not pd.api.types.is_datetime64_any_dtype(dados['Data']):
+        try:
+            dados['Data'] = converter_datas(dados['Data'])
+        except (ValueError, TypeError):
+            dados['Data'] = pd.to_datetime(dados['Data'], dayfirst=True)
+    for coluna, tipo in TIPOS_COLUNAS.items():
+        if coluna in dados and not dados[coluna].isnull().any():
+            dados[coluna] = dados[coluna].astype(tipo)
+    return dados
+
+def ler_csv_tipado(caminho_arquivo, colunas=None):
+    """Lê o CSV já com os tipos compactos das colunas conhecidas."""
+    try:
+        dados = pd.read_csv(
+            caminho_arquivo, usecols=colunas, dtype={'Data': object, **TIPOS_COLUNAS}
+        )
+    except ValueError:
+        # Valores ausentes ou inválidos: ler com os tipos padrão e ajustar o que der
+        dados = pd.read_csv(caminho_arquivo, usecols=colunas, dtype={'Data': object})
+    return ajustar_tipos(dados)
+
+def ler_csv_em_blocos(caminho_arquivo, tamanho_bloco=1_000_000, colunas=None):
+    """Lê o CSV em blocos de `tamanho_bloco` linhas, já com os tipos compactos."""
+    leitor = pd.read_csv(
+        caminho_arquivo, usecols=colunas, dtype={'Data': object}, chunksize=tamanho_bloco
+    )
+    for bloco in leitor:
+        yield ajustar_tipos(bloco)
+
+def ler_parquet_em_blocos(caminho, tamanho_bloco=1_000_000, colunas=None):
+    """Lê um arquivo ou diretório Parquet (particionado estilo Hive) em blocos."""
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(caminho, format='parquet', partitioning='hive')
+    for lote in dataset.to_batches(columns=colunas, batch_size=tamanho_bloco):
+        if lote.num_rows:
+            yield ajustar_tipos(lote.to_pandas())
+
+def ler_em_blocos(caminho, tamanho_bloco=1_000_000, colunas=None):
+    """Lê CSV ou Parquet (arquivo ou diretório) em blocos de até `tamanho_bloco` linhas."""
+    if os.path.isdir(caminho) or caminho.endswith('.parquet'):
+        return ler_parquet_em_blocos(caminho, tamanho_bloco, colunas)
+    return ler_csv_em_blocos(caminho, tamanho_bloco, colunas)
+
+def separar_por_hash(chaves, test_size=0.2, seed=42):
+    """
+    Marca as linhas de teste a partir do hash das chaves, sem embaralhar em memória.
+
+    A mesma linha (mesma chave) cai sempre no mesmo conjunto, qualquer que seja
+    o tamanho dos blocos ou a ordem de leitura.
+    """
+    hashes = pd.util.hash_pandas_object(chaves, index=False, hash_key=f'{seed:016d}'[-16:])
+    return (hashes.to_numpy() % 1_000_000) < int(test_size * 1_000_000)
+
+def _assinatura(caminho_arquivo):
+    estado = os.stat(caminho_arquivo)
+    return {'tamanho': estado.st_size, 'mtime_ns': estado.st_mtime_ns}
+
+def carregar_com_cache(caminho_arquivo, colunas=None):
+    """
+    Carrega o CSV a partir de um cache colunar, reconstruído só quando o CSV muda.
+
+    O cache é válido se tamanho e mtime do CSV forem os mesmos; se só o mtime
+    mudou (arquivo tocado sem alteração), o hash SHA-256 confirma o conteúdo e o
+    cache é reaproveitado. A projeção `colunas` lê apenas as colunas pedidas.
+    """
+    # Import local: o módulo continua importável como src.pre_processamento
+    from escrita_atomica import gravacao_atomica, gravar_json_atomico
+
+    caminho_parquet, caminho_meta = caminhos_cache(caminho_arquivo)
+    assinatura = _assinatura(caminho_arquivo)
+
+    meta = None
+    if os.path.exists(caminho_parquet) and os.path.exists(caminho_meta):
+        try:
+            with open(caminho_meta, encoding='utf-8') as arquivo:
+                meta = json.load(arquivo)
+        except ValueError:
+            # Índice ilegível (ex.: gravado por uma versão antiga interrompida): reconstruir
+            meta = None
+
+    if meta is not None:
+        mesma_assinatura = all(meta.get(chave) == valor for chave, valor in assinatura.items())
+        if mesma_assinatura:
+            return pd.read_parquet(caminho_parquet, columns=colunas)
+        if meta.get('tamanho') == assinatura['tamanho'] and meta.get('sha256') == hash_arquivo(caminho_arquivo):
+            meta.update(assinatura)
+            gravar_json_atomico(meta, caminho_meta)
+            return pd.read_parquet(caminho_parquet, columns=colunas)
+
+    # Cache ausente ou desatualizado: ler o CSV completo e reconstruir
+    dados = ler_csv_tipado(caminho_arquivo)
+    with gravacao_atomica(caminho_parquet) as temporario:
+        dados.to_parquet(temporario, index=False)
+    gravar_json_atomico({**assinatura, 'sha256': hash_arquivo(caminho_arquivo)}, caminho_meta)
+    print(f"Cache colunar atualizado: {caminho_parquet}")
+
+    return dados[colunas] if colunas is not None else dados
+
+def carregar_dados(caminho_arquivo, colunas=None, usar_cache=True):
+    """
+    Carrega os dados do arquivo CSV.
+
+    Data é convertida para datetime64, Temperatura para float32 e Vendas para
+    int32. Com usar_cache=True, as leituras seguintes vêm de um cache Parquet ao
+    lado do CSV; `colunas` restringe a leitura às colunas informadas.
+    """
+    try:
+        if usar_cache:
+            try:
+                dados = carregar_com_cache(caminho_arquivo, colunas)
+            except (OSError, ImportError, ValueError) as e:
+                print(f"Cache colunar indisponível ({e}); lendo o CSV diretamente.")
+                dados = ler_csv_tipado(caminho_arquivo, colunas)
+        else:
+            dados = ler_csv_tipado(caminho_arquivo, colunas)
         print(f"Dados carregados com sucesso: {dados.shape[0]} registros e {dados.shape[1]} colunas.")
         return dados
     except Exception as e:
         print(f"Erro ao carregar os dados: {e}")
         return None
 
-def explorar_dados(dados):
-    """Explora os dados e exibe informações básicas."""
+def perfilar_dados(caminho_arquivo, tamanho_bloco=1_000_000, **kwargs):
+    """
+    Calcula o perfil dos dados em uma única passada, lendo o CSV em blocos.
+
+    Retorna um PerfilDados com contagem, nulos, média, variância, mínimo,
+    máximo, quantis aproximados de cada coluna e a covariância/correlação entre
+    Temperatura e Vendas, sem carregar o arquivo inteiro na memória.
+    """
+    # Import local: o módulo continua importável como src.pre_processamento
+    from estatisticas import PerfilStreaming
+
+    perfil = PerfilStreaming(**kwargs)
+    for bloco in ler_csv_em_blocos(caminho_arquivo, tamanho_bloco):
+        perfil.atualizar(bloco)
+    return perfil.resultado()
+
+def explorar_dados(dados, tamanho_bloco=1_000_000):
+    """
+    Explora os dados e exibe informações básicas.
+
+    Se `dados` for o caminho de um CSV, usa o perfil em streaming (uma passada
+    em blocos, memória constante) e retorna o PerfilDados.
+    """
+    if isinstance(dados, (str, os.PathLike)):
+        perfil = perfilar_dados(dados, tamanho_bloco)
+        print(f"Registros: {perfil.n_registros}")
+        print("\nEstatísticas descritivas:")
+        print(perfil.descrever())
+        print(f"\nCovariância Temperatura x Vendas: {perfil.covariancia:.4f}")
+        print(f"Correlação Temperatura x Vendas: {perfil.correlacao:.4f}")
+        return perfil
+
     print("Primeiras 5 linhas:")
     print(dados.head())
     
@@ -30,15 +221,21 @@ def explorar_dados(dados):
     print("\nCorrelação entre as variáveis:")
     print(dados[['Temperatura', 'Vendas']].corr())
 
-def preparar_dados(dados, test_size=0.2, random_state=42):
-    """Prepara os dados para treinamento e teste."""
-    # Separar features e target
-    X = dados[['Temperatura']].values
-    y = dados['Vendas'].values
+def preparar_dados(dados, test_size=0.2, random_state=42, embaralhar=True):
+    """
+    Prepara os dados para treinamento e teste.
+
+    Com embaralhar=False, a divisão respeita a ordem das linhas (útil para
+    validação temporal: dados ordenados por Data deixam o teste no final).
+    """
+    # Separar features e target (em float64: o cache guarda float32/int32 só para economizar memória)
+    X = dados[['Temperatura']].to_numpy(dtype=np.float64)
+    y = dados['Vendas'].to_numpy(dtype=np.float64)
     
     # Dividir em conjuntos de treino e teste
     X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=test_size, random_state=random_state
+        X, y, test_size=test_size, random_state=random_state if embaralhar else None,
+        shuffle=embaralhar
     )
     
     print(f"Dados divididos: {X_train.shape[0]} amostras de treino e {X_test.shape[0]} amostras de teste.")
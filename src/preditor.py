@@ -0,0 +1,150 @@
+import json
+
+import numpy as np
+
+# Modelos cuja previsão é exatamente X @ coef_ + intercept_
+MODELOS_LINEARES = {
+    'LinearRegression', 'Ridge', 'Lasso', 'ElasticNet',
+    'LassoLars', 'Lars', 'BayesianRidge', 'HuberRegressor'
+}
+
+# Artefato compacto: JSON com coeficientes e metadados, lido sem sklearn nem pickle
+FORMATO_COMPACTO = 'preditor_linear'
+VERSAO_FORMATO_COMPACTO = 1
+EXTENSAO_COMPACTA = '.json'
+
+class PreditorLinear:
+    """Preditor que calcula coef * temperatura + intercepto sem passar pelo sklearn."""
+
+    compilado = True
+
+    def __init__(self, coef, intercepto, nomes_features=('Temperatura',), metadados=None,
+                 bootstrap=None):
+        self.coef = float(coef)
+        self.intercepto = float(intercepto)
+        self.nomes_features = tuple(nomes_features)
+        self.metadados = metadados or {}
+        self.bootstrap = None if bootstrap is None else np.asarray(bootstrap, dtype=float)
+
+    def prever(self, temperatura):
+        """Faz previsões para um escalar ou um array de temperaturas."""
+        # Escalares do Python ou do NumPy (np.float32(3), np.int64(3)) devolvem um float
+        if np.ndim(temperatura) == 0:
+            return self.coef * float(temperatura) + self.intercepto
+        temperaturas = np.asarray(temperatura, dtype=float).reshape(-1)
+        return temperaturas * self.coef + self.intercepto
+
+    def predict(self, X):
+        """Interface compatível com o sklearn (X com formato (n, 1))."""
+        return np.asarray(X, dtype=float).reshape(-1) * self.coef + self.intercepto
+
+    def prever_intervalo(self, temperatura, nivel=0.9, predicao=True):
+        """Limites (inferior, superior) do intervalo bootstrap para cada temperatura."""
+        if self.bootstrap is None:
+            raise ValueError("O modelo não tem coeficientes bootstrap; treine-o novamente.")
+        return intervalo_bootstrap(self.bootstrap, temperatura, nivel, predicao)
+
+def intervalo_bootstrap(coeficientes, temperaturas, nivel=0.9, predicao=True):
+    """
+    Intervalo bootstrap das previsões para um lote de temperaturas.
+
+    `coeficientes` é a matriz (reamostragens, 3) de inclinação, intercepto e
+    resíduo sorteado (estatisticas.coeficientes_bootstrap). As previsões de
+    todas as reamostragens saem de um único produto de matrizes, e os limites
+    são os quantis (1 - nivel)/2 e (1 + nivel)/2. Com predicao=True o resíduo
+    entra na conta (intervalo de predição de vendas de um dia); com False o
+    intervalo é só da reta média (intervalo de confiança).
+    """
+    temperaturas = np.asarray(temperaturas, dtype=float).reshape(-1)
+    colunas = [temperaturas, np.ones_like(temperaturas)]
+    if predicao:
+        colunas.append(np.ones_like(temperaturas))
+    previsoes = np.column_stack(colunas) @ coeficientes[:, :len(colunas)].T
+    cauda = (1 - nivel) / 2
+    inferior, superior = np.quantile(previsoes, [cauda, 1 - cauda], axis=1)
+    return inferior, superior
+
+class PreditorSklearn:
+    """Preditor de fallback que delega para o predict do modelo original."""
+
+    compilado = False
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+
+    def prever(self, temperatura):
+        """Faz previsões para um escalar ou um array de temperaturas."""
+        if np.ndim(temperatura) == 0:
+            return float(self.modelo.predict([[float(temperatura)]])[0])
+        temperaturas = np.asarray(temperatura, dtype=float).reshape(-1, 1)
+        return self.modelo.predict(temperaturas)
+
+    def predict(self, X):
+        """Interface compatível com o sklearn (X com formato (n, 1))."""
+        return self.modelo.predict(X)
+
+def compilar_preditor(modelo):
+    """
+    Extrai coef_ e intercept_ do modelo uma única vez e retorna um preditor rápido.
+
+    Modelos não lineares, com mais de uma feature ou encapsulados em Pipeline
+    usam o predict do sklearn.
+    """
+    if type(modelo).__name__ in MODELOS_LINEARES:
+        coef = np.ravel(getattr(modelo, 'coef_', []))
+        intercepto = np.ravel(getattr(modelo, 'intercept_', []))
+        if coef.size == 1 and intercepto.size == 1:
+            return PreditorLinear(
+                coef[0], intercepto[0], bootstrap=getattr(modelo, 'bootstrap_coeficientes_', None)
+            )
+    return PreditorSklearn(modelo)
+
+def salvar_compacto(modelo, caminho, metadados=None):
+    """
+    Salva um modelo linear como artefato compacto (JSON pequeno, sem pickle).
+
+    Guarda coeficiente, intercepto, nomes das features, tipo do modelo,
+    metadados de treino e, se houver, a matriz de coeficientes bootstrap. A
+    escrita é atômica (gravar_json_atomico).
+    """
+    # Import local: o módulo continua importável como src.preditor
+    from escrita_atomica import gravar_json_atomico
+
+    preditor = modelo if isinstance(modelo, PreditorLinear) else compilar_preditor(modelo)
+    if not isinstance(preditor, PreditorLinear):
+        raise ValueError(
+            f"O formato compacto só suporta modelos lineares de uma feature, não {type(modelo).__name__}."
+        )
+    nomes_features = getattr(modelo, 'feature_names_in_', preditor.nomes_features)
+    conteudo = {
+        'formato': FORMATO_COMPACTO,
+        'versao_formato': VERSAO_FORMATO_COMPACTO,
+        'tipo_modelo': preditor.metadados.get('tipo_modelo', type(modelo).__name__),
+        'features': [str(nome) for nome in nomes_features],
+        'coef': [preditor.coef],
+        'intercepto': preditor.intercepto,
+        'metadados': {**preditor.metadados, **(metadados or {})},
+    }
+    conteudo['metadados'].pop('tipo_modelo', None)
+    if preditor.bootstrap is not None:
+        conteudo['bootstrap'] = preditor.bootstrap.tolist()
+    return gravar_json_atomico(conteudo, caminho, ensure_ascii=False)
+
+def carregar_compacto(caminho):
+    """Carrega um artefato compacto como PreditorLinear (sem importar o sklearn)."""
+    with open(caminho, encoding='utf-8') as arquivo:
+        conteudo = json.load(arquivo)
+    if conteudo.get('formato') != FORMATO_COMPACTO:
+        raise ValueError(f"Artefato {caminho} não está no formato {FORMATO_COMPACTO}.")
+    if conteudo.get('versao_formato', 0) > VERSAO_FORMATO_COMPACTO:
+        raise ValueError(
+            f"Artefato {caminho} usa a versão {conteudo['versao_formato']} do formato; "
+            f"a suportada é {VERSAO_FORMATO_COMPACTO}."
+        )
+    if len(conteudo['coef']) != 1:
+        raise ValueError(f"Artefato {caminho} tem {len(conteudo['coef'])} coeficientes; esperado 1.")
+    metadados = {'tipo_modelo': conteudo.get('tipo_modelo'), **conteudo.get('metadados', {})}
+    return PreditorLinear(
+        conteudo['coef'][0], conteudo['intercepto'], conteudo['features'], metadados,
+        bootstrap=conteudo.get('bootstrap')
+    )
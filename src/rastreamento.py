@@ -0,0 +1,371 @@
+import os
+import copy
+import json
+import time
+import uuid
+import queue
+import atexit
+import shutil
+import logging
+import tempfile
+import argparse
+import threading
+from concurrent.futures import Future
+
+from escrita_atomica import gravar_json_atomico
+
+logger = logging.getLogger(__name__)
+
+EXPERIMENTO_PADRAO = "Previsao_Vendas_Sorvete"
+DIRETORIO_OFFLINE = 'outputs/runs_offline'
+ARQUIVO_RUN = 'run.json'
+
+# Limites do log_batch do MLflow
+MAX_METRICAS_LOTE = 1000
+MAX_PARAMS_LOTE = 100
+
+# Rastreadores com envios pendentes (esvaziados na saída do processo)
+_ativos = set()
+
+def _agora_ms():
+    return int(time.time() * 1000)
+
+def _lotes(itens, tamanho):
+    for inicio in range(0, len(itens), tamanho):
+        yield itens[inicio:inicio + tamanho]
+
+def _salvar_modelo_sklearn(modelo, destino):
+    import mlflow.sklearn
+    mlflow.sklearn.save_model(modelo, destino)
+
+class _DestinoMLflow:
+    """Envia o run ao servidor/pasta de tracking do MLflow."""
+
+    def __init__(self):
+        from mlflow.tracking import MlflowClient
+        self.cliente = MlflowClient()
+        self.run_id = None
+
+    def criar_run(self, experimento, nome, tags, inicio):
+        existente = self.cliente.get_experiment_by_name(experimento)
+        experimento_id = (
+            existente.experiment_id if existente is not None else self.cliente.create_experiment(experimento)
+        )
+        run = self.cliente.create_run(experimento_id, start_time=inicio, tags=tags, run_name=nome)
+        self.run_id = run.info.run_id
+        return self.run_id
+
+    def enviar_lote(self, params, metricas):
+        from mlflow.entities import Metric, Param
+
+        for lote in _lotes([Param(chave, str(valor)) for chave, valor in params.items()], MAX_PARAMS_LOTE):
+            self.cliente.log_batch(self.run_id, params=lote)
+        for lote in _lotes([Metric(*metrica) for metrica in metricas], MAX_METRICAS_LOTE):
+            self.cliente.log_batch(self.run_id, metrics=lote)
+
+    def enviar_artefato(self, caminho, diretorio):
+        self.cliente.log_artifact(self.run_id, caminho, diretorio)
+
+    def enviar_modelo(self, modelo, nome):
+        with tempfile.TemporaryDirectory() as temporario:
+            try:
+                _salvar_modelo_sklearn(modelo, os.path.join(temporario, nome))
+            except Exception as e:
+                # Falha local de serialização: o run segue sem o modelo
+                logger.error(f"Não foi possível serializar o modelo para o MLflow: {e}")
+                return
+            self.cliente.log_artifacts(self.run_id, os.path.join(temporario, nome), nome)
+
+    def encerrar_run(self, status, fim):
+        self.cliente.set_terminated(self.run_id, status, end_time=fim)
+
+class _DestinoOffline:
+    """
+    Grava o run em uma pasta local (run.json + artefatos) para enviar depois.
+
+    Com `run_id_mlflow`, a pasta guarda o restante de um run já criado no
+    servidor, e enviar_pendentes() completa esse run em vez de criar outro.
+    """
+
+    def __init__(self, diretorio, run_id_mlflow=None):
+        self.diretorio = diretorio
+        self.run_id_mlflow = run_id_mlflow
+        self.run_id = None
+        self.pasta = None
+        self.conteudo = None
+
+    def criar_run(self, experimento, nome, tags, inicio):
+        self.run_id = f"offline-{uuid.uuid4().hex}"
+        self.pasta = os.path.join(self.diretorio, self.run_id)
+        os.makedirs(os.path.join(self.pasta, 'artefatos'), exist_ok=True)
+        self.conteudo = {
+            'run_id': self.run_id, 'experimento': experimento, 'nome': nome, 'tags': tags or {},
+            'inicio': inicio, 'fim': None, 'status': 'RUNNING', 'params': {}, 'metricas': [],
+            'run_id_mlflow': self.run_id_mlflow, 'enviado': None
+        }
+        self._gravar()
+        return self.run_id
+
+    @classmethod
+    def abrir(cls, pasta):
+        """Abre um run offline já gravado."""
+        destino = cls(os.path.dirname(pasta))
+        destino.pasta = pasta
+        with open(os.path.join(pasta, ARQUIVO_RUN), encoding='utf-8') as arquivo:
+            destino.conteudo = json.load(arquivo)
+        destino.run_id = destino.conteudo['run_id']
+        return destino
+
+    def marcar_enviado(self, run_id):
+        self.conteudo['enviado'] = {'run_id': run_id, 'em': _agora_ms()}
+        self._gravar()
+
+    def _gravar(self):
+        gravar_json_atomico(self.conteudo, os.path.join(self.pasta, ARQUIVO_RUN), ensure_ascii=False, indent=2)
+
+    def enviar_lote(self, params, metricas):
+        self.conteudo['params'].update({chave: str(valor) for chave, valor in params.items()})
+        self.conteudo['metricas'].extend(metricas)
+        self._gravar()
+
+    def enviar_artefato(self, caminho, diretorio):
+        destino = os.path.join(self.pasta, 'artefatos', diretorio or '')
+        os.makedirs(destino, exist_ok=True)
+        shutil.copy2(caminho, destino)
+
+    def enviar_modelo(self, modelo, nome):
+        try:
+            _salvar_modelo_sklearn(modelo, os.path.join(self.pasta, 'artefatos', nome))
+        except Exception as e:
+            logger.error(f"Não foi possível serializar o modelo no run offline: {e}")
+
+    def encerrar_run(self, status, fim):
+        self.conteudo.update(status=status, fim=fim)
+        self._gravar()
+
+class RastreadorMLflow:
+    """
+    Registro de um run do MLflow fora do caminho do treino.
+
+    Parâmetros, métricas, artefatos e o modelo entram em uma fila e são
+    enviados por uma thread em segundo plano; parâmetros e métricas
+    consecutivos vão juntos em um log_batch. Nenhuma chamada bloqueia no
+    servidor de tracking, exceto `run_id` (espera a criação do run; use
+    `run_id_futuro` para não esperar) e aguardar(), que esvazia a fila
+    (também chamada na saída do processo).
+
+    Com modo='offline', o run é gravado em `diretorio_offline/<run_id>/`
+    (run.json e artefatos), para ser enviado depois com enviar_pendentes().
+    Se o servidor falhar no modo 'assincrono', o que ainda não foi confirmado
+    por ele é gravado nesse formato e nada se perde: se o run já existia no
+    servidor, `run_id` continua sendo o dele (enviar_pendentes() completa esse
+    mesmo run) e `run_id_offline` indica a pasta local com o restante.
+    Operações confirmadas pelo servidor não ficam guardadas em memória.
+    """
+
+    def __init__(self, experimento=EXPERIMENTO_PADRAO, modo='assincrono', diretorio_offline=DIRETORIO_OFFLINE):
+        if modo not in ('assincrono', 'offline'):
+            raise ValueError(f"Modo de rastreamento desconhecido: {modo!r} (use 'assincrono' ou 'offline').")
+        self.experimento = experimento
+        self.modo = modo
+        self.diretorio_offline = diretorio_offline
+        self._fila = queue.Queue()
+        self._trava = threading.Lock()
+        self._criacao = None
+        self._run_id = Future()
+        self._destino = None
+        self._iniciado = False
+        self._trabalhando = False
+        self._parar = False
+        self._thread = None
+
+    @property
+    def run_id(self):
+        """Identificador do run (no modo offline, 'offline-...'). Espera a criação do run."""
+        return self._run_id.result()
+
+    @property
+    def run_id_futuro(self):
+        """Future com o identificador do run, resolvido quando a thread de envio criar o run."""
+        return self._run_id
+
+    @property
+    def run_id_offline(self):
+        """Identificador da pasta offline em uso ('offline-...'), ou None se tudo foi ao servidor."""
+        return self._destino.run_id if isinstance(self._destino, _DestinoOffline) else None
+
+    def iniciar_run(self, nome=None, tags=None):
+        """Cria o run em segundo plano e retorna o rastreador."""
+        if self._iniciado:
+            raise RuntimeError("Este rastreador já iniciou um run.")
+        self._iniciado = True
+        self._enfileirar(('criar_run', self.experimento, nome, tags, _agora_ms()))
+        return self
+
+    def log_param(self, chave, valor):
+        self._enfileirar(('params', {chave: valor}))
+
+    def log_params(self, params):
+        self._enfileirar(('params', dict(params)))
+
+    def log_metric(self, chave, valor, passo=0):
+        self._enfileirar(('metricas', [(chave, float(valor), _agora_ms(), passo)]))
+
+    def log_metrics(self, metricas, passo=0):
+        agora = _agora_ms()
+        self._enfileirar(('metricas', [(chave, float(valor), agora, passo) for chave, valor in metricas.items()]))
+
+    def log_artefato(self, caminho, diretorio=None):
+        self._enfileirar(('artefato', caminho, diretorio))
+
+    def log_modelo(self, modelo, nome='model'):
+        """Registra um modelo sklearn (uma cópia, para que o treino possa seguir alterando o original)."""
+        self._enfileirar(('modelo', copy.deepcopy(modelo), nome))
+
+    def finalizar(self, status='FINISHED'):
+        """Marca o fim do run sem esperar o envio (artefatos ainda podem ser anexados depois)."""
+        self._enfileirar(('encerrar_run', status, _agora_ms()))
+
+    def aguardar(self, tempo_limite=None):
+        """Espera todos os envios pendentes (registros posteriores voltam a ser enviados em segundo plano)."""
+        with self._trava:
+            if not self._trabalhando:
+                return
+            self._parar = True
+            self._fila.put(None)
+            thread = self._thread
+        thread.join(tempo_limite)
+
+    def _enfileirar(self, operacao):
+        if not self._iniciado:
+            raise RuntimeError("Chame iniciar_run() antes de registrar no run.")
+        with self._trava:
+            self._fila.put(operacao)
+            if not self._trabalhando:
+                self._trabalhando, self._parar = True, False
+                self._thread = threading.Thread(target=self._trabalhar, name='rastreador-mlflow', daemon=True)
+                self._thread.start()
+                _ativos.add(self)
+
+    def _trabalhar(self):
+        while True:
+            # Bloqueia pela próxima operação e junta as que já estiverem na fila
+            operacoes = [self._fila.get()]
+            while True:
+                try:
+                    operacoes.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            operacoes = [operacao for operacao in operacoes if operacao is not None]
+            self._enviar(operacoes)
+            with self._trava:
+                if self._parar and self._fila.empty():
+                    self._trabalhando = False
+                    _ativos.discard(self)
+                    if not self._run_id.done():
+                        self._run_id.set_result(None)
+                    return
+
+    def _enviar(self, operacoes):
+        try:
+            if self._destino is None:
+                self._destino = (
+                    _DestinoOffline(self.diretorio_offline) if self.modo == 'offline' else _DestinoMLflow()
+                )
+            self._executar(self._destino, operacoes)
+        except Exception as e:
+            if isinstance(self._destino, _DestinoOffline):
+                logger.error(f"Falha ao gravar o run offline: {e}")
+            else:
+                # Servidor indisponível: gravar localmente o que ele não confirmou, para enviar depois
+                run_id_mlflow = getattr(self._destino, 'run_id', None)
+                logger.warning(
+                    f"Servidor do MLflow indisponível ({e}); gravando o run "
+                    f"{run_id_mlflow or '(não criado)'} em {self.diretorio_offline}."
+                )
+                self._destino = _DestinoOffline(self.diretorio_offline, run_id_mlflow)
+                if not any(operacao[0] == 'criar_run' for operacao in operacoes):
+                    operacoes = [self._criacao] + operacoes
+                try:
+                    self._executar(self._destino, operacoes)
+                except Exception as e:
+                    logger.error(f"Falha ao gravar o run offline: {e}")
+            # Sem run criado em lugar nenhum: quem espera o run_id recebe None
+            if not self._run_id.done():
+                self._run_id.set_result(None)
+
+    def _executar(self, destino, operacoes):
+        params, metricas = {}, []
+
+        def enviar_lote():
+            if params or metricas:
+                destino.enviar_lote(dict(params), list(metricas))
+                params.clear()
+                metricas.clear()
+
+        for operacao in operacoes:
+            tipo = operacao[0]
+            if tipo == 'params':
+                params.update(operacao[1])
+            elif tipo == 'metricas':
+                metricas.extend(operacao[1])
+            else:
+                enviar_lote()
+                if tipo == 'criar_run':
+                    # Só a criação é guardada, para reabrir o run offline se o servidor cair
+                    self._criacao = operacao
+                    run_id = destino.criar_run(*operacao[1:])
+                    if not self._run_id.done():
+                        self._run_id.set_result(run_id)
+                elif tipo == 'artefato':
+                    destino.enviar_artefato(*operacao[1:])
+                elif tipo == 'modelo':
+                    destino.enviar_modelo(*operacao[1:])
+                elif tipo == 'encerrar_run':
+                    destino.encerrar_run(*operacao[1:])
+        enviar_lote()
+
+def enviar_pendentes(diretorio=DIRETORIO_OFFLINE):
+    """Envia ao MLflow os runs gravados offline que ainda não foram enviados. Retorna os novos run_ids."""
+    enviados = []
+    if not os.path.isdir(diretorio):
+        return enviados
+    for nome in sorted(os.listdir(diretorio)):
+        pasta = os.path.join(diretorio, nome)
+        if not os.path.exists(os.path.join(pasta, ARQUIVO_RUN)):
+            continue
+        offline = _DestinoOffline.abrir(pasta)
+        conteudo = offline.conteudo
+        if conteudo.get('enviado'):
+            continue
+        destino = _DestinoMLflow()
+        if conteudo.get('run_id_mlflow'):
+            # Restante de um run que já existe no servidor: completar o mesmo run
+            run_id = destino.run_id = conteudo['run_id_mlflow']
+        else:
+            run_id = destino.criar_run(conteudo['experimento'], conteudo['nome'], conteudo['tags'], conteudo['inicio'])
+        destino.enviar_lote(conteudo['params'], [tuple(metrica) for metrica in conteudo['metricas']])
+        artefatos = os.path.join(pasta, 'artefatos')
+        if os.listdir(artefatos):
+            destino.cliente.log_artifacts(run_id, artefatos)
+        status = conteudo['status'] if conteudo['status'] != 'RUNNING' else 'FINISHED'
+        destino.encerrar_run(status, conteudo['fim'] or _agora_ms())
+        # Marcar como enviado para não duplicar o run em um novo envio
+        offline.marcar_enviado(run_id)
+        logger.info(f"Run offline {nome} enviado ao MLflow como {run_id}.")
+        enviados.append(run_id)
+    return enviados
+
+@atexit.register
+def _esvaziar_ativos():
+    # Esvaziar as filas na saída do processo
+    for rastreador in list(_ativos):
+        rastreador.aguardar()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Envia ao MLflow os runs gravados no modo offline.")
+    parser.add_argument('--diretorio', default=DIRETORIO_OFFLINE)
+    args = parser.parse_args()
+    enviados = enviar_pendentes(args.diretorio)
+    print(f"{len(enviados)} run(s) enviado(s).")
@@ -0,0 +1,324 @@
+import os
+import re
+import glob
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+
+import joblib
+import numpy as np
+
+from escrita_atomica import gravacao_atomica
+from preditor import EXTENSAO_COMPACTA, carregar_compacto, compilar_preditor, salvar_compacto
+
+logger = logging.getLogger(__name__)
+
+PREFIXO_ARTEFATO = 'modelo_'
+EXTENSAO_ARTEFATO = '.joblib'
+
+# Extensões aceitas; com a mesma versão nos dois formatos, o compacto tem prioridade
+EXTENSOES_ARTEFATO = (EXTENSAO_ARTEFATO, EXTENSAO_COMPACTA)
+
+# Identificadores de loja aceitos (também usados como nome de pasta)
+LOJA_VALIDA = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Temperaturas usadas para validar um modelo antes de colocá-lo em produção
+TEMPERATURAS_VALIDACAO = np.array([20.0, 25.0, 30.0, 35.0])
+
+@dataclass(frozen=True)
+class ModeloAtivo:
+    """Versão de modelo em produção. Imutável: é trocada inteira, nunca alterada."""
+    versao: str
+    caminho: str
+    modelo: object
+    preditor: object
+    carregado_em: datetime
+    duracao_carga: float = 0.0
+
+def versao_do_artefato(caminho):
+    """Extrai a versão do nome do arquivo (modelo_<versao>.joblib ou .json)."""
+    nome, extensao = os.path.splitext(os.path.basename(caminho))
+    if nome.startswith(PREFIXO_ARTEFATO) and extensao in EXTENSOES_ARTEFATO:
+        return nome[len(PREFIXO_ARTEFATO):]
+    return nome
+
+def listar_versoes(diretorio):
+    """Lista os artefatos versionados do diretório, do mais antigo ao mais recente."""
+    caminhos = []
+    for extensao in EXTENSOES_ARTEFATO:
+        caminhos += glob.glob(os.path.join(diretorio, f'{PREFIXO_ARTEFATO}*{extensao}'))
+    return sorted(caminhos, key=lambda c: (versao_do_artefato(c), c.endswith(EXTENSAO_COMPACTA)))
+
+def publicar_modelo(modelo, diretorio, versao=None, formato='joblib', metadados=None):
+    """
+    Salva um modelo como novo artefato versionado.
+
+    Com formato='compacto', grava o JSON de salvar_compacto (apenas modelos
+    lineares), que a API carrega sem sklearn nem pickle. O arquivo é escrito
+    com gravacao_atomica, então quem observa o diretório nunca enxerga um
+    artefato pela metade.
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    if versao is None:
+        versao = datetime.now().strftime('v%Y%m%d_%H%M%S_%f')
+    if formato == 'compacto':
+        destino = os.path.join(diretorio, f'{PREFIXO_ARTEFATO}{versao}{EXTENSAO_COMPACTA}')
+        return salvar_compacto(modelo, destino, metadados)
+    if formato != 'joblib':
+        raise ValueError(f"Formato de artefato desconhecido: {formato}")
+    destino = os.path.join(diretorio, f'{PREFIXO_ARTEFATO}{versao}{EXTENSAO_ARTEFATO}')
+    with gravacao_atomica(destino) as temporario:
+        joblib.dump(modelo, temporario)
+    return destino
+
+def carregar_e_validar(caminho):
+    """Carrega um artefato e confere se ele produz previsões válidas."""
+    inicio = time.perf_counter()
+    if caminho.endswith(EXTENSAO_COMPACTA):
+        modelo = preditor = carregar_compacto(caminho)
+    else:
+        modelo = joblib.load(caminho)
+        if not hasattr(modelo, 'predict'):
+            raise ValueError(f"Artefato {caminho} não contém um modelo com predict().")
+        preditor = compilar_preditor(modelo)
+
+    previsoes = np.asarray(preditor.prever(TEMPERATURAS_VALIDACAO))
+    if previsoes.shape != TEMPERATURAS_VALIDACAO.shape or not np.all(np.isfinite(previsoes)):
+        raise ValueError(f"Artefato {caminho} gerou previsões inválidas: {previsoes}")
+
+    return ModeloAtivo(
+        versao=versao_do_artefato(caminho),
+        caminho=caminho,
+        modelo=modelo,
+        preditor=preditor,
+        carregado_em=datetime.now(),
+        duracao_carga=time.perf_counter() - inicio
+    )
+
+class RegistroModelos:
+    """
+    Mantém o modelo ativo da API e troca de versão sem reiniciar o servidor.
+
+    Uma thread em segundo plano observa o diretório de artefatos versionados;
+    quando surge uma versão mais recente, ela é carregada e validada fora do
+    caminho das requisições e só então substitui o modelo ativo com uma única
+    atribuição. Cada requisição lê `registro.ativo` uma vez e usa essa versão
+    do início ao fim, então requisições em andamento não são afetadas.
+    """
+
+    def __init__(self, diretorio, caminho_padrao=None, intervalo=5.0):
+        self.diretorio = diretorio
+        self.caminho_padrao = caminho_padrao
+        self.intervalo = intervalo
+        self.ativo = None
+        self._rejeitados = set()
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def carregar_inicial(self):
+        """Carrega a versão mais recente disponível (ou o artefato padrão)."""
+        if not self.verificar_atualizacao() and self.caminho_padrao:
+            self.ativo = carregar_e_validar(self.caminho_padrao)
+            logger.info(f"Modelo padrão carregado: {self.ativo.versao}")
+        if self.ativo is None:
+            raise FileNotFoundError(
+                f"Nenhum modelo encontrado em {self.diretorio} ou {self.caminho_padrao}"
+            )
+        return self.ativo
+
+    def verificar_atualizacao(self):
+        """Carrega a versão mais recente se ela for diferente da ativa. Retorna True se trocou."""
+        with self._lock:
+            for caminho in reversed(listar_versoes(self.diretorio)):
+                chave = (caminho, os.path.getmtime(caminho))
+                if chave in self._rejeitados:
+                    continue
+                if self.ativo is not None and self.ativo.caminho == caminho:
+                    return False
+                try:
+                    novo = carregar_e_validar(caminho)
+                except Exception as e:
+                    logger.error(f"Artefato rejeitado {caminho}: {e}")
+                    self._rejeitados.add(chave)
+                    continue
+                anterior = self.ativo.versao if self.ativo else None
+                self.ativo = novo
+                logger.info(f"Modelo ativo trocado: {anterior} -> {novo.versao}")
+                return True
+            return False
+
+    def _observar(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.verificar_atualizacao()
+            except Exception as e:
+                logger.error(f"Erro ao verificar novos modelos: {e}")
+
+    def iniciar(self):
+        """Inicia a thread que observa o diretório de artefatos."""
+        if self._thread is None or not self._thread.is_alive():
+            self._parar.clear()
+            self._thread = threading.Thread(
+                target=self._observar, name='registro-modelos', daemon=True
+            )
+            self._thread.start()
+
+    def parar(self):
+        """Interrompe a thread de observação."""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.intervalo)
+            self._thread = None
+
+class CacheModelosLojas:
+    """
+    Modelos por loja carregados sob demanda e mantidos em um cache LRU.
+
+    Cada loja tem sua pasta <diretorio>/<loja>/ com artefatos versionados
+    (modelo_<versao>.joblib). O modelo é carregado no primeiro uso e as lojas
+    menos usadas são descartadas quando o cache passa de `max_modelos` ou de
+    `max_bytes` (estimado pelo tamanho dos artefatos em disco). Entradas mais
+    antigas que `intervalo` segundos conferem se há versão nova no próximo uso.
+
+    Lojas sem artefato também ficam registradas (até `max_modelos` delas) por
+    `intervalo` segundos, para que cada requisição não liste a pasta de novo;
+    uma versão publicada por outro processo aparece ao fim do intervalo; com
+    publicar() (ou invalidar(loja)), imediatamente.
+    """
+
+    def __init__(self, diretorio, max_modelos=5000, max_bytes=256 * 1024 ** 2, intervalo=60.0):
+        self.diretorio = diretorio
+        self.max_modelos = max_modelos
+        self.max_bytes = max_bytes
+        self.intervalo = intervalo
+        self._cache = OrderedDict()
+        self._sem_modelo = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._locks_carga = {}
+        self.estatisticas = {'acertos': 0, 'faltas': 0, 'despejos': 0}
+
+    def __len__(self):
+        return len(self._cache)
+
+    @property
+    def bytes_em_cache(self):
+        return self._bytes
+
+    def _pasta_da_loja(self, loja):
+        if not LOJA_VALIDA.match(loja):
+            raise ValueError(f"Identificador de loja inválido: {loja!r}")
+        return os.path.join(self.diretorio, loja)
+
+    def obter_em_cache(self, loja):
+        """Retorna o modelo da loja se ele já estiver carregado e atualizado (sem I/O)."""
+        with self._lock:
+            entrada = self._cache.get(loja)
+            if entrada is None or time.monotonic() - entrada[2] > self.intervalo:
+                return None
+            self._cache.move_to_end(loja)
+            self.estatisticas['acertos'] += 1
+            return entrada[0]
+
+    def sem_modelo(self, loja):
+        """True se a loja foi conferida há menos de `intervalo` segundos e não tinha artefato (sem I/O)."""
+        with self._lock:
+            conferida = self._sem_modelo.get(loja)
+            return conferida is not None and time.monotonic() - conferida <= self.intervalo
+
+    def obter(self, loja):
+        """
+        Retorna o modelo ativo da loja, carregando-o se necessário.
+
+        Retorna None se a loja não tiver nenhum artefato publicado.
+        """
+        ativo = self.obter_em_cache(loja)
+        if ativo is not None or self.sem_modelo(loja):
+            return ativo
+
+        pasta = self._pasta_da_loja(loja)
+        with self._lock:
+            lock_carga = self._locks_carga.setdefault(loja, threading.Lock())
+
+        # Apenas uma thread carrega cada loja; as demais esperam e reaproveitam
+        with lock_carga:
+            ativo = self.obter_em_cache(loja)
+            if ativo is not None or self.sem_modelo(loja):
+                return ativo
+
+            versoes = listar_versoes(pasta)
+            with self._lock:
+                entrada = self._cache.get(loja)
+            if entrada is not None and versoes and entrada[0].caminho == versoes[-1]:
+                # Nenhuma versão nova: apenas renovar a verificação
+                with self._lock:
+                    self._cache[loja] = (entrada[0], entrada[1], time.monotonic())
+                    self._cache.move_to_end(loja)
+                return entrada[0]
+
+            if not versoes:
+                with self._lock:
+                    self._locks_carga.pop(loja, None)
+                    if entrada is None:
+                        self._sem_modelo[loja] = time.monotonic()
+                        self._sem_modelo.move_to_end(loja)
+                        while len(self._sem_modelo) > self.max_modelos:
+                            self._sem_modelo.popitem(last=False)
+                return entrada[0] if entrada is not None else None
+
+            ativo = carregar_e_validar(versoes[-1])
+            tamanho = os.path.getsize(versoes[-1])
+            with self._lock:
+                self.estatisticas['faltas'] += 1
+                self._sem_modelo.pop(loja, None)
+                anterior = self._cache.pop(loja, None)
+                if anterior is not None:
+                    self._bytes -= anterior[1]
+                self._cache[loja] = (ativo, tamanho, time.monotonic())
+                self._bytes += tamanho
+                self._despejar()
+            return ativo
+
+    def _despejar(self):
+        # Chamado com self._lock adquirido; preserva sempre a entrada mais recente
+        while len(self._cache) > 1 and (
+            len(self._cache) > self.max_modelos or self._bytes > self.max_bytes
+        ):
+            loja, (_, tamanho, _) = self._cache.popitem(last=False)
+            self._bytes -= tamanho
+            self._locks_carga.pop(loja, None)
+            self.estatisticas['despejos'] += 1
+
+    def precarregar(self, lojas):
+        """Carrega antecipadamente as lojas mais acessadas. Retorna quantas foram carregadas."""
+        carregadas = 0
+        for loja in lojas:
+            try:
+                if self.obter(loja) is not None:
+                    carregadas += 1
+            except Exception as e:
+                logger.error(f"Falha ao pré-carregar a loja {loja}: {e}")
+        logger.info(f"{carregadas} modelos de loja pré-carregados")
+        return carregadas
+
+    def publicar(self, loja, modelo, **opcoes):
+        """Publica uma versão na pasta da loja (ver publicar_modelo) e a invalida no cache."""
+        caminho = publicar_modelo(modelo, self._pasta_da_loja(loja), **opcoes)
+        self.invalidar(loja)
+        return caminho
+
+    def invalidar(self, loja=None):
+        """Remove uma loja (ou todas) do cache, inclusive o registro de loja sem artefato."""
+        with self._lock:
+            if loja is None:
+                self._cache.clear()
+                self._sem_modelo.clear()
+                self._bytes = 0
+            else:
+                self._sem_modelo.pop(loja, None)
+                if loja in self._cache:
+                    self._bytes -= self._cache.pop(loja)[1]
@@ -0,0 +1,280 @@
+import io
+import os
+import sys
+import glob
+import json
+import time
+import signal
+import logging
+import argparse
+
+import numpy as np
+import pandas as pd
+import schedule
+
+from escrita_atomica import gravar_json_atomico
+from estatisticas import AcumuladorMetricas, EstatisticasSuficientes
+from modelo import ModeloVendasSorvete
+from pre_processamento import ajustar_tipos, separar_por_hash
+from registro_modelos import listar_versoes, publicar_modelo, versao_do_artefato
+
+logger = logging.getLogger(__name__)
+
+CAMINHO_ESTADO_PADRAO = 'outputs/retreino/estado.json'
+
+# Bytes lidos por vez do trecho novo de cada arquivo
+TAMANHO_BLOCO_LEITURA = 16 * 1024 ** 2
+
+# Colunas usadas como chave da divisão treino/holdout (as que existirem no arquivo)
+COLUNAS_CHAVE = ('Data', 'Temperatura', 'Vendas')
+
+def ler_linhas_novas(caminho, posicao, tamanho_bloco=TAMANHO_BLOCO_LEITURA):
+    """
+    Lê as linhas completas do CSV a partir do byte `posicao` (0 = logo após o cabeçalho).
+
+    O trecho novo é lido em blocos de até `tamanho_bloco` bytes, cortados na
+    última quebra de linha, então a memória não depende de quanto o arquivo
+    cresceu. Gera (DataFrame ou None, posição após o bloco). Uma última linha
+    ainda sem quebra de linha (arquivo sendo escrito) fica para o próximo ciclo.
+    """
+    with open(caminho, 'rb') as arquivo:
+        cabecalho = arquivo.readline()
+        posicao = max(posicao, len(cabecalho))
+        arquivo.seek(posicao)
+        resto = b''
+        while True:
+            pedaco = arquivo.read(tamanho_bloco)
+            if not pedaco:
+                return
+            conteudo = resto + pedaco
+            fim = conteudo.rfind(b'\n') + 1
+            resto = conteudo[fim:]
+            if fim == 0:
+                continue
+            posicao += fim
+            if not conteudo[:fim].strip():
+                yield None, posicao
+                continue
+            dados = pd.read_csv(io.BytesIO(cabecalho + conteudo[:fim]), dtype={'Data': object})
+            yield ajustar_tipos(dados), posicao
+
+class ServicoRetreino:
+    """
+    Retreino incremental agendado a partir dos arquivos de vendas de um diretório.
+
+    A cada ciclo, lê só as linhas que ainda não foram vistas (a marca d'água
+    guarda, por arquivo, o byte até onde ele já foi lido), separa parte delas
+    como holdout pelo hash das linhas e atualiza as estatísticas suficientes
+    do candidato com o restante, em O(linhas novas). O candidato é comparado
+    ao modelo em produção (a versão mais recente em `diretorio_modelos`) no
+    holdout acumulado e só é publicado como nova versão se tiver RMSE menor.
+
+    Os coeficientes bootstrap (intervalos de previsão) são atualizados junto
+    com as estatísticas. Marca d'água, estatísticas, bootstrap e holdout
+    ficam em um único JSON gravado de forma atômica antes da publicação,
+    então reiniciar o serviço nunca reprocessa linhas. Na primeira execução com um modelo já em produção, os
+    arquivos existentes são considerados já treinados (o modelo veio do
+    pipeline completo), a menos que incluir_existentes=True.
+    """
+
+    def __init__(self, diretorio_entrada='inputs', diretorio_modelos='outputs/modelos',
+                 caminho_estado=CAMINHO_ESTADO_PADRAO, padrao_arquivos='*.csv', test_size=0.2,
+                 max_holdout=5000, min_holdout=10, incluir_existentes=False, seed=42):
+        self.diretorio_entrada = diretorio_entrada
+        self.diretorio_modelos = diretorio_modelos
+        self.caminho_estado = caminho_estado
+        self.padrao_arquivos = padrao_arquivos
+        self.test_size = test_size
+        self.max_holdout = max_holdout
+        self.min_holdout = min_holdout
+        self.incluir_existentes = incluir_existentes
+        self.seed = seed
+        self.estado = self._carregar_estado()
+        self._parar = False
+
+    def _carregar_estado(self):
+        try:
+            with open(self.caminho_estado, encoding='utf-8') as arquivo:
+                return json.load(arquivo)
+        except FileNotFoundError:
+            return None
+
+    def _gravar_estado(self):
+        gravar_json_atomico(self.estado, self.caminho_estado, ensure_ascii=False, indent=2)
+
+    def _arquivos(self):
+        return sorted(glob.glob(os.path.join(self.diretorio_entrada, self.padrao_arquivos)))
+
+    def _estado_inicial(self, versao_ativa):
+        """Primeira execução: marca d'água no fim dos arquivos se já houver modelo em produção."""
+        marcas = {}
+        if versao_ativa is not None and not self.incluir_existentes:
+            marcas = {caminho: os.path.getsize(caminho) for caminho in self._arquivos()}
+            logger.info(f"Primeira execução: {len(marcas)} arquivo(s) existentes considerados já treinados.")
+        return {'marcas': marcas, 'versao_base': None, 'estatisticas': None, 'bootstrap': None,
+                'holdout': {'Temperatura': [], 'Vendas': []}, 'ciclos': 0}
+
+    def _modelo_ativo(self):
+        """(versão, ModeloVendasSorvete) em produção, ou (None, None)."""
+        versoes = listar_versoes(self.diretorio_modelos)
+        if not versoes:
+            return None, None
+        modelo = ModeloVendasSorvete()
+        modelo.carregar_modelo(versoes[-1])
+        return versao_do_artefato(versoes[-1]), modelo
+
+    def _candidato(self, versao_ativa, ativo):
+        """Modelo candidato a partir das estatísticas e do bootstrap guardados no estado."""
+        # O modelo em produção mudou por fora (ex.: pipeline completo): partir das estatísticas dele
+        if self.estado['versao_base'] != versao_ativa:
+            self.estado['versao_base'] = versao_ativa
+            estatisticas_ativo = ativo.estatisticas if ativo is not None else None
+            self.estado['estatisticas'] = estatisticas_ativo.para_dict() if estatisticas_ativo else None
+            bootstrap_ativo = ativo.bootstrap if ativo is not None else None
+            self.estado['bootstrap'] = bootstrap_ativo.tolist() if bootstrap_ativo is not None else None
+
+        candidato = ModeloVendasSorvete()
+        if self.estado['estatisticas']:
+            candidato.estatisticas = EstatisticasSuficientes.de_dict(self.estado['estatisticas'])
+        if self.estado.get('bootstrap'):
+            # Intervalos do candidato: atualizados junto com as estatísticas a cada ciclo
+            candidato.bootstrap = np.asarray(self.estado['bootstrap'])
+        return candidato
+
+    def linhas_novas(self, marcas):
+        """
+        Gera, bloco a bloco, as linhas ainda não vistas de todos os arquivos.
+
+        `marcas` é atualizado conforme os blocos são lidos; ao fim da iteração
+        contém as novas marcas d'água.
+        """
+        for caminho in self._arquivos():
+            posicao = marcas.get(caminho, 0)
+            if os.path.getsize(caminho) < posicao:
+                # Arquivo truncado ou substituído: o conteúdo atual é tratado como novo
+                logger.warning(f"{caminho} ficou menor que a marca d'água; relendo desde o início.")
+                posicao = 0
+            marcas[caminho] = posicao
+            for dados, marcas[caminho] in ler_linhas_novas(caminho, posicao):
+                if dados is not None:
+                    dados = dados.dropna(subset=['Temperatura', 'Vendas'])
+                    if not dados.empty:
+                        yield dados
+
+    def executar_ciclo(self):
+        """Ingere as linhas novas, atualiza o candidato e publica se ele superar o modelo ativo."""
+        versao_ativa, ativo = self._modelo_ativo()
+        if self.estado is None:
+            self.estado = self._estado_inicial(versao_ativa)
+
+        marcas = dict(self.estado['marcas'])
+        candidato = None
+        n_novas = 0
+        holdout = {coluna: list(valores) for coluna, valores in self.estado['holdout'].items()}
+        for novas in self.linhas_novas(marcas):
+            if candidato is None:
+                candidato = self._candidato(versao_ativa, ativo)
+            n_novas += len(novas)
+            chaves = novas[[coluna for coluna in COLUNAS_CHAVE if coluna in novas]]
+            eh_holdout = separar_por_hash(chaves, self.test_size, self.seed)
+            x = novas['Temperatura'].to_numpy(dtype=np.float64)
+            y = novas['Vendas'].to_numpy(dtype=np.float64)
+            candidato.treinar_incremental(x[~eh_holdout].reshape(-1, 1), y[~eh_holdout])
+
+            # Holdout acumulado (as linhas mais recentes), nunca usado no treino
+            holdout['Temperatura'] = (holdout['Temperatura'] + x[eh_holdout].tolist())[-self.max_holdout:]
+            holdout['Vendas'] = (holdout['Vendas'] + y[eh_holdout].tolist())[-self.max_holdout:]
+
+        if candidato is None:
+            self.estado['marcas'] = marcas
+            self._gravar_estado()
+            return {'linhas_novas': 0, 'publicado': None}
+
+        x_holdout = np.asarray(holdout['Temperatura']).reshape(-1, 1)
+        y_holdout = np.asarray(holdout['Vendas'])
+
+        resumo = {'linhas_novas': n_novas, 'linhas_holdout': len(y_holdout), 'publicado': None}
+        publicar = False
+        if len(y_holdout) >= self.min_holdout and candidato.estatisticas.n >= 2:
+            candidato.metricas = AcumuladorMetricas().atualizar(y_holdout, candidato.prever(x_holdout)).resultado()
+            resumo['rmse_candidato'] = candidato.metricas['RMSE']
+            if ativo is None:
+                publicar = True
+            else:
+                rmse_ativo = AcumuladorMetricas().atualizar(y_holdout, ativo.prever(x_holdout)).resultado()['RMSE']
+                resumo['rmse_ativo'] = rmse_ativo
+                publicar = candidato.metricas['RMSE'] < rmse_ativo
+        else:
+            logger.info(f"Holdout com {len(y_holdout)} linha(s); aguardando pelo menos {self.min_holdout} para comparar.")
+
+        # Gravar o estado antes de publicar: se o processo cair entre os dois
+        # passos, o próximo ciclo compara de novo em vez de contar as linhas duas vezes
+        self.estado.update(
+            marcas=marcas, holdout=holdout, estatisticas=candidato.estatisticas.para_dict(),
+            bootstrap=candidato.bootstrap.tolist() if candidato.bootstrap is not None else None
+        )
+        self.estado['ciclos'] += 1
+        self._gravar_estado()
+
+        if publicar:
+            if candidato.bootstrap is None:
+                logger.warning("O modelo base não tem coeficientes bootstrap; "
+                               "a nova versão será publicada sem intervalos de previsão.")
+            caminho = publicar_modelo(
+                candidato.modelo, self.diretorio_modelos, formato='compacto',
+                metadados={**candidato.metadados_treino(), 'origem': 'retreino_incremental'}
+            )
+            self.estado['versao_base'] = resumo['publicado'] = versao_do_artefato(caminho)
+            self._gravar_estado()
+            logger.info(f"Candidato publicado como {caminho} (RMSE holdout {resumo['rmse_candidato']:.3f}).")
+        elif 'rmse_ativo' in resumo:
+            logger.info(f"Candidato não superou o modelo ativo (RMSE {resumo['rmse_candidato']:.3f} "
+                        f"vs {resumo['rmse_ativo']:.3f}); versão {versao_ativa} mantida.")
+        return resumo
+
+    def _ciclo_seguro(self):
+        # Uma falha em um ciclo (arquivo malformado, disco cheio) não derruba o serviço
+        try:
+            resumo = self.executar_ciclo()
+            logger.info(f"Ciclo de retreino concluído: {resumo}")
+        except Exception as e:
+            logger.exception(f"Falha no ciclo de retreino: {e}")
+
+    def iniciar(self, intervalo_minutos=15):
+        """Executa um ciclo agora e depois a cada `intervalo_minutos`, até SIGINT/SIGTERM."""
+        def parar(*_):
+            self._parar = True
+        signal.signal(signal.SIGTERM, parar)
+        signal.signal(signal.SIGINT, parar)
+
+        agenda = schedule.Scheduler()
+        agenda.every(intervalo_minutos).minutes.do(self._ciclo_seguro)
+        logger.info(f"Serviço de retreino iniciado: {self.diretorio_entrada} a cada {intervalo_minutos} min.")
+        self._ciclo_seguro()
+        while not self._parar:
+            agenda.run_pending()
+            time.sleep(1)
+        logger.info("Serviço de retreino encerrado.")
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    parser = argparse.ArgumentParser(description="Retreino incremental agendado do modelo de vendas.")
+    parser.add_argument('--entrada', default='inputs', help="Diretório observado com os CSVs de vendas")
+    parser.add_argument('--modelos', default='outputs/modelos', help="Diretório de versões lido pela API")
+    parser.add_argument('--estado', default=CAMINHO_ESTADO_PADRAO)
+    parser.add_argument('--intervalo', type=float, default=15, help="Minutos entre os ciclos")
+    parser.add_argument('--incluir-existentes', action='store_true',
+                        help="Na primeira execução, treina também com as linhas já existentes")
+    parser.add_argument('--uma-vez', action='store_true', help="Executa um único ciclo e sai (cron)")
+    args = parser.parse_args()
+
+    servico = ServicoRetreino(args.entrada, args.modelos, args.estado,
+                              incluir_existentes=args.incluir_existentes)
+    if args.uma_vez:
+        print(servico.executar_ciclo())
+    else:
+        servico.iniciar(args.intervalo)
@@ -0,0 +1,104 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.linear_model import HuberRegressor, Lasso, LinearRegression, Ridge
+from sklearn.model_selection import KFold, ParameterGrid, TimeSeriesSplit
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.tree import DecisionTreeRegressor
+
+from estatisticas import AcumuladorMetricas
+
+# Candidatos avaliados por padrão: nome -> (estimador base, grade de hiperparâmetros).
+# Só modelos lineares: o vencedor continua compilável para o preditor rápido e
+# exportável no formato compacto (previsão = coef_ * temperatura + intercept_).
+CANDIDATOS_PADRAO = {
+    'LinearRegression': (LinearRegression(), {}),
+    'Ridge': (Ridge(), {'alpha': [0.1, 1.0, 10.0]}),
+    'Lasso': (Lasso(), {'alpha': [0.1, 1.0]}),
+    'HuberRegressor': (HuberRegressor(), {'epsilon': [1.35, 2.0]}),
+}
+
+# Candidatos não lineares, avaliados só quando passados explicitamente
+# (ex.: {**CANDIDATOS_PADRAO, **CANDIDATOS_NAO_LINEARES}). Se um deles vencer,
+# o modelo publicado é um joblib sem preditor compilado, sem intervalos
+# bootstrap e sem estatísticas suficientes para o retreino incremental.
+CANDIDATOS_NAO_LINEARES = {
+    'DecisionTreeRegressor': (DecisionTreeRegressor(random_state=42), {'max_depth': [3, 5]}),
+    'KNeighborsRegressor': (KNeighborsRegressor(), {'n_neighbors': [5, 10]}),
+}
+
+def _avaliar_dobra(nome, estimador, parametros, dobra, X, y, indices_treino, indices_teste):
+    """Ajusta e avalia um candidato em uma dobra (executado nos processos do pool)."""
+    modelo = clone(estimador).set_params(**parametros)
+    inicio = time.perf_counter()
+    modelo.fit(X[indices_treino], y[indices_treino])
+    tempo_ajuste = time.perf_counter() - inicio
+    metricas = AcumuladorMetricas().atualizar(y[indices_teste], modelo.predict(X[indices_teste])).resultado()
+    return {'modelo': nome, 'parametros': parametros, 'dobra': dobra,
+            'tempo_ajuste': tempo_ajuste, **metricas}
+
+def gerar_dobras(n_amostras, n_dobras=5, estrategia='kfold', seed=42):
+    """Índices de treino/teste de cada dobra ('kfold' embaralhado ou 'temporal')."""
+    if estrategia == 'kfold':
+        divisor = KFold(n_splits=n_dobras, shuffle=True, random_state=seed)
+    elif estrategia == 'temporal':
+        # Os dados precisam estar em ordem cronológica: treino sempre antes do teste
+        divisor = TimeSeriesSplit(n_splits=n_dobras)
+    else:
+        raise ValueError(f"Estratégia de validação desconhecida: {estrategia}")
+    return list(divisor.split(np.empty((n_amostras, 1))))
+
+def validacao_cruzada(X, y, candidatos=None, n_dobras=5, estrategia='kfold',
+                      metrica='RMSE', n_jobs=None, seed=42):
+    """
+    Avalia os candidatos por validação cruzada em paralelo e retorna o ranking.
+
+    Cada combinação (candidato, hiperparâmetros, dobra) é ajustada em um pool
+    de processos com um worker por núcleo. O joblib mapeia X e y em memória
+    compartilhada somente leitura (memmap) para os workers, então os dados não
+    são copiados para cada tarefa.
+
+    Retorna um DataFrame com a média e o desvio de cada métrica por candidato,
+    ordenado pela `metrica` (menor é melhor, exceto R2).
+    """
+    candidatos = candidatos or CANDIDATOS_PADRAO
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    y = np.ascontiguousarray(y, dtype=np.float64)
+    dobras = gerar_dobras(len(y), n_dobras, estrategia, seed)
+
+    tarefas = [
+        delayed(_avaliar_dobra)(nome, estimador, dict(parametros), i, X, y, treino, teste)
+        for nome, (estimador, grade) in candidatos.items()
+        for parametros in ParameterGrid(grade)
+        for i, (treino, teste) in enumerate(dobras)
+    ]
+    n_jobs = n_jobs or os.cpu_count() or 1
+    resultados = Parallel(n_jobs=n_jobs, max_nbytes='1M', mmap_mode='r')(tarefas)
+
+    detalhes = pd.DataFrame(resultados)
+    detalhes['parametros'] = detalhes['parametros'].apply(
+        lambda p: ', '.join(f'{k}={v}' for k, v in sorted(p.items()))
+    )
+    ranking = detalhes.groupby(['modelo', 'parametros'], sort=False).agg(
+        **{f'{m}_media': (m, 'mean') for m in ('RMSE', 'MAE', 'R2')},
+        **{f'{m}_desvio': (m, 'std') for m in ('RMSE', 'MAE', 'R2')},
+        tempo_ajuste=('tempo_ajuste', 'mean'),
+        dobras=('dobra', 'count')
+    ).reset_index()
+    ranking = ranking.sort_values(f'{metrica}_media', ascending=(metrica != 'R2'), ignore_index=True)
+    ranking.insert(0, 'posicao', np.arange(1, len(ranking) + 1))
+    return ranking
+
+def melhor_estimador(ranking, candidatos=None):
+    """Estimador (não treinado) do primeiro colocado do ranking."""
+    candidatos = candidatos or CANDIDATOS_PADRAO
+    primeiro = ranking.iloc[0]
+    estimador, grade = candidatos[primeiro['modelo']]
+    for parametros in ParameterGrid(grade):
+        if ', '.join(f'{k}={v}' for k, v in sorted(parametros.items())) == primeiro['parametros']:
+            return clone(estimador).set_params(**parametros)
+    return clone(estimador)
@@ -1,11 +1,14 @@
 import joblib
 
+from src.preditor import compilar_preditor
+
 # Carregar o modelo salvo
 modelo = joblib.load('outputs/modelo_final.joblib')
+preditor = compilar_preditor(modelo)
 
 # Fazer uma previsão para uma temperatura de 30°C
-temperatura = [[30]]  # Temperatura em graus Celsius
-previsao = modelo.predict(temperatura)
+temperatura = 30  # Temperatura em graus Celsius
+previsao = preditor.prever(temperatura)
 
 # Exibir o resultado
-print(f"Para uma temperatura de {temperatura[0][0]}°C, a previsão de vendas é de {int(previsao[0])} sorvetes.")
\ No newline at end of file
+print(f"Para uma temperatura de {temperatura}°C, a previsão de vendas é de {int(previsao)} sorvetes.")
\ No newline at end of file
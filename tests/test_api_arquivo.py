@@ -0,0 +1,71 @@
+import csv
+import json
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import api  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def cliente():
+    with TestClient(api.app) as cliente:
+        yield cliente
+
+
+def enviar_ndjson(cliente, registros):
+    corpo = ''.join(json.dumps(r) + '\n' for r in registros)
+    resposta = cliente.post(
+        '/prever/arquivo/', content=corpo, headers={'content-type': 'application/x-ndjson'}
+    )
+    assert resposta.status_code == 200
+    return [json.loads(linha) for linha in resposta.text.splitlines()]
+
+
+def enviar_csv(cliente, corpo):
+    resposta = cliente.post('/prever/arquivo/', content=corpo, headers={'content-type': 'text/csv'})
+    assert resposta.status_code == 200
+    return resposta.text.splitlines()
+
+
+@pytest.mark.parametrize('temperatura', ['inf', '-inf', '1e400', 1e300])
+def test_ndjson_temperatura_nao_finita_sai_sem_previsao(cliente, temperatura):
+    linhas = enviar_ndjson(cliente, [{'temperatura': 30}, {'temperatura': temperatura}, {'temperatura': 25}])
+    assert len(linhas) == 3
+    assert isinstance(linhas[0]['previsao_vendas'], int)
+    assert linhas[1]['previsao_vendas'] is None
+    assert isinstance(linhas[2]['previsao_vendas'], int)
+
+
+@pytest.mark.parametrize('temperatura', ['inf', '-inf', '1e400', '1e300'])
+def test_csv_temperatura_nao_finita_sai_sem_previsao(cliente, temperatura):
+    linhas = enviar_csv(cliente, f'temperatura\n30\n{temperatura}\n25\n')
+    assert linhas[0] == 'temperatura,previsao_vendas'
+    assert len(linhas) == 4
+    assert linhas[1].split(',')[1] != ''
+    assert linhas[2] == f'{temperatura},'
+    assert linhas[3].split(',')[1] != ''
+
+
+def test_csv_linha_com_campos_a_mais_sai_vazia(cliente):
+    linhas = enviar_csv(cliente, 'temperatura\n30\n1,2\n25\n')
+    assert len(linhas) == 4
+    assert linhas[2] == ','
+    assert linhas[1].startswith('30,') and linhas[3].startswith('25,')
+
+
+def test_csv_aspa_sem_par_nao_trunca_a_resposta(cliente):
+    linhas = enviar_csv(cliente, 'loja,temperatura\nA,30\n"abc,31\nB,25\n')
+    assert len(linhas) == 4
+    assert linhas[2] == ',,'
+    assert linhas[3].startswith('B,25,') and linhas[3] != 'B,25,'
+
+
+def test_csv_campo_entre_aspas_mantem_as_colunas(cliente):
+    linhas = enviar_csv(cliente, 'loja,temperatura\n"Centro, SP",30\n')
+    loja, temperatura, previsao = next(csv.reader([linhas[1]]))
+    assert (loja, temperatura) == ('Centro, SP', '30') and previsao != ''